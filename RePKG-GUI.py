@@ -1,314 +1,578 @@
-import ctypes
+import base64
 import datetime  # 用于备份时间戳
-import glob
-import json
+import multiprocessing
 import os
-import shutil
-import subprocess
+import queue
 import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 
-CONFIG_FILE = "assets/repkg_config.json"
-FIRST_RUN_FILE = ".first_run"
-
-
-def win_path(path: str) -> str:
-    """将路径统一转换为 Windows 格式（反斜杠）"""
-    return os.path.normpath(path)
-
-
-def set_file_hidden(file_path):
-    """
-    设置文件为隐藏属性
-    Set file as hidden attribute
-    """
-    try:
-        # 使用 Windows API 设置文件属性为隐藏
-        FILE_ATTRIBUTE_HIDDEN = 0x2
-        ctypes.windll.kernel32.SetFileAttributesW(file_path, FILE_ATTRIBUTE_HIDDEN)
-        return True
-    except Exception as e:
-        print(f"  [Warning]  无法设置隐藏属性 / Cannot set hidden attribute for {file_path}: {e}")
-        return False
-
+import backup_store
+import job_journal
+import repkg_core
+from pkg_reader import format_size
+from repkg_core import (CONFIG_FILE, classify_projects, create_transparent_mapping, default_worker_count,
+                        list_current_status, remove_all_mappings)
+from thumbnail_cache import PIL_AVAILABLE, LRUCache, ThumbnailCache
 
-def create_transparent_mapping(parent_dir):
+FIRST_RUN_FILE = ".first_run"
+LOG_FLUSH_INTERVAL_MS = 33  # 日志刷新间隔（约 30 帧/秒）
+PREVIEW_DEBOUNCE_MS = 250  # 输入停止这么久之后才刷新命令预览
+GALLERY_CELL_SIZE = (180, 170)  # 图库格子（宽, 高）
+GALLERY_CACHE_MB = 64  # 已解码缩略图的内存上限
+GALLERY_POLL_MS = 30  # 取回后台解码结果的间隔
+GALLERY_WORKERS = 4
+JOB_TABLE_REFRESH_MS = 100  # 任务表合并刷新的间隔
+JOB_TABLE_RESORT_MS = 500  # 排序或筛选生效时，运行中最多每隔这么久重建一次视图
+JOB_OUTPUT_LIMIT = 64 * 1024  # 每个任务保留的输出字符数（超出时保留首尾）
+
+
+class LogPipeline:
     """
-    为分类后的项目创建透明映射（隐藏版本）
-    Create transparent mapping for classified projects (hidden version)
+    线程安全的日志管道 / Thread-safe log pipeline for a Tk text widget
+    任意线程调用 write() 只把消息放入队列；主线程通过 after() 定时取出全部消息，
+    合并为一次 insert 写入控件，并且每次刷新最多滚动一次。
     """
 
-    print(f" 创建透明映射 / Creating transparent mapping...")
-
-    # 获取所有分类目录
-    category_dirs = []
-    for item in os.listdir(parent_dir):
-        item_path = os.path.join(parent_dir, item)
-        # 排除隐藏目录、脚本文件和.first_run文件
-        if (os.path.isdir(item_path) and
-                item not in ["Unknown"] and
-                not item.startswith('.')):
-            category_dirs.append(item)
-
-    created_links = []
-    skipped_items = []
-
-    for category in category_dirs:
-        category_path = os.path.join(parent_dir, category)
-
-        # 遍历该分类目录下的所有项目
-        for project in os.listdir(category_path):
-            project_path = os.path.join(category_path, project)
-
-            # 只处理目录
-            if not os.path.isdir(project_path):
-                continue
-
-            # 在父目录中创建符号链接的目标路径
-            link_path = os.path.join(parent_dir, project)
-
-            # 检查是否已存在同名项目 (符号链接不算，因为它将被删除后重新创建)
-            if os.path.exists(link_path) and not os.path.islink(link_path):
-                # 如果存在且不是符号链接，则跳过
-                skipped_items.append(project)
-                continue
-
-            # 如果是已存在的符号链接，先删除，确保链接指向正确
-            if os.path.islink(link_path):
-                try:
-                    os.unlink(link_path)
-                except Exception as e:
-                    print(f"  [Warning]  无法删除旧链接 / Failed to remove old link for {project}: {e}")
-                    skipped_items.append(project)
-                    continue
-
-            try:
-                # 创建符号链接
-                relative_path = os.path.join(category, project)
-                # 使用 os.symlink 创建相对路径链接
-                os.symlink(relative_path, link_path)
-
-                # 设置符号链接为隐藏
-                set_file_hidden(link_path)
-
-                created_links.append((project, category))
-
-            except OSError as e:
-                # 权限不足等错误
-                print(f"  [Error] 创建链接失败 / Failed to create link for {project}: {e}")
-                skipped_items.append(project)
+    def __init__(self, root, text_widget, interval_ms=LOG_FLUSH_INTERVAL_MS, should_scroll=None):
+        self.root = root
+        self.text_widget = text_widget
+        self.interval_ms = interval_ms
+        self.should_scroll = should_scroll or (lambda: True)
+        self.queue = queue.SimpleQueue()
 
-    if created_links:
-        print(
-            f"  [Success] 成功创建 {len(created_links)} 个隐藏映射链接 / Successfully created {len(created_links)} hidden mapping links")
+    def write(self, message):
+        self.queue.put(message)
 
-    if skipped_items:
-        print(f"  [Warning]  跳过 {len(skipped_items)} 个项目 / Skipped {len(skipped_items)} items")
+    def start(self):
+        self.root.after(self.interval_ms, self._tick)
 
-    return created_links, skipped_items
+    def flush(self):
+        """取出队列中的全部消息并一次性写入（只能在主线程调用）"""
+        chunks = []
+        try:
+            while True:
+                chunks.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if chunks:
+            self.text_widget.insert(tk.END, "".join(chunks))
+            if self.should_scroll():
+                self.text_widget.see(tk.END)
+        return len(chunks)
+
+    def _tick(self):
+        try:
+            self.flush()
+        finally:
+            self.root.after(self.interval_ms, self._tick)
 
 
-def classify_projects(parent_dir, log_callback=None, create_mapping=False):
+class ThumbnailGallery:
     """
-    根据 project.json 的 'type' 字段分类子文件夹。
-    create_mapping: 是否在分类后自动创建透明映射
+    虚拟化缩略图图库 / Virtualized thumbnail grid on a Tk canvas
+    画布上只为可见的格子创建元素，滚动时重新绘制可见范围；缩略图只为可见格子请求，
+    由线程池读取磁盘缓存或解码，结果经队列交回主线程创建 PhotoImage，并放入按像素字节数限制的 LRU。
+    已滚出可见范围的请求在开始解码前被丢弃。
     """
 
-    if log_callback:
-        log_callback(f"📂 开始分类项目 / Starting project classification: {parent_dir}\n")
-
-    # 定义 Unknown 文件夹路径
-    unknown_dir = os.path.join(parent_dir, "Unknown")
-    os.makedirs(unknown_dir, exist_ok=True)
-
-    # 统计信息
-    classified_count = 0
-    error_count = 0
-
-    # 遍历父目录下所有子文件夹
-    items_to_process = [item for item in os.listdir(parent_dir) if
-                        os.path.isdir(os.path.join(parent_dir, item)) and
-                        item not in ["Unknown", "scene", "video"] and
-                        not item.startswith('.') and
-                        not item.endswith('.py') and
-                        not item.endswith('.md')]
-
-    for item in items_to_process:
-        item_path = os.path.join(parent_dir, item)
-        json_path = os.path.join(item_path, "project.json")
+    def __init__(self, parent, thumbs=None, cache_bytes=GALLERY_CACHE_MB * 1024 * 1024, workers=GALLERY_WORKERS):
+        self.frame = tk.Frame(parent)
+        self.canvas = tk.Canvas(self.frame, bg="white", highlightthickness=0, yscrollincrement=20)
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
 
-        # 默认分类为 Unknown
-        category = "Unknown"
+        self.thumbs = thumbs or ThumbnailCache()
+        self.images = LRUCache(cache_bytes)  # 预览图路径 → PhotoImage
+        self.workers = workers
+        self.items = []
+        self.columns = 1
+        self.generation = 0  # set_items 后递增，旧批次的结果被丢弃
+        self.visible = frozenset()  # 当前可见的格子序号（工作线程只读）
+        self.pending = set()
+        self.failed = set()
+        self.results = queue.SimpleQueue()
+        self._shown = []  # 可见格子的 PhotoImage，被 LRU 淘汰时仍保持显示
+        self._pool = None
+        self._render_job = None
+        self._poll_job = None
+
+        self.canvas.bind("<Configure>", lambda e: self.layout())
+        self.canvas.bind("<Enter>", lambda e: self.canvas.focus_set())
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", self._on_wheel)
+        self.canvas.bind("<Button-5>", self._on_wheel)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+
+    def set_items(self, items):
+        """替换图库内容（list_gallery_projects 的结果）"""
+        self.generation += 1
+        self.items = items
+        self.pending.clear()
+        self.failed.clear()
+        self.canvas.yview_moveto(0)
+        self.layout()
+
+    def layout(self):
+        cell_width, cell_height = GALLERY_CELL_SIZE
+        self.columns = max(1, self.canvas.winfo_width() // cell_width)
+        rows = -(-len(self.items) // self.columns)
+        self.canvas.configure(scrollregion=(0, 0, self.columns * cell_width, rows * cell_height))
+        self.schedule_render()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_render()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-3, "units")
+        else:
+            self.canvas.yview_scroll(3, "units")
+        self.schedule_render()
+
+    def item_at(self, x, y):
+        cell_width, cell_height = GALLERY_CELL_SIZE
+        column = int(self.canvas.canvasx(x) // cell_width)
+        index = int(self.canvas.canvasy(y) // cell_height) * self.columns + column
+        if column < self.columns and 0 <= index < len(self.items):
+            return self.items[index]
+        return None
 
-        # 尝试读取 project.json
-        if os.path.exists(json_path):
+    def _on_double_click(self, event):
+        item = self.item_at(event.x, event.y)
+        if item:
             try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                # 获取 type 字段
-                category = data.get("type", "Unknown").strip()
-                if not category:  # 避免空字符串分类
-                    category = "Unknown"
+                os.startfile(item["path"])  # Windows 打开项目文件夹
             except Exception as e:
-                if log_callback:
-                    log_callback(f"[错误/Error] 无法解析 {json_path}: {e}\n")
-                error_count += 1
-                category = "Unknown"  # 解析失败也归类到 Unknown
-
-        # 目标目录路径
-        target_dir = os.path.join(parent_dir, category)
-        os.makedirs(target_dir, exist_ok=True)
-
-        # 移动文件夹
-        target_path = os.path.join(target_dir, item)
-
-        # 若目标已存在，则重命名避免冲突 (此逻辑可能导致用户项目名改变，但为确保操作成功暂时保留)
-        if os.path.exists(target_path):
-            base = item
-            counter = 1
-            original_target_path = target_path
-            while os.path.exists(target_path):
-                new_name = f"{base}_{counter}"
-                target_path = os.path.join(target_dir, new_name)
-                counter += 1
-            if log_callback:
-                log_callback(
-                    f"[警告/Warning] 目标路径 {original_target_path} 已存在，重命名 {item} → {os.path.basename(target_path)}\n")
-
+                messagebox.showerror("错误", f"无法打开项目目录: {e}")
+
+    def schedule_render(self):
+        """合并同一轮事件中的多次重绘请求"""
+        if self._render_job is None:
+            self._render_job = self.canvas.after_idle(self.render)
+
+    def render(self):
+        self._render_job = None
+        canvas = self.canvas
+        cell_width, cell_height = GALLERY_CELL_SIZE
+        thumb_width, thumb_height = self.thumbs.size
+        canvas.delete("cell")
+
+        top = canvas.canvasy(0)
+        bottom = canvas.canvasy(canvas.winfo_height())
+        first = max(0, int(top // cell_height) * self.columns)
+        last = min(len(self.items), (int(bottom // cell_height) + 1) * self.columns)
+        self.visible = frozenset(range(first, last))
+
+        shown = []
+        for index in range(first, last):
+            item = self.items[index]
+            row, column = divmod(index, self.columns)
+            x = column * cell_width + cell_width // 2
+            y = row * cell_height + 6
+            preview = item["preview"]
+            photo = self.images.get(preview) if preview else None
+            if photo is not None:
+                canvas.create_image(x, y + thumb_height // 2, image=photo, tags="cell")
+                shown.append(photo)
+            else:
+                loading = preview is not None and preview not in self.failed
+                canvas.create_rectangle(x - thumb_width // 2, y, x + thumb_width // 2, y + thumb_height,
+                                        outline="#dddddd", fill="#f5f5f5", tags="cell")
+                canvas.create_text(x, y + thumb_height // 2, text="加载中…" if loading else "无预览",
+                                   fill="#999999", tags="cell")
+                if loading:
+                    self.request(index, preview)
+
+            title = item["title"] or item["name"]
+            if len(title) > 22:
+                title = title[:21] + "…"
+            canvas.create_text(x, y + thumb_height + 6, text=title, anchor="n", font=("Arial", 9), tags="cell")
+            kind = item["type"] or "Unknown"
+            if item["category"]:
+                kind = f"{item['category']} / {kind}"
+            canvas.create_text(x, y + thumb_height + 24, text=kind, anchor="n", fill="#777777",
+                               font=("Arial", 8), tags="cell")
+        self._shown = shown
+
+    def request(self, index, preview):
+        if preview in self.pending:
+            return
+        self.pending.add(preview)
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumbnail")
+        self._pool.submit(self._load, index, preview, self.generation)
+        if self._poll_job is None:
+            self._poll_job = self.canvas.after(GALLERY_POLL_MS, self._poll)
+
+    def _load(self, index, preview, generation):
+        """工作线程：格子已滚出可见范围（或图库已重新加载）时不解码"""
+        if generation != self.generation or index not in self.visible:
+            self.results.put((preview, generation, None, True))
+            return
         try:
-            shutil.move(item_path, target_path)
-            if log_callback:
-                log_callback(f"[分类/Classified] {item} → {category}\n")
-            classified_count += 1
-        except Exception as e:
-            if log_callback:
-                log_callback(f"[错误/Error] 移动 {item} 失败: {e}\n")
-            error_count += 1
-
-    if log_callback:
-        log_callback(f"\n 分类统计 / Classification statistics:\n")
-        log_callback(f"  [Success] 成功分类 / Successfully classified: {classified_count}\n")
-        log_callback(f"  [Error] 分类失败 / Classification failed: {error_count}\n")
-
-    # 根据标志创建透明映射
-    if classified_count > 0 and create_mapping:
-        if log_callback:
-            log_callback(f"\n 自动创建透明映射 / Auto-creating transparent mapping...\n")
-        created_links, skipped_items = create_transparent_mapping(parent_dir)
-
-        if log_callback:
-            log_callback(f"\n[Success] 分类和映射完成 / Classification and mapping completed.\n")
-            log_callback(f"  📁 项目已按类型分类到子目录 / Projects classified into subdirectories\n")
-            log_callback(f"   已创建透明映射链接 / Transparent mapping links created\n")
-            log_callback(f"  👁️  映射链接已隐藏，对用户不可见 / Mapping links are hidden from users\n")
-    elif classified_count > 0 and not create_mapping:
-        if log_callback:
-            log_callback(f"\n[Success] 分类完成 / Classification completed. (跳过创建映射 / Skip creating mapping)\n")
-    else:
-        if log_callback:
-            log_callback(f"\n[Warning]  没有项目需要分类 / No projects to classify\n")
-
-    return classified_count, error_count
-
-
-def remove_all_mappings(parent_dir, log_callback=None):
-    """
-    移除所有映射链接
-    Remove all mapping links
-    """
-
-    if log_callback:
-        log_callback(f"  移除所有映射链接 / Removing all mapping links...\n")
-
-    removed_count = 0
-
-    for item in os.listdir(parent_dir):
-        item_path = os.path.join(parent_dir, item)
-
-        # 只处理符号链接
-        if os.path.islink(item_path):
+            thumb = self.thumbs.load(preview)
+        except Exception:
+            thumb = None
+        self.results.put((preview, generation, thumb, False))
+
+    def _poll(self):
+        self._poll_job = None
+        changed = False
+        try:
+            while True:
+                preview, generation, thumb, skipped = self.results.get_nowait()
+                if generation != self.generation:
+                    continue
+                self.pending.discard(preview)
+                if skipped:
+                    continue
+                photo = self._to_photo(thumb) if thumb else None
+                if photo is None:
+                    self.failed.add(preview)
+                else:
+                    self.images.put(preview, photo, photo.width() * photo.height() * 4)
+                changed = True
+        except queue.Empty:
+            pass
+        if changed:
+            self.schedule_render()
+        if self.pending:
+            self._poll_job = self.canvas.after(GALLERY_POLL_MS, self._poll)
+
+    def _to_photo(self, thumb):
+        """在主线程创建 PhotoImage；未缩放的原图（没有 Pillow）按整数倍缩小后写入磁盘缓存"""
+        try:
+            photo = tk.PhotoImage(master=self.canvas, data=base64.b64encode(thumb.data).decode("ascii"))
+        except tk.TclError:
+            return None
+        if not thumb.scaled:
+            thumb_width, thumb_height = self.thumbs.size
+            factor = max(-(-photo.width() // thumb_width), -(-photo.height() // thumb_height))
+            if factor > 1:
+                photo = photo.subsample(factor)
             try:
-                os.unlink(item_path)
-                removed_count += 1
-            except OSError as e:
-                if log_callback:
-                    log_callback(f"  [Error] 移除链接失败 / Failed to remove link {item}: {e}\n")
+                os.makedirs(os.path.dirname(thumb.cache_path), exist_ok=True)
+                photo.write(thumb.cache_path, format="png")
+            except (OSError, tk.TclError):
+                pass
+        return photo
 
-    if log_callback:
-        log_callback(
-            f"  [Success] 成功移除 {removed_count} 个映射链接 / Successfully removed {removed_count} mapping links\n")
 
+class JobList:
+    """
+    任务表的数据模型（不依赖 Tk）/ Rows of the job table keyed by package path
+    按首次出现的顺序保存任务行，并维护经过筛选与排序的视图；未筛选、未排序时视图直接复用插入顺序。
+    """
 
-def list_current_status(parent_dir, log_callback=None):
+    COLUMNS = ("seq", "project", "status", "wall_seconds", "exit_code", "output_bytes", "retries")
+    STATUS_LABELS = {"skipped": "跳过", "queued": "排队", "running": "运行中", "ok": "完成", "failed": "失败"}
+
+    def __init__(self):
+        self.jobs = {}  # pkg_path → 任务行
+        self.order = []  # 按首次出现顺序的 pkg_path
+        self.view = self.order
+        self.sort_column = None
+        self.sort_reverse = False
+        self.status_filter = ""
+        self.text_filter = ""
+
+    def __len__(self):
+        return len(self.order)
+
+    def clear(self):
+        self.jobs.clear()
+        self.order.clear()
+        self.rebuild()
+
+    def update(self, event):
+        """应用一条 run_batch 的 job_callback 事件；已结束的任务再次排队时重试次数加一"""
+        pkg_path = event["pkg_path"]
+        row = self.jobs.get(pkg_path)
+        if row is None:
+            row = {"seq": len(self.order) + 1, "project": event.get("project", ""), "pkg_path": pkg_path,
+                   "status": "", "wall_seconds": None, "exit_code": None, "output_bytes": None, "retries": 0,
+                   "output": ""}
+            self.jobs[pkg_path] = row
+            self.order.append(pkg_path)
+        elif event.get("status") == "queued" and row["status"] in ("ok", "failed"):
+            row["retries"] += 1
+            row.update(wall_seconds=None, exit_code=None, output_bytes=None, output="")
+        for key in ("status", "wall_seconds", "exit_code", "output_bytes"):
+            if key in event:
+                row[key] = event[key]
+        if "output" in event:
+            output = event["output"]
+            if len(output) > JOB_OUTPUT_LIMIT:
+                half = JOB_OUTPUT_LIMIT // 2
+                output = f"{output[:half]}\n…（省略 {len(output) - JOB_OUTPUT_LIMIT} 个字符）…\n{output[-half:]}"
+            row["output"] = output
+        return row
+
+    @property
+    def is_identity_view(self):
+        return self.sort_column is None and not self.status_filter and not self.text_filter
+
+    def rebuild(self):
+        """按当前筛选与排序条件重建视图"""
+        if self.is_identity_view:
+            self.view = self.order
+            return
+        jobs = self.jobs
+        keys = self.order
+        if self.status_filter:
+            keys = [key for key in keys if jobs[key]["status"] == self.status_filter]
+        if self.text_filter:
+            text = self.text_filter.lower()
+            keys = [key for key in keys if text in jobs[key]["project"].lower() or text in key.lower()]
+        if self.sort_column:
+            column = self.sort_column
+            if column == "status":
+                labels = self.STATUS_LABELS
+                keys = sorted(keys, key=lambda key: labels.get(jobs[key]["status"], ""), reverse=self.sort_reverse)
+            else:
+                # 空值始终排在最后
+                present = [key for key in keys if jobs[key][column] is not None]
+                missing = [key for key in keys if jobs[key][column] is None]
+                keys = sorted(present, key=lambda key: jobs[key][column], reverse=self.sort_reverse) + missing
+        self.view = keys
+
+    def counts(self):
+        counts = {}
+        for row in self.jobs.values():
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        return counts
+
+    def display_values(self, row):
+        seconds = row["wall_seconds"]
+        output_bytes = row["output_bytes"]
+        return (row["seq"], row["project"], self.STATUS_LABELS.get(row["status"], row["status"]),
+                "" if seconds is None else f"{seconds:.2f} s",
+                "" if row["exit_code"] is None else row["exit_code"],
+                "" if output_bytes is None else format_size(output_bytes),
+                row["retries"] or "")
+
+
+class JobTable:
     """
-    列出当前状态
-    List current status
+    虚拟化任务表 / Virtualized ttk.Treeview over a JobList
+    Treeview 中只保留与可见行数相同的行，滚动时只改写这些行的内容；
+    工作线程通过 post() 把事件放入队列，主线程每 JOB_TABLE_REFRESH_MS 毫秒合并应用一次。
+    单击一行在下方显示该任务自己的输出。
     """
 
-    if log_callback:
-        log_callback(f"📋 当前状态 / Current status in: {parent_dir}\n\n")
-
-    # 统计分类目录
-    category_dirs = []
-    total_projects = 0
-    linked_projects = 0
-
-    # 忽略隐藏目录和链接
-    for item in os.listdir(parent_dir):
-        item_path = os.path.join(parent_dir, item)
-        if (os.path.isdir(item_path) and
-                item not in ["Unknown"] and
-                not os.path.islink(item_path) and
-                not item.startswith('.')):
-            category_dirs.append(item)
-
-    if log_callback:
-        log_callback(f"📁 分类目录 / Category directories:\n")
-        for category in category_dirs:
-            category_path = os.path.join(parent_dir, category)
-            # 统计子目录（项目）数量
-            projects = [item for item in os.listdir(category_path)
-                        if os.path.isdir(os.path.join(category_path, item))]
-            total_projects += len(projects)
-
-            log_callback(f"  {category}: {len(projects)} 个项目 / projects\n")
-
-    # 统计 Unknown 目录的项目
-    unknown_path = os.path.join(parent_dir, "Unknown")
-    if os.path.exists(unknown_path) and os.path.isdir(unknown_path):
-        unknown_projects = [item for item in os.listdir(unknown_path)
-                            if os.path.isdir(os.path.join(unknown_path, item))]
-        total_projects += len(unknown_projects)
-        if log_callback:
-            log_callback(f"  Unknown: {len(unknown_projects)} 个项目 / projects\n")
-
-    # 统计映射链接
-    if log_callback:
-        log_callback(f"\n 映射链接 / Mapping links:\n")
-        link_items = []
-        for item in os.listdir(parent_dir):
-            item_path = os.path.join(parent_dir, item)
-            if os.path.islink(item_path):
-                linked_projects += 1
-                link_items.append(item_path)
-
-        for item_path in link_items:
-            item = os.path.basename(item_path)
-            # 检查是否为隐藏文件
-            try:
-                attrs = ctypes.windll.kernel32.GetFileAttributesW(item_path)
-                is_hidden = bool(attrs & 0x2)  # FILE_ATTRIBUTE_HIDDEN
-                status = "隐藏/hidden" if is_hidden else "可见/visible"
-            except:
-                status = "未知/unknown"
-            log_callback(f"  {item} ({status}) -> {os.path.basename(os.readlink(item_path))}\n")
+    HEADINGS = {"seq": ("#", 60), "project": ("项目", 220), "status": ("状态", 70), "wall_seconds": ("耗时", 80),
+                "exit_code": ("退出码", 60), "output_bytes": ("输出大小", 90), "retries": ("重试", 50)}
+    STATUS_CHOICES = {"全部": "", "运行中": "running", "排队": "queued", "失败": "failed", "完成": "ok",
+                      "跳过": "skipped"}
+
+    def __init__(self, parent, on_retry=None):
+        self.model = JobList()
+        self.events = queue.SimpleQueue()
+        self.offset = 0
+        self.selected = None  # 选中任务的 pkg_path
+        self._shown = []  # Treeview 中每一行当前显示的值
+        self._row_height = 20
+        self._header_height = 24
+        self._rebuild_pending = False
+        self._last_rebuild = 0.0
+
+        self.frame = tk.Frame(parent)
+        toolbar = tk.Frame(self.frame)
+        toolbar.pack(fill="x", pady=2)
+        tk.Label(toolbar, text="状态:").pack(side="left")
+        self.status_choice = tk.StringVar(value="全部")
+        status_box = ttk.Combobox(toolbar, textvariable=self.status_choice, values=list(self.STATUS_CHOICES),
+                                  state="readonly", width=8)
+        status_box.pack(side="left", padx=(2, 8))
+        status_box.bind("<<ComboboxSelected>>", lambda e: self.apply_filters())
+        tk.Label(toolbar, text="筛选项目:").pack(side="left")
+        self.text_filter = tk.StringVar(value="")
+        self.text_filter.trace_add("write", lambda *args: self.apply_filters())
+        tk.Entry(toolbar, textvariable=self.text_filter, width=24).pack(side="left", padx=2)
+        self.retry_button = None
+        if on_retry:
+            self.retry_button = tk.Button(toolbar, text="🔁 重试失败项", command=on_retry)
+            self.retry_button.pack(side="left", padx=8)
+        self.summary = tk.StringVar(value="")
+        tk.Label(toolbar, textvariable=self.summary, font=("Consolas", 9)).pack(side="right")
+
+        panes = tk.PanedWindow(self.frame, orient="vertical", sashrelief="raised")
+        panes.pack(fill="both", expand=True)
+        table_frame = tk.Frame(panes)
+        self.tree = ttk.Treeview(table_frame, columns=JobList.COLUMNS, show="headings", selectmode="browse")
+        for column in JobList.COLUMNS:
+            text, width = self.HEADINGS[column]
+            self.tree.heading(column, text=text, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=column == "project",
+                             anchor="w" if column == "project" else "e")
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.detail = scrolledtext.ScrolledText(panes, font=("Consolas", 9), wrap="word", height=8)
+        panes.add(table_frame, stretch="always")
+        panes.add(self.detail, stretch="never")
+
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<ButtonRelease-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", self._on_wheel)
+        self.tree.bind("<Button-5>", self._on_wheel)
+
+    # --- 线程安全的入口 ---
+    def post(self, event):
+        """任意线程调用：只把事件放入队列"""
+        self.events.put(event)
+
+    def start(self):
+        self.tree.after(JOB_TABLE_REFRESH_MS, self._tick)
+
+    def clear(self):
+        self.model.clear()
+        self.offset = 0
+        self.selected = None
+        self.detail.delete(1.0, tk.END)
+        self.refresh()
+
+    def _tick(self):
+        try:
+            self.flush()
+        finally:
+            self.tree.after(JOB_TABLE_REFRESH_MS, self._tick)
+
+    def flush(self):
+        """取出全部事件一次性应用，再刷新可见行（只能在主线程调用）"""
+        changed = []
+        try:
+            while True:
+                changed.append(self.model.update(self.events.get_nowait()))
+        except queue.Empty:
+            pass
+        if changed:
+            if not self.model.is_identity_view:
+                self._rebuild_pending = True
+            if self.selected and any(row["pkg_path"] == self.selected for row in changed):
+                self.show_detail()
+        if self._rebuild_pending and time.monotonic() - self._last_rebuild >= JOB_TABLE_RESORT_MS / 1000:
+            self.rebuild()
+        elif changed:
+            self.refresh()
+        return len(changed)
+
+    # --- 排序与筛选 ---
+    def rebuild(self):
+        self._rebuild_pending = False
+        self._last_rebuild = time.monotonic()
+        self.model.rebuild()
+        self.refresh()
+
+    def sort_by(self, column):
+        """点击表头排序；再次点击同一列切换升降序，第三次恢复原始顺序"""
+        model = self.model
+        if model.sort_column != column:
+            model.sort_column, model.sort_reverse = column, False
+        elif not model.sort_reverse:
+            model.sort_reverse = True
+        else:
+            model.sort_column, model.sort_reverse = None, False
+        for name in JobList.COLUMNS:
+            text = self.HEADINGS[name][0]
+            if name == model.sort_column:
+                text += " ▼" if model.sort_reverse else " ▲"
+            self.tree.heading(name, text=text)
+        self.rebuild()
+
+    def apply_filters(self):
+        self.model.status_filter = self.STATUS_CHOICES.get(self.status_choice.get(), "")
+        self.model.text_filter = self.text_filter.get().strip()
+        self.offset = 0
+        self.rebuild()
+
+    # --- 虚拟滚动 ---
+    def capacity(self):
+        """Treeview 当前高度能完整显示的行数"""
+        children = self.tree.get_children()
+        if children:
+            bbox = self.tree.bbox(children[0])
+            if bbox:
+                self._header_height, self._row_height = bbox[1], bbox[3]
+        return max(1, (self.tree.winfo_height() - self._header_height) // self._row_height)
+
+    def scroll_to(self, offset):
+        capacity = self.capacity()
+        self.offset = max(0, min(int(offset), len(self.model.view) - capacity))
+        self.refresh()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self.model.view))
+        elif action == "scroll":
+            step = self.capacity() if unit == "pages" else 1
+            self.scroll_to(self.offset + int(value) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def refresh(self):
+        """只改写 Treeview 中可见的行；内容未变化的行不触碰"""
+        model = self.model
+        view = model.view
+        capacity = self.capacity()
+        self.offset = max(0, min(self.offset, len(view) - capacity))
+        rows = view[self.offset:self.offset + capacity]
+
+        # 行数与可见任务数保持一致
+        while len(self._shown) < len(rows):
+            self.tree.insert("", "end", iid=str(len(self._shown)))
+            self._shown.append(None)
+        while len(self._shown) > len(rows):
+            self._shown.pop()
+            self.tree.delete(str(len(self._shown)))
+
+        selected_iid = ()
+        for i, pkg_path in enumerate(rows):
+            values = model.display_values(model.jobs[pkg_path])
+            if self._shown[i] != values:
+                self.tree.item(str(i), values=values)
+                self._shown[i] = values
+            if pkg_path == self.selected:
+                selected_iid = (str(i),)
+        if self.tree.selection() != selected_iid:
+            self.tree.selection_set(selected_iid)
+
+        total = len(view)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + len(rows)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        counts = model.counts()
+        self.summary.set(f"显示 {total} / 共 {len(model)}，运行中 {counts.get('running', 0)}，"
+                         f"失败 {counts.get('failed', 0)}")
+
+    # --- 单个任务的输出 ---
+    def _on_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        if not iid:
+            return
+        position = self.offset + int(iid)
+        if position < len(self.model.view):
+            self.selected = self.model.view[position]
+            self.show_detail()
 
-    if log_callback:
-        log_callback(f"\n 总体统计 / Overall statistics:\n")
-        log_callback(f"  总项目数 / Total projects: {total_projects}\n")
-        log_callback(f"  映射链接数 / Mapping links: {linked_projects}\n")
-        log_callback(f"  未映射项目数 / Unmapped projects: {total_projects - linked_projects}\n")
+    def show_detail(self):
+        row = self.model.jobs.get(self.selected)
+        self.detail.delete(1.0, tk.END)
+        if row:
+            self.detail.insert(tk.END, row["output"] or f"{row['pkg_path']}\n（任务尚未结束 / no output yet）\n")
 
 
 class RePKG_GUI:
@@ -323,6 +587,9 @@ class RePKG_GUI:
 
         # --- UI Initialization / Data Setup ---
         self.initialize_data()
+        # 同一时间只运行一个批次；last_batch 为上一个批次的 (settings, summary)，重试失败项时沿用其备份
+        self.batch_running = False
+        self.last_batch = None
 
         title = f"{self.config['app_name']} {self.config['version']} ({self.config['platform']}) - {self.config['author']}"
         self.root.title(title)
@@ -348,6 +615,7 @@ class RePKG_GUI:
         self.create_config_tab()  # 1. 重命名并调整布局
         self.create_classify_tab()
         self.create_backup_restore_tab()  # 新增备份还原标签页
+        self.create_gallery_tab()
         self.create_about_tab()
 
         # === 日志区域 (Row 1, independent) ===
@@ -360,6 +628,8 @@ class RePKG_GUI:
 
         # 首次加载时更新预览
         self.root.after(100, self.update_preview)
+        # 上次的批量任务被中断时询问是否继续
+        self.root.after(300, self.check_unfinished_batch)
 
     def initialize_data(self):
         """初始化配置和Tkinter变量 (使用 StringVar)"""
@@ -391,18 +661,44 @@ class RePKG_GUI:
         self.python_options = {
             "复制预览图像 (preview.*)": tk.BooleanVar(value=self.config.get("copy_preview", True)),
             "原地替换模式自动备份": tk.BooleanVar(value=self.config.get("auto_backup", True)),
+            "增量提取（跳过未变化的包）": tk.BooleanVar(value=self.config.get("incremental", True)),
+            "增量提取时校验内容哈希（较慢）": tk.BooleanVar(value=self.config.get("manifest_hash", False)),
+            "使用内置 TEX 解码器（需要 NumPy）": tk.BooleanVar(value=self.config.get("tex_builtin", False)),
         }
         self.classify_options = {
             "创建透明映射（隐藏链接）": tk.BooleanVar(value=True),
         }
+        # 选择性提取过滤规则（逗号分隔，支持 glob 与扩展名）
+        self.include_filters = tk.StringVar(value=self.config.get("include_filters", ""))
+        self.exclude_filters = tk.StringVar(value=self.config.get("exclude_filters", ""))
+        # 并发任务数
+        self.workers = tk.IntVar(value=self.config.get("workers", default_worker_count()))
+
+        # 原地替换模式的备份方式
+        self.backup_mode = tk.StringVar(value=self.config.get("backup_mode", "hardlink"))
+        self.archive_format = tk.StringVar(value=self.config.get("archive_format", "zip"))
+        self.archive_level = tk.IntVar(value=self.config.get("archive_level", 1))
+        self.backup_names = []  # 与备份列表框中的行一一对应
+        # 备份保留规则（0 表示不限制）
+        self.backup_keep_last = tk.IntVar(value=self.config.get("backup_keep_last", 0))
+        self.backup_keep_days = tk.IntVar(value=self.config.get("backup_keep_days", 0))
+        self.backup_max_gb = tk.DoubleVar(value=self.config.get("backup_max_gb", 0))
+        # 预览图库根目录（输入根目录或分类根目录）
+        self.gallery_dir = tk.StringVar(value=self.config.get("input_dir", "") or default_classify_dir)
+        self.gallery_status = tk.StringVar(value="")
+        self._gallery_loaded_dir = None
+
+        # 命令预览：输入变化后防抖刷新；示例包按输入目录缓存，目录 mtime 变化时才重新查找
+        self._preview_job = None
+        self._sample_pkg_cache = None  # (输入目录, mtime_ns, 示例包路径)
 
         # Bindings for preview update
-        self.repkg_path.trace_add("write", lambda *args: self.update_preview())
-        self.input_entry.trace_add("write", lambda *args: self.update_preview())
-        self.output_entry.trace_add("write", lambda *args: self.update_preview())
-        self.mode.trace_add("write", lambda *args: self.update_preview())
+        self.repkg_path.trace_add("write", lambda *args: self.schedule_preview())
+        self.input_entry.trace_add("write", lambda *args: self.schedule_preview())
+        self.output_entry.trace_add("write", lambda *args: self.schedule_preview())
+        self.mode.trace_add("write", lambda *args: self.schedule_preview())
         for var in self.options.values():
-            var.trace_add("write", lambda *args: self.update_preview())
+            var.trace_add("write", lambda *args: self.schedule_preview())
 
     def pack_path_selector(self, parent_frame, label_text, var_control, button_command):
         """Helper to create a path entry with a browse button."""
@@ -414,6 +710,12 @@ class RePKG_GUI:
         tk.Entry(frame_selector, textvariable=var_control).pack(side="left", fill="x", expand=True)
         tk.Button(frame_selector, text="浏览", command=button_command).pack(side="left", padx=5)
 
+    def pack_text_entry(self, parent_frame, label_text, var_control):
+        """Helper to create a labeled single-line text entry."""
+
+        tk.Label(parent_frame, text=label_text, font=("Arial", 10, "bold")).pack(anchor="w", padx=0, pady=(10, 2))
+        tk.Entry(parent_frame, textvariable=var_control).pack(fill="x", padx=0, pady=2)
+
     def pack_mode_selector(self, parent_frame, label_text, var_control, modes):
         """Helper to create radio buttons for mode selection."""
 
@@ -440,6 +742,23 @@ class RePKG_GUI:
         for text, var in options_dict.items():
             tk.Checkbutton(frame_opts, text=text, variable=var).pack(anchor="w")
 
+    def pack_radio_group(self, parent_frame, label_text, var_control, choices):
+        """Helper to create radio buttons from a {value: label} dict."""
+
+        tk.Label(parent_frame, text=label_text, font=("Arial", 10, "bold")).pack(anchor="w", padx=0, pady=(10, 2))
+        frame_opts = tk.Frame(parent_frame)
+        frame_opts.pack(anchor="w", padx=10, pady=2)
+
+        for value, text in choices.items():
+            tk.Radiobutton(frame_opts, text=text, variable=var_control, value=value).pack(anchor="w")
+
+    def pack_spinbox(self, parent_frame, label_text, var_control, from_, to):
+        """Helper to create a labeled spinbox for integer options."""
+
+        tk.Label(parent_frame, text=label_text, font=("Arial", 10, "bold")).pack(anchor="w", padx=0, pady=(10, 2))
+        tk.Spinbox(parent_frame, from_=from_, to=to, width=6, textvariable=var_control).pack(anchor="w", padx=10,
+                                                                                             pady=2)
+
     def create_config_tab(self):
         """
         创建配置标签页，重命名为 'RePKG'，并使用左右两栏布局
@@ -472,10 +791,18 @@ class RePKG_GUI:
                                 self.input_entry, self.select_input_dir)
         self.pack_path_selector(left_frame, "输出根目录 (可与输入目录相同，将启用原地替换与备份):",
                                 self.output_entry, self.select_output_dir)
+        self.pack_text_entry(left_frame, "仅提取（逗号分隔，如 scene.json, shaders/*, mp3；留空为全部）:",
+                             self.include_filters)
+        self.pack_text_entry(left_frame, "排除条目（逗号分隔，如 *.tex, .mp4）:", self.exclude_filters)
 
         # === 右栏组件 (模式和选项) ===
         self.pack_checkbox_group(right_frame, "RePKG 命令选项:", self.options)
         self.pack_checkbox_group(right_frame, "Python 脚本选项:", self.python_options)
+        self.pack_radio_group(right_frame, "原地替换备份方式:", self.backup_mode, repkg_core.BACKUP_MODES)
+        self.pack_radio_group(right_frame, "压缩归档格式:", self.archive_format,
+                              {fmt: fmt for fmt in backup_store.ARCHIVE_FORMATS})
+        self.pack_spinbox(right_frame, "压缩级别（0 不压缩，9 最小体积）:", self.archive_level, 0, 9)
+        self.pack_spinbox(right_frame, "并发任务数（同时运行的 RePKG 进程）:", self.workers, 1, 64)
 
         # --- 命令预览 (Row 1) ---
         preview_frame = ttk.LabelFrame(config_frame, text="命令预览（Windows CMD 格式）", padding="10")
@@ -550,31 +877,67 @@ class RePKG_GUI:
         list_scroll = tk.Scrollbar(list_frame)
         list_scroll.grid(row=0, column=1, sticky="ns")
 
-        self.backup_listbox = tk.Listbox(list_frame, height=10, yscrollcommand=list_scroll.set, font=("Consolas", 10))
+        # exportselection=False：两个列表的选中状态互不影响
+        self.backup_listbox = tk.Listbox(list_frame, height=10, yscrollcommand=list_scroll.set, font=("Consolas", 10),
+                                         exportselection=False)
         self.backup_listbox.grid(row=0, column=0, sticky="nsew")
         list_scroll.config(command=self.backup_listbox.yview)
 
+        # 选中批次中的项目（可多选，只还原部分项目）
+        tk.Label(list_frame, text="批次中的项目（可按住 Ctrl / Shift 多选，只还原选中的项目）:").grid(
+            row=1, column=0, columnspan=2, sticky="w", pady=(8, 2))
+        project_scroll = tk.Scrollbar(list_frame)
+        project_scroll.grid(row=2, column=1, sticky="ns")
+        self.backup_project_listbox = tk.Listbox(list_frame, height=6, selectmode="extended",
+                                                 yscrollcommand=project_scroll.set, font=("Consolas", 10),
+                                                 exportselection=False)
+        self.backup_project_listbox.grid(row=2, column=0, sticky="nsew")
+        project_scroll.config(command=self.backup_project_listbox.yview)
+
         # 底部操作按钮
         control_frame = tk.Frame(list_frame)
-        control_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        control_frame.grid(row=3, column=0, columnspan=2, sticky="ew", pady=(10, 0))
 
         tk.Button(control_frame, text="🔄 刷新备份列表", command=self.refresh_backups_list).pack(side="left", padx=5)
         tk.Button(control_frame, text="↩️ 还原选中批次", bg="#F44336", fg="white",
                   font=("Arial", 10, "bold"), command=self.start_restore_task).pack(side="left", padx=5)
+        tk.Button(control_frame, text="↩️ 还原选中项目", bg="#FF9800", fg="white", font=("Arial", 10, "bold"),
+                  command=lambda: self.start_restore_task(selected_only=True)).pack(side="left", padx=5)
 
         self.backup_listbox.bind("<<ListboxSelect>>", self.on_backup_select)  # 绑定选择事件
 
+        # === 保留策略 (Row 2) ===
+        retention_frame = ttk.LabelFrame(bkr_frame, text="保留策略（0 表示不限制；原地替换任务结束后自动清理最旧的批次）",
+                                         padding="10")
+        retention_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
+        for column, (label, var, to, increment) in enumerate([
+                ("保留最近批次数:", self.backup_keep_last, 999, 1),
+                ("保留天数:", self.backup_keep_days, 3650, 1),
+                ("总大小上限 (GB):", self.backup_max_gb, 100000, 0.5)]):
+            tk.Label(retention_frame, text=label).grid(row=0, column=column * 2, sticky="w", padx=(0, 2))
+            tk.Spinbox(retention_frame, from_=0, to=to, increment=increment, width=7, textvariable=var).grid(
+                row=0, column=column * 2 + 1, sticky="w", padx=(0, 15))
+        tk.Button(retention_frame, text="🔍 预览清理", command=lambda: self.start_prune_task(dry_run=True)).grid(
+            row=0, column=6, padx=5)
+        tk.Button(retention_frame, text="🧹 立即清理", bg="#795548", fg="white", font=("Arial", 10, "bold"),
+                  command=self.start_prune_task).grid(row=0, column=7, padx=5)
+
         # 首次加载时刷新列表
         self.root.after(200, self.refresh_backups_list)
 
     def on_backup_select(self, event):
         """在选中备份时更新日志提示"""
-        selection = self.backup_listbox.curselection()
-        if selection:
-            backup_name = self.backup_listbox.get(selection[0])
-            self.log_box.insert(tk.END,
-                                f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 已选中批次备份: {backup_name}\n")
-            self.log_box.see(tk.END)
+        backup_name = self.get_selected_backup()
+        self.backup_project_listbox.delete(0, tk.END)
+        if backup_name:
+            try:
+                projects = repkg_core.list_backup_projects(self.unified_backup_root.get().strip(), backup_name)
+            except OSError:
+                projects = []
+            for project in projects:
+                self.backup_project_listbox.insert(tk.END, project)
+            self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 已选中批次备份: {backup_name}"
+                            f"（{len(projects)} 个项目）\n")
 
     def create_log_area(self, parent):
         """创建日志区域，作为独立于标签页的区域，并返回框架"""
@@ -583,8 +946,17 @@ class RePKG_GUI:
         log_area_frame = tk.LabelFrame(parent, text="📝 运行日志", padx=5, pady=5)
         # log_area_frame 不再在内部 pack，而是返回给 __init__ 进行 grid 布局
 
+        # 日志与任务表分为两页：批量提取时每个包一行，单个任务的输出在任务表中查看
+        self.log_notebook = ttk.Notebook(log_area_frame)
+        self.log_notebook.pack(fill="both", expand=True)
+        log_page = tk.Frame(self.log_notebook)
+        self.log_notebook.add(log_page, text="日志")
+        self.job_table = JobTable(self.log_notebook, on_retry=self.retry_failed_jobs)
+        self.log_notebook.add(self.job_table.frame, text="任务")
+        self.job_table.start()
+
         # 日志控制按钮
-        log_control_frame = tk.Frame(log_area_frame)
+        log_control_frame = tk.Frame(log_page)
         log_control_frame.pack(fill="x", pady=2)
 
         tk.Button(log_control_frame, text="清空日志", command=self.clear_log).pack(side="left", padx=5)
@@ -598,14 +970,47 @@ class RePKG_GUI:
         self.auto_scroll_button.pack(side="left", padx=5)
 
         # 日志显示区域
-        self.log_box = scrolledtext.ScrolledText(log_area_frame,
+        self.log_box = scrolledtext.ScrolledText(log_page,
                                                  font=("Consolas", 9),
                                                  wrap="word")
         # 使用 fill="both", expand=True 确保它占用父框架（log_area_frame）的所有空间
         self.log_box.pack(fill="both", expand=True, padx=5, pady=5)
 
+        # 所有日志写入都经由管道，由主线程定时合并刷新
+        self.log_pipeline = LogPipeline(self.root, self.log_box, should_scroll=lambda: self.auto_scroll)
+        self.log_pipeline.start()
+
         return log_area_frame  # 返回框架，由 __init__ 中的 grid 管理
 
+    def create_gallery_tab(self):
+        """创建预览图库标签页：按需加载，首次切换到该页时才列出项目"""
+        gallery_frame = ttk.Frame(self.notebook)
+        self.notebook.add(gallery_frame, text="🖼 预览图库")
+
+        frame_dir = tk.Frame(gallery_frame)
+        frame_dir.pack(fill="x", padx=10, pady=(10, 2))
+        tk.Label(frame_dir, text="图库目录:", font=("Arial", 10, "bold")).pack(side="left")
+        tk.Entry(frame_dir, textvariable=self.gallery_dir).pack(side="left", fill="x", expand=True, padx=5)
+        tk.Button(frame_dir, text="浏览", command=self.select_gallery_dir).pack(side="left", padx=2)
+        tk.Button(frame_dir, text="输入目录",
+                  command=lambda: self.load_gallery(self.input_entry.get().strip())).pack(side="left", padx=2)
+        tk.Button(frame_dir, text="分类目录",
+                  command=lambda: self.load_gallery(self.classify_dir.get().strip())).pack(side="left", padx=2)
+        tk.Button(frame_dir, text="🔄 刷新", command=lambda: self.load_gallery(force=True)).pack(side="left", padx=2)
+
+        status = "双击打开项目文件夹" if PIL_AVAILABLE else "双击打开项目文件夹（未安装 Pillow，仅显示 PNG / GIF 预览图）"
+        tk.Label(gallery_frame, textvariable=self.gallery_status, anchor="w").pack(fill="x", padx=10)
+        self.gallery_status.set(status)
+
+        self.gallery = ThumbnailGallery(gallery_frame)
+        self.gallery.frame.pack(fill="both", expand=True, padx=10, pady=(2, 10))
+
+        def on_tab_changed(event):
+            if self.notebook.select() == str(gallery_frame) and self._gallery_loaded_dir is None:
+                self.load_gallery()
+
+        self.notebook.bind("<<NotebookTabChanged>>", on_tab_changed, add="+")
+
     def create_about_tab(self):
         """创建关于标签页"""
         about_frame = ttk.Frame(self.notebook)
@@ -878,11 +1283,16 @@ class RePKG_GUI:
         main_buttons = tk.Frame(control_frame)
         main_buttons.pack(side="left")
 
-        tk.Button(main_buttons, text="🚀 运行任务", bg="#4CAF50", fg="white",
-                  font=("Arial", 11, "bold"), command=self.start_task).pack(side="left", padx=5)
+        self.run_button = tk.Button(main_buttons, text="🚀 运行任务", bg="#4CAF50", fg="white",
+                                    font=("Arial", 11, "bold"), command=self.start_task)
+        self.run_button.pack(side="left", padx=5)
         tk.Button(main_buttons, text="💾 保存配置", command=self.save_config).pack(side="left", padx=5)
         tk.Button(main_buttons, text="📁 打开输出目录", command=self.open_output_dir).pack(side="left", padx=5)
 
+        # 运行进度（已发现 / 已处理）
+        self.progress_text = tk.StringVar(value="")
+        tk.Label(control_frame, textvariable=self.progress_text, font=("Consolas", 9)).pack(side="right", padx=5)
+
         return control_frame  # 返回框架，由 __init__ 中的 grid 管理
 
     # ------------------------------------------------------------
@@ -909,6 +1319,11 @@ class RePKG_GUI:
         if path:
             self.classify_dir.set(path)
 
+    def select_gallery_dir(self):
+        path = filedialog.askdirectory(title="选择图库目录")
+        if path:
+            self.load_gallery(path)
+
     def select_unified_backup_root(self):
         """选择备份还原的统一备份根目录 """
         path = filedialog.askdirectory(title="选择统一备份根目录")
@@ -935,7 +1350,7 @@ class RePKG_GUI:
     def clear_log(self):
         """清空日志"""
         self.log_box.delete(1.0, tk.END)
-        self.log_box.insert(tk.END, f"📝 [{datetime.datetime.now().strftime('%H:%M:%S')}] 日志已清空\n")
+        self.append_log(f"📝 [{datetime.datetime.now().strftime('%H:%M:%S')}] 日志已清空\n")
 
     def save_log(self):
         """保存日志到文件"""
@@ -969,45 +1384,14 @@ class RePKG_GUI:
     #  配置保存/加载
     # ------------------------------------------------------------
     def load_config(self):
-        # 默认配置
-        default_config = {
-            "app_name": "RePKG 批量提取 GUI",
-            "version": "v4 (Modified)",
-            "platform": "Windows 版",
-            "author": "by YuefChen",
-            "repkg_path": os.path.join(os.getcwd(), "RePKG.exe"),
-            "input_dir": "",
-            "output_dir": "",
-            "mode": "extract",
-            "tex": True,
-            "copyproject": True,
-            "usename": True,
-            "overwrite": True,
-            "recursive": True,
-            "copy_preview": True,
-            "auto_backup": True,
-            "classify_dir": "",
-            "unified_backup_root": ""
-        }
-
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                    loaded_config = json.load(f)
-
-                    # 合并默认配置和加载的配置
-                    for key, value in default_config.items():
-                        if key not in loaded_config:
-                            loaded_config[key] = value
-                    # 移除旧的不需要的配置项
-                    return loaded_config
-            except Exception:
-                return default_config
-        return default_config
+        return repkg_core.load_config(CONFIG_FILE)
 
-    def save_config(self):
-        # 更新当前配置 (使用 .get() 获取 StringVar/BooleanVar 的值)
-        self.config.update({
+    def get_settings(self):
+        """
+        读取界面上的当前设置，返回与 repkg_config.json 键一致的字典
+        必须在主线程调用；后台任务使用该快照，不再访问 Tk 变量
+        """
+        return {
             "repkg_path": self.repkg_path.get().strip(),
             "input_dir": self.input_entry.get().strip(),
             "output_dir": self.output_entry.get().strip(),
@@ -1019,135 +1403,123 @@ class RePKG_GUI:
             "recursive": self.options["-r, --recursive (递归搜索)"].get(),
             "copy_preview": self.python_options["复制预览图像 (preview.*)"].get(),
             "auto_backup": self.python_options["原地替换模式自动备份"].get(),
+            "backup_mode": self.backup_mode.get(),
+            "archive_format": self.archive_format.get(),
+            "archive_level": self.get_archive_level(),
+            **self.get_retention_settings(),
+            "incremental": self.python_options["增量提取（跳过未变化的包）"].get(),
+            "manifest_hash": self.python_options["增量提取时校验内容哈希（较慢）"].get(),
+            "tex_builtin": self.python_options["使用内置 TEX 解码器（需要 NumPy）"].get(),
+            "include_filters": self.include_filters.get().strip(),
+            "exclude_filters": self.exclude_filters.get().strip(),
+            "workers": self.get_worker_count(),
             "classify_dir": self.classify_dir.get().strip(),
             "unified_backup_root": self.unified_backup_root.get().strip(),
-        })
+        }
+
+    def save_config(self):
+        # 更新当前配置 (使用 .get() 获取 StringVar/BooleanVar 的值)
+        self.config.update(self.get_settings())
 
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.config, f, ensure_ascii=False, indent=2)
+        repkg_core.save_config(self.config, CONFIG_FILE)
         messagebox.showinfo("保存成功", f"配置已保存到 {CONFIG_FILE}")
 
     # ------------------------------------------------------------
     #  命令生成（确保Windows路径）
     # ------------------------------------------------------------
-    def build_command(self, pkg_path):
-        exe_path = self.repkg_path.get().strip()
-        if not os.path.isfile(exe_path):
-            raise FileNotFoundError(f"未找到 RePKG 可执行文件: {exe_path}")
-
-        project_name = self.get_project_name(pkg_path)
-        output_root = self.output_entry.get().strip() or "./output"
-        output_dir = os.path.join(output_root, project_name)
-        os.makedirs(output_dir, exist_ok=True)
-
-        # 使用 Windows 路径（反斜杠 + 引号）
-        cmd = [win_path(exe_path), self.mode.get()]
-        for key, var in self.options.items():
-            if var.get():
-                # 提取选项参数
-                if ',' in key:
-                    option = key.split(',')[0].strip()
-                else:
-                    option = key.split(' (')[0].strip()
-                cmd.append(option)
-
-        cmd += ["-o", win_path(output_dir), win_path(pkg_path)]
-        return cmd
+    def preview_command(self, pkg_path):
+        return repkg_core.preview_command(self.get_settings(), pkg_path)
 
     # ------------------------------------------------------------
     #  扫描 .pkg 文件
     # ------------------------------------------------------------
-    def scan_pkg_files(self, root_dir):
-        pkg_list = []
+    def iter_pkg_files(self, root_dir):
+        """逐个产出 .pkg 文件路径，使提取可以在扫描完成前开始"""
         # 根据 -r, --recursive 选项判断是否递归搜索
         recursive = self.options["-r, --recursive (递归搜索)"].get()
+        return repkg_core.iter_pkg_files(root_dir, recursive)
 
-        # glob.iglob 在 Python 3.5+ 支持 recursive=True
-        # 但是 os.walk 更可靠且不需要依赖版本
-        for dirpath, _, filenames in os.walk(root_dir):
-            for f in filenames:
-                if f.lower().endswith(".pkg"):
-                    pkg_list.append(os.path.join(dirpath, f))
-
-            # 如果不递归，跳过子目录
-            if not recursive:
-                break  # 只处理一层目录
-
-        return pkg_list
-
-    def get_project_name(self, pkg_path):
-        """获取项目名称（pkg文件所在目录的名称）"""
-        pkg_dir = os.path.dirname(pkg_path)
-        # 如果是递归搜索，项目名是相对于输入根目录的路径，但RePKG默认使用pkg所在目录名作为项目名，这里保持一致
-        return os.path.basename(pkg_dir)
-
-    def find_preview_image(self, pkg_path):
-        """查找与pkg文件同级的preview图像文件"""
-        pkg_dir = os.path.dirname(pkg_path)
-        pkg_name = os.path.splitext(os.path.basename(pkg_path))[0]
-
-        # 支持的图像格式
-        image_extensions = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.bmp', '*.tiff', '*.webp']
-
-        # 查找preview开头的图像文件
-        for ext in image_extensions:
-            pattern = os.path.join(pkg_dir, f"preview{ext}")
-            matches = glob.glob(pattern, recursive=False)
-            if matches:
-                return matches[0]  # 返回第一个匹配的文件
-
-        # 如果没找到preview开头的，查找与pkg同名的图像文件
-        for ext in image_extensions:
-            pattern = os.path.join(pkg_dir, f"{pkg_name}{ext}")
-            matches = glob.glob(pattern, recursive=False)
-            if matches:
-                return matches[0]
-
-        return None
-
-    def copy_preview_image(self, pkg_path, output_dir):
+    # ------------------------------------------------------------
+    #  执行批量任务
+    # ------------------------------------------------------------
+    def append_log(self, message):
         """
-        拷贝预览图像到输出目录，并同步拷贝 project.json
-        - 拷贝 preview 图像只有在 options 启用时发生
-        - project.json 始终同步拷贝
+        向日志区域追加内容（可在任意线程调用）
+        消息进入日志管道，由主线程按固定帧率合并写入
         """
-        success_preview = False
-
-        # 拷贝 preview 图像（受选项控制）
-        if self.python_options["复制预览图像 (preview.*)"].get():
-            preview_path = self.find_preview_image(pkg_path)
-            if preview_path:
-                try:
-                    os.makedirs(output_dir, exist_ok=True)
-                    # 获取预览图像的文件名和扩展名
-                    preview_filename = os.path.basename(preview_path)
-                    preview_name, preview_ext = os.path.splitext(preview_filename)
-                    # 如果预览图像不是preview开头，重命名为preview
-                    if not preview_name.lower().startswith('preview'):
-                        preview_filename = f"preview{preview_ext}"
-                    dest_path = os.path.join(output_dir, preview_filename)
-                    shutil.copy2(preview_path, dest_path)
-                    success_preview = True
-                except Exception as e:
-                    self.log_box.insert(tk.END, f"[Error] 拷贝预览图像失败: {e}\n")
-
-        # 无论是否拷贝preview，总是尝试同步拷贝 project.json
+        self.log_pipeline.write(message)
+
+    def get_archive_level(self):
+        """读取压缩级别（0-9），非法输入时回退到 1"""
         try:
-            pkg_dir = os.path.dirname(pkg_path)
-            project_json_src = os.path.join(pkg_dir, "project.json")
-            if os.path.isfile(project_json_src):
-                os.makedirs(output_dir, exist_ok=True)
-                dest_project_json = os.path.join(output_dir, "project.json")
-                shutil.copy2(project_json_src, dest_project_json)
-        except Exception as e:
-            self.log_box.insert(tk.END, f"[Error] 同步拷贝 project.json 失败: {e}\n")
+            return max(0, min(9, int(self.archive_level.get())))
+        except (tk.TclError, ValueError):
+            return 1
+
+    def get_retention_settings(self):
+        """读取备份保留规则，非法输入时视为不限制（0）"""
+        values = {}
+        for key, var in (("backup_keep_last", self.backup_keep_last), ("backup_keep_days", self.backup_keep_days),
+                         ("backup_max_gb", self.backup_max_gb)):
+            try:
+                values[key] = max(0, var.get())
+            except (tk.TclError, ValueError):
+                values[key] = 0
+        return values
 
-        return success_preview
+    def get_worker_count(self):
+        """读取并发任务数，非法输入时回退到默认值"""
+        try:
+            return max(1, int(self.workers.get()))
+        except (tk.TclError, ValueError):
+            return default_worker_count()
 
-    # ------------------------------------------------------------
-    #  执行批量任务
-    # ------------------------------------------------------------
-    def start_task(self):
+    def check_unfinished_batch(self):
+        """输出目录中留有任务日志（上次的批次未正常结束）时，询问是否只继续未完成的包"""
+        output_dir = self.output_entry.get().strip()
+        state = job_journal.replay(output_dir) if output_dir else None
+        if state is None:
+            return
+        # 继续运行时使用上次的输入目录；选项与上次不同时不能继续，否则按旧选项提取的包会被跳过
+        settings = self.get_settings()
+        settings["input_dir"] = state.input_dir or settings["input_dir"]
+        reason = repkg_core.check_resume(settings, state)
+        if reason:
+            if messagebox.askyesno("无法继续上次的任务",
+                                   f"上次的批量提取没有正常结束，但当前设置与上次不同，无法继续：\n{reason}\n\n"
+                                   "是否放弃上次的任务日志？选择“否”则保留日志，恢复上次的设置后重新启动即可继续。"):
+                job_journal.discard(output_dir)
+            return
+        backup = f"\n将沿用已有的备份 {os.path.basename(state.backup_path)}。" if state.backup_path else ""
+        if messagebox.askyesno("继续上次的任务",
+                               f"上次的批量提取没有正常结束：\n{state.input_dir}\n\n"
+                               f"已完成 {len(state.completed)} 个包，{len(state.interrupted)} 个包提取到一半，"
+                               f"{len(state.failed)} 个包失败。\n\n是否继续？已完成的包将被跳过。{backup}"):
+            if state.input_dir:
+                self.input_entry.set(state.input_dir)
+            self.start_task(resume=state)
+        else:
+            job_journal.discard(output_dir)
+
+    def set_batch_running(self, running):
+        """在主线程中切换批次运行状态：运行期间禁用“运行任务”与“重试失败项”"""
+        self.batch_running = running
+        state = "disabled" if running else "normal"
+        self.run_button.config(state=state)
+        if self.job_table.retry_button:
+            self.job_table.retry_button.config(state=state)
+
+    def finish_batch(self, settings, summary):
+        """批次结束（在主线程中调用）"""
+        if summary is not None:
+            self.last_batch = (settings, summary)
+        self.set_batch_running(False)
+
+    def start_task(self, resume=None):
+        # 两个批次同时写入同一输出目录会互相覆盖任务日志与增量清单，原地替换时还会各自创建备份批次
+        if self.batch_running:
+            messagebox.showinfo("提示", "已有批量任务正在运行，请等待其结束。")
+            return
         input_dir = self.input_entry.get().strip()
         output_dir = self.output_entry.get().strip()
 
@@ -1162,139 +1534,60 @@ class RePKG_GUI:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
 
-        pkg_files = self.scan_pkg_files(input_dir)
-        if not pkg_files:
-            messagebox.showinfo("提示", "未找到任何 .pkg 文件。")
-            return
-
         self.log_box.delete(1.0, tk.END)
-        self.log_box.insert(tk.END,
-                            f"[{datetime.datetime.now().strftime('%H:%M:%S')}] 发现 {len(pkg_files)} 个 .pkg 文件，开始处理...\n\n")
-
-        self.update_preview(pkg_files[0])
-        threading.Thread(target=self.run_batch, args=(pkg_files,), daemon=True).start()
-
-    def prepare_backup_environment(self, output_dir_root, is_in_place_replace):
-        """准备统一备份环境 / Prepare unified backup environment"""
-        if not is_in_place_replace:
-            return None
-
-        self.log_box.insert(tk.END,
-                            "[Warning] ⚠️ 原地替换模式已激活：提取前将自动备份现有文件到统一备份目录 `/.unified_backup/`。\n\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-
-        unified_backup_root = os.path.join(output_dir_root, ".unified_backup")
-        os.makedirs(unified_backup_root, exist_ok=True)
-        set_file_hidden(unified_backup_root)
-
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        batch_backup_path = os.path.join(unified_backup_root, f"backup_{timestamp}")
-        os.makedirs(batch_backup_path, exist_ok=True)
-
-        self.log_box.insert(tk.END, f"🕒 批次备份目录已创建: {os.path.basename(batch_backup_path)}\n\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-        return batch_backup_path
-
-    def backup_project(self, project_path, project_name, batch_backup_path):
-        """备份当前项目文件到统一目录 / Backup one project into unified backup path"""
-        project_backup_path = os.path.join(batch_backup_path, project_name)
-        os.makedirs(project_backup_path, exist_ok=True)
-
-        self.log_box.insert(tk.END, f"  → 正在备份项目 {project_name}...\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-
-        copied_count = 0
-        for item in os.listdir(project_path):
-            src = os.path.join(project_path, item)
-            dst = os.path.join(project_backup_path, item)
-            try:
-                if os.path.isdir(src):
-                    shutil.copytree(src, dst)
-                else:
-                    shutil.copy2(src, dst)
-                copied_count += 1
-            except Exception as e:
-                self.log_box.insert(tk.END, f"  [Warning] 备份失败: {item} ({e})\n")
-
-        if copied_count > 0:
-            self.log_box.insert(tk.END, f"  ✅ 已备份 {copied_count} 个文件。\n")
+        self.append_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] 开始扫描 .pkg 文件并同步处理...\n\n")
+        self.job_table.clear()
+        self.log_notebook.select(self.job_table.frame)
+
+        # 扫描在后台线程中以生成器形式进行，边发现边提取
+        settings = self.get_settings()
+        self.last_batch = None
+        self.set_batch_running(True)
+        threading.Thread(target=self.run_batch, args=(self.iter_pkg_files(input_dir), settings, resume),
+                         daemon=True).start()
+
+    def retry_failed_jobs(self):
+        """
+        只重新提取任务表中失败的包，任务表保留并累计重试次数
+        使用原批次的设置并沿用其备份目录：已开始提取的项目可能已被部分覆盖，不能再作为原始文件备份
+        """
+        if self.batch_running:
+            messagebox.showinfo("提示", "批量任务仍在运行，请在其结束后再重试失败项。")
+            return
+        failed = [row["pkg_path"] for row in self.job_table.model.jobs.values() if row["status"] == "failed"]
+        if not failed:
+            messagebox.showinfo("提示", "没有失败的任务。")
+            return
+        self.append_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] 🔁 重试 {len(failed)} 个失败的任务...\n\n")
+        if self.last_batch:
+            settings, summary = self.last_batch
+            resume = repkg_core.retry_state(settings, summary)
         else:
-            try:
-                os.rmdir(project_backup_path)
-            except:
-                pass
-            self.log_box.insert(tk.END, f"  ⚠️ 未发现可备份内容，跳过。\n")
-
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-
-    def execute_extraction(self, pkg_path, output_dir):
-        """执行 repkg 提取命令并实时输出日志 / Execute extraction command and stream logs"""
-        cmd = self.build_command(pkg_path)
-        self.log_box.insert(tk.END, f"  → 执行命令: {' '.join(cmd)}\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-
-        process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            text=True, encoding="utf-8", errors="ignore"
-        )
-
-        for line in process.stdout:
-            self.log_box.insert(tk.END, line)
-            if self.auto_scroll:
-                self.log_box.see(tk.END)
-
-        process.wait()
-
-        self.log_box.insert(tk.END, f"  ✅ 完成 {os.path.basename(pkg_path)} (退出码 {process.returncode})\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-
-        # 拷贝预览图像 / Copy preview image if enabled
-        if self.copy_preview_image(pkg_path, output_dir):
-            self.log_box.insert(tk.END, f"  📷 已拷贝预览图像到 {output_dir}\n")
-
-        self.log_box.insert(tk.END, "\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
-
-    def run_batch(self, pkg_files):
-        """批量运行主逻辑 / Main entry for batch execution"""
-        input_dir_root = self.input_entry.get().strip()
-        output_dir_root = self.output_entry.get().strip()
-
-        is_in_place_replace = (win_path(input_dir_root) == win_path(output_dir_root)) and (
-        self.python_options["原地替换模式自动备份"])
-        batch_backup_path = self.prepare_backup_environment(output_dir_root, is_in_place_replace)
+            settings, resume = self.get_settings(), None
+        self.set_batch_running(True)
+        threading.Thread(target=self.run_batch, args=(failed, settings, resume), daemon=True).start()
 
-        for i, pkg_path in enumerate(pkg_files, 1):
-            project_name = self.get_project_name(pkg_path)
-            output_dir = os.path.join(output_dir_root, project_name)
-            project_path = os.path.dirname(pkg_path)
+    def set_progress(self, text):
+        """在主线程中更新底部进度文字"""
+        self.root.after(0, self.progress_text.set, text)
 
-            self.log_box.insert(tk.END, f"[{i}/{len(pkg_files)}] 📦 处理项目: {project_name}\n")
-            if self.auto_scroll:
-                self.log_box.see(tk.END)
-
-            # Step 1: 备份（若启用）
-            if is_in_place_replace and batch_backup_path:
-                self.backup_project(project_path, project_name, batch_backup_path)
-
-            # Step 2: 提取执行
-            try:
-                self.execute_extraction(pkg_path, output_dir)
-            except Exception as e:
-                self.log_box.insert(tk.END, f"  [Error] 执行出错: {e}\n\n")
-                if self.auto_scroll:
-                    self.log_box.see(tk.END)
-
-        self.log_box.insert(tk.END, f"[{datetime.datetime.now().strftime('%H:%M:%S')}] ✅ 所有任务完成！\n")
-        if self.auto_scroll:
-            self.log_box.see(tk.END)
+    def run_batch(self, pkg_source, settings=None, resume=None):
+        """
+        批量运行主逻辑 / Main entry for batch execution（在后台线程中调用）
+        settings 应在主线程中通过 get_settings() 获取；提取逻辑见 repkg_core.run_batch
+        resume 为 job_journal.replay() 的结果（继续上次被中断的批次）或 repkg_core.retry_state() 的结果（重试失败项）
+        """
+        settings = settings or self.get_settings()
+        summary = None
+        try:
+            summary = repkg_core.run_batch(settings, pkg_source, self.append_log, self.set_progress,
+                                           lambda pkg_path: self.root.after(0, self.update_preview, pkg_path),
+                                           self.job_table.post, resume)
+        finally:
+            self.root.after(0, self.finish_batch, settings, summary)
+        if summary["discovered"] == 0:
+            self.root.after(0, messagebox.showinfo, "提示", "未找到任何 .pkg 文件。")
+        return summary
 
     # ------------------------------------------------------------
     #  分类功能方法 
@@ -1321,9 +1614,8 @@ class RePKG_GUI:
             return
 
         self.log_box.delete(1.0, tk.END)
-        self.log_box.insert(tk.END,
-                            f"[{datetime.datetime.now().strftime('%H:%M:%S')}]  开始分类项目 / Starting project classification...\n")
-        self.log_box.insert(tk.END, f"📁 目标目录 / Target directory: {output_dir}\n\n")
+        self.append_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}]  开始分类项目 / Starting project classification...\n")
+        self.append_log(f"📁 目标目录 / Target directory: {output_dir}\n\n")
 
         # 在后台线程中执行分类
         threading.Thread(target=self.run_classify, args=(output_dir,), daemon=True).start()
@@ -1334,19 +1626,14 @@ class RePKG_GUI:
             # 根据用户选择决定是否创建映射
             create_mapping = self.classify_options["创建透明映射（隐藏链接）"].get()
 
-            def log_callback(message):
-                self.log_box.insert(tk.END, message)
-                if self.auto_scroll:
-                    self.log_box.see(tk.END)
-
             # 调用分类函数并传入 create_mapping 标志
-            classify_projects(target_dir, log_callback, create_mapping=create_mapping)
+            classify_projects(target_dir, self.append_log, create_mapping=create_mapping)
 
             # 显示完成消息
-            self.log_box.insert(tk.END, f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 分类任务完成！\n")
+            self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 分类任务完成！\n")
 
         except Exception as e:
-            self.log_box.insert(tk.END, f"[Error] 分类过程中发生错误: {e}\n")
+            self.append_log(f"[Error] 分类过程中发生错误: {e}\n")
 
     def create_mappings_manual(self):
         """手动增加映射 (不对项目进行分类，只对已分类结构增加映射)"""
@@ -1368,31 +1655,53 @@ class RePKG_GUI:
             return
 
         self.log_box.delete(1.0, tk.END)
-        self.log_box.insert(tk.END,
-                            f"[{datetime.datetime.now().strftime('%H:%M:%S')}]  开始创建透明映射 / Starting transparent mapping creation...\n")
-        self.log_box.insert(tk.END, f"📁 目标目录 / Target directory: {output_dir}\n\n")
+        self.append_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}]  开始创建透明映射 / Starting transparent mapping creation...\n")
+        self.append_log(f"📁 目标目录 / Target directory: {output_dir}\n\n")
 
         # 在后台线程中执行创建映射
-        threading.Thread(target=self.run_create_mappings, args=(output_dir,), daemon=True).start()
+        threading.Thread(target=self.run_create_mappings, args=(output_dir, self.get_worker_count()),
+                         daemon=True).start()
 
-    def run_create_mappings(self, target_dir):
+    def run_create_mappings(self, target_dir, workers=None):
         """在后台线程中执行创建映射"""
         try:
-            def log_callback(message):
-                self.log_box.insert(tk.END, message)
-                if self.auto_scroll:
-                    self.log_box.see(tk.END)
-
-            log_callback(f" 正在创建映射于: {target_dir}\n")
-            created_links, skipped_items = create_transparent_mapping(target_dir)
+            self.append_log(f" 正在创建映射于: {target_dir}\n")
+            result = create_transparent_mapping(target_dir, self.append_log, workers)
 
             # 显示完成消息
-            self.log_box.insert(tk.END, f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 映射创建完成！\n")
-            self.log_box.insert(tk.END, f"[Success] 成功创建: {len(created_links)} 个映射\n")
-            self.log_box.insert(tk.END, f"[Warning]  跳过: {len(skipped_items)} 个项目 (已存在或错误)\n")
+            self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 映射创建完成！\n")
+            self.append_log(f"[Success] 新建 {len(result['created'])} 个，修正 {len(result['retargeted'])} 个，"
+                            f"删除 {len(result['removed'])} 个，{result['unchanged']} 个已是最新\n")
+            self.append_log(f"[Warning]  跳过: {len(result['skipped']) + len(result['failed'])} 个项目 (同名冲突或错误)\n")
 
         except Exception as e:
-            self.log_box.insert(tk.END, f"[Error] 创建映射过程中发生错误: {e}\n")
+            self.append_log(f"[Error] 创建映射过程中发生错误: {e}\n")
+
+    def load_gallery(self, target_dir=None, force=False):
+        """在后台线程中列出图库项目；目录未改变且未要求刷新时不重新加载"""
+        if target_dir:
+            self.gallery_dir.set(target_dir)
+        target_dir = self.gallery_dir.get().strip()
+        if not target_dir or not os.path.isdir(target_dir):
+            self.gallery_status.set(f"目录不存在: {target_dir}" if target_dir else "请先设置图库目录")
+            return
+        if target_dir == self._gallery_loaded_dir and not force:
+            return
+        self._gallery_loaded_dir = target_dir
+        self.gallery_status.set(f"正在加载 {target_dir} …")
+        threading.Thread(target=self.run_gallery_load, args=(target_dir,), daemon=True).start()
+
+    def run_gallery_load(self, target_dir):
+        """在后台线程中列出项目，再交回主线程显示"""
+        try:
+            items = repkg_core.list_gallery_projects(target_dir)
+        except Exception as e:
+            self.root.after(0, self.gallery_status.set, f"加载失败: {e}")
+            return
+        with_preview = sum(1 for item in items if item["preview"])
+        self.root.after(0, self.gallery.set_items, items)
+        self.root.after(0, self.gallery_status.set,
+                        f"{len(items)} 个项目，{with_preview} 个有预览图（双击打开项目文件夹）")
 
     def show_status(self):
         """显示当前状态"""
@@ -1406,8 +1715,7 @@ class RePKG_GUI:
             return
 
         self.log_box.delete(1.0, tk.END)
-        self.log_box.insert(tk.END,
-                            f"[{datetime.datetime.now().strftime('%H:%M:%S')}] 📋 查看状态 / Checking status...\n\n")
+        self.append_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] 📋 查看状态 / Checking status...\n\n")
 
         # 在后台线程中执行状态检查
         threading.Thread(target=self.run_status_check, args=(output_dir,), daemon=True).start()
@@ -1415,17 +1723,12 @@ class RePKG_GUI:
     def run_status_check(self, target_dir):
         """在后台线程中执行状态检查"""
         try:
-            def log_callback(message):
-                self.log_box.insert(tk.END, message)
-                if self.auto_scroll:
-                    self.log_box.see(tk.END)
-
-            list_current_status(target_dir, log_callback)
+            list_current_status(target_dir, self.append_log)
 
-            self.log_box.insert(tk.END, f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 状态检查完成！\n")
+            self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 状态检查完成！\n")
 
         except Exception as e:
-            self.log_box.insert(tk.END, f"[Error] 状态检查过程中发生错误: {e}\n")
+            self.append_log(f"[Error] 状态检查过程中发生错误: {e}\n")
 
     def remove_mappings(self):
         """移除所有映射"""
@@ -1447,47 +1750,37 @@ class RePKG_GUI:
             return
 
         self.log_box.delete(1.0, tk.END)
-        self.log_box.insert(tk.END,
-                            f"[{datetime.datetime.now().strftime('%H:%M:%S')}]   开始移除映射 / Starting mapping removal...\n")
-        self.log_box.insert(tk.END, f"📁 目标目录 / Target directory: {output_dir}\n\n")
+        self.append_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}]   开始移除映射 / Starting mapping removal...\n")
+        self.append_log(f"📁 目标目录 / Target directory: {output_dir}\n\n")
 
         # 在后台线程中执行移除
-        threading.Thread(target=self.run_remove_mappings, args=(output_dir,), daemon=True).start()
+        threading.Thread(target=self.run_remove_mappings, args=(output_dir, self.get_worker_count()),
+                         daemon=True).start()
 
-    def run_remove_mappings(self, target_dir):
+    def run_remove_mappings(self, target_dir, workers=None):
         """在后台线程中执行移除映射"""
         try:
-            def log_callback(message):
-                self.log_box.insert(tk.END, message)
-                if self.auto_scroll:
-                    self.log_box.see(tk.END)
-
-            remove_all_mappings(target_dir, log_callback)
+            remove_all_mappings(target_dir, self.append_log, workers)
 
             # 显示完成消息
-            self.log_box.insert(tk.END, f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 映射移除完成！\n")
+            self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🎉 映射移除完成！\n")
 
         except Exception as e:
-            self.log_box.insert(tk.END, f"[Error] 移除映射过程中发生错误: {e}\n")
+            self.append_log(f"[Error] 移除映射过程中发生错误: {e}\n")
 
     # ------------------------------------------------------------
     #  备份还原功能方法 (统一备份)
     # ------------------------------------------------------------
     def list_backups(self, unified_backup_root):
         """扫描统一备份根目录下的 .unified_backup 文件夹，返回批次备份列表"""
-        unified_backup_dir = os.path.join(unified_backup_root, ".unified_backup")
-        backups = []
-        if os.path.isdir(unified_backup_dir):
-            for item in os.listdir(unified_backup_dir):
-                # 检查是否为以 'backup_' 开头且是目录
-                if item.startswith("backup_") and os.path.isdir(os.path.join(unified_backup_dir, item)):
-                    backups.append(item)
-        return sorted(backups, reverse=True)  # 最近的备份在前
+        return repkg_core.list_backups(unified_backup_root)
 
     def refresh_backups_list(self):
         """刷新备份列表"""
         unified_backup_root = self.unified_backup_root.get().strip()
         self.backup_listbox.delete(0, tk.END)
+        self.backup_project_listbox.delete(0, tk.END)
+        self.backup_names = []
 
         if not unified_backup_root or not os.path.isdir(unified_backup_root):
             self.backup_listbox.insert(tk.END, "[Warning] 请先选择有效的统一备份根目录")
@@ -1499,180 +1792,156 @@ class RePKG_GUI:
             self.backup_listbox.insert(tk.END, "[Success] 目录中未找到任何批次备份。")
         else:
             for backup in backups:
-                self.backup_listbox.insert(tk.END, backup)
-            self.log_box.insert(tk.END,
-                                f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🔄 备份列表刷新完成，找到 {len(backups)} 个批次备份。\n")
-            self.log_box.see(tk.END)
+                self.backup_listbox.insert(tk.END, self.format_backup_label(unified_backup_root, backup))
+            self.backup_names = backups
+            self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🔄 备份列表刷新完成，找到 {len(backups)} 个批次备份。\n")
 
-    def start_restore_task(self):
-        """启动还原任务"""
-        unified_root = self.unified_backup_root.get().strip()
+    def format_backup_label(self, unified_backup_root, backup_name):
+        """备份列表中的一行：批次名、项目数、格式以及原始/存储大小"""
+        try:
+            info = repkg_core.describe_backup(unified_backup_root, backup_name)
+        except OSError:
+            return backup_name
+        label = f"{backup_name}  |  {info['projects']} 个项目  |  {'/'.join(info['formats']) or '-'}"
+        if info["original_bytes"]:
+            label += (f"  |  原始 {format_size(info['original_bytes'])} → "
+                      f"存储 {format_size(info['stored_bytes'])}")
+        return label
+
+    def get_selected_backup(self):
+        """返回列表中选中的批次名；未选中或选中的是提示行时返回 None"""
         selection = self.backup_listbox.curselection()
+        if not selection or selection[0] >= len(self.backup_names):
+            return None
+        return self.backup_names[selection[0]]
+
+    def start_restore_task(self, selected_only=False):
+        """启动还原任务；selected_only 为 True 时只还原项目列表中选中的项目"""
+        unified_root = self.unified_backup_root.get().strip()
+        backup_name = self.get_selected_backup()
+        projects = None
+        if selected_only:
+            projects = [self.backup_project_listbox.get(i) for i in self.backup_project_listbox.curselection()]
 
         if not unified_root or not os.path.isdir(unified_root):
             messagebox.showwarning("警告", "请先选择有效的统一备份根目录！")
             return
 
-        if not selection:
+        if not backup_name:
             messagebox.showwarning("警告", "请先在列表中选择一个要还原的批次备份！")
             return
 
-        backup_name = self.backup_listbox.get(selection[0])
+        if selected_only and not projects:
+            messagebox.showwarning("警告", "请先在项目列表中选择要还原的项目！")
+            return
 
         # 确认操作
+        target = f"批次 {backup_name} 中的 {len(projects)} 个项目" if projects else f"**整个批次备份**：\n{backup_name}"
         result = messagebox.askyesno("确认还原",
-                                     f"您确定要将 **整个批次备份**：\n{backup_name}\n\n"
+                                     f"您确定要将 {target}\n\n"
                                      f"还原到统一根目录：\n{unified_root}\n\n"
-                                     "此操作将 **删除** 批次中所有项目的当前提取内容，并将备份内容移回。操作不可逆！\n"
+                                     "此操作将 **替换** 这些项目的当前提取内容为备份内容。操作不可逆！\n"
                                      "是否继续？",
                                      icon="error")
         if not result:
             return
 
-        self.log_box.insert(tk.END,
-                            f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] ⏪ 启动批次还原任务: {backup_name}...\n")
-        self.log_box.see(tk.END)
+        self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] ⏪ 启动批次还原任务: {backup_name}...\n")
 
-        threading.Thread(target=self.run_restore_process, args=(unified_root, backup_name), daemon=True).start()
+        threading.Thread(target=self.run_restore_process, args=(unified_root, backup_name, projects, self.get_worker_count()),
+                         daemon=True).start()
 
-    def run_restore_process(self, unified_root, backup_name):
+    def run_restore_process(self, unified_root, backup_name, projects=None, workers=None):
         """在后台线程中执行还原操作"""
         try:
-            def log_callback(message):
-                self.log_box.insert(tk.END, message)
-                if self.auto_scroll:
-                    self.log_box.see(tk.END)
-
-            self.restore_selected_backup(unified_root, backup_name, log_callback)
+            self.restore_selected_backup(unified_root, backup_name, self.append_log, projects, workers)
 
             # 还原完成后刷新列表
             self.root.after(100, self.refresh_backups_list)
 
         except Exception as e:
-            self.log_box.insert(tk.END, f"[Error] 还原过程中发生严重错误: {e}\n")
-            self.log_box.see(tk.END)
+            self.append_log(f"[Error] 还原过程中发生严重错误: {e}\n")
 
-    def restore_selected_backup(self, unified_root, backup_name, log_callback):
-        """将选中的批次备份还原到统一根目录"""
-        unified_backup_dir = os.path.join(unified_root, ".unified_backup")
-        batch_backup_path = os.path.join(unified_backup_dir, backup_name)
+    def restore_selected_backup(self, unified_root, backup_name, log_callback, projects=None, workers=None):
+        """将选中的批次备份（或其中的部分项目）还原到统一根目录"""
+        return repkg_core.restore_selected_backup(unified_root, backup_name, log_callback, projects, workers)
 
-        if not os.path.isdir(batch_backup_path):
-            log_callback(f"[Error] 错误: 批次备份目录不存在: {batch_backup_path}\n")
+    def start_prune_task(self, dry_run=False):
+        """按保留规则清理（或预览清理）统一备份目录中的旧批次"""
+        unified_root = self.unified_backup_root.get().strip()
+        if not unified_root or not os.path.isdir(unified_root):
+            messagebox.showwarning("警告", "请先选择有效的统一备份根目录！")
             return
 
-        log_callback(f"⚙️  开始还原批次备份: {backup_name}...\n")
-
-        # 遍历批次备份目录中的所有项目
-        projects_to_restore = [d for d in os.listdir(batch_backup_path)
-                               if os.path.isdir(os.path.join(batch_backup_path, d))]
-
-        if not projects_to_restore:
-            log_callback("[Warning]  此批次备份中未找到任何项目内容，跳过还原。\n")
-            try:
-                os.rmdir(batch_backup_path)
-                log_callback(f"    已删除空的批次备份文件夹: {backup_name}\n")
-            except:
-                pass
+        settings = self.get_settings()
+        rules = repkg_core.get_retention_rules(settings)
+        if not any(rules):
+            messagebox.showwarning("警告", "请先设置至少一条保留规则（保留批次数、天数或总大小上限）！")
+            return
+        if not dry_run and not messagebox.askyesno("确认清理", "将按保留规则永久删除旧的批次备份，是否继续？",
+                                                   icon="warning"):
             return
 
-        log_callback(f"[Success] 发现 {len(projects_to_restore)} 个项目需要还原。\n")
-
-        for project_name in projects_to_restore:
-            project_path = os.path.join(unified_root, project_name)
-            project_backup_path = os.path.join(batch_backup_path, project_name)
-
-            log_callback(f"\n--- 还原项目: {project_name} ---\n")
-
-            # 1. 清理当前提取内容 (在统一根目录下的项目路径)
-            if not os.path.exists(project_path):
-                log_callback(f"  [Warning]  项目目录 {project_name} 不存在，跳过清理。\n")
-                continue
-
-            log_callback("🧹 清理当前提取内容...\n")
-            deleted_count = 0
-
-            # 排除 .pkg 文件
-            current_files = [f for f in os.listdir(project_path)
-                             if not f.lower().endswith('.pkg')]
-
-            for item in current_files:
-                item_path = os.path.join(project_path, item)
-                try:
-                    if os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                    else:
-                        os.remove(item_path)
-                    deleted_count += 1
-                except Exception as e:
-                    log_callback(f"  [Warning]  清理 {item} 失败: {e}\n")
-
-            log_callback(f"  [Success] 成功清理 {deleted_count} 个文件/目录\n")
-
-            # 2. 移动备份内容到项目目录
-            log_callback(f"🚚 还原备份文件...\n")
-            restored_count = 0
-
-            for item in os.listdir(project_backup_path):
-                src_path = os.path.join(project_backup_path, item)
-                dest_path = os.path.join(project_path, item)
-                try:
-                    # 使用 shutil.move
-                    shutil.move(src_path, dest_path)
-                    restored_count += 1
-                except Exception as e:
-                    log_callback(f"  [Error] 还原 {item} 失败: {e}\n")
-
-            log_callback(f"  [Success] 成功还原 {restored_count} 个文件/目录\n")
-
-        # 3. 删除空的批次备份目录
-        log_callback(f"\n  清理批次备份目录...\n")
-        try:
-            shutil.rmtree(batch_backup_path)  # 递归删除
-            log_callback(f"  [Success] 已删除批次备份文件夹: {backup_name}\n")
-        except Exception as e:
-            log_callback(f"  [Warning]  删除批次备份文件夹 {backup_name} 失败 (可能非空): {e}\n")
-
-        # 4. 检查是否需要删除 .unified_backup 根目录
-        try:
-            if not os.listdir(unified_backup_dir):
-                os.rmdir(unified_backup_dir)
-                log_callback(f"    已删除空的统一备份根目录: .unified_backup\n")
-        except:
-            pass  # 忽略错误
+        def run_prune():
+            try:
+                repkg_core.apply_backup_retention(unified_root, self.append_log, *rules, dry_run=dry_run,
+                                                  workers=settings["workers"])
+                if not dry_run:
+                    self.root.after(100, self.refresh_backups_list)
+            except Exception as e:
+                self.append_log(f"[Error] 备份清理失败: {e}\n")
 
-        log_callback(f"\n🎉 批次备份还原完成！统一根目录 {unified_root} 已成功还原到 {backup_name} 批次版本。\n")
+        self.append_log(f"\n[{datetime.datetime.now().strftime('%H:%M:%S')}] 🧹 启动备份清理"
+                        f"{'预览' if dry_run else ''}任务...\n")
+        threading.Thread(target=run_prune, daemon=True).start()
 
     # ------------------------------------------------------------
     #  命令预览（Windows 格式）
     # ------------------------------------------------------------
+    def schedule_preview(self):
+        """防抖：连续输入时只在停止输入 PREVIEW_DEBOUNCE_MS 毫秒后刷新一次预览"""
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+        self._preview_job = self.root.after(PREVIEW_DEBOUNCE_MS, self.update_preview)
+
+    def get_sample_package(self, input_dir):
+        """输入目录的示例包；按目录 mtime 缓存，目录内容未变化时不再列出目录"""
+        try:
+            mtime_ns = os.stat(input_dir).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._sample_pkg_cache
+        if cached and cached[0] == input_dir and cached[1] == mtime_ns:
+            return cached[2]
+        try:
+            sample_pkg = repkg_core.find_sample_package(input_dir)
+        except OSError:
+            sample_pkg = None
+        self._sample_pkg_cache = (input_dir, mtime_ns, sample_pkg)
+        return sample_pkg
+
     def update_preview(self, sample_pkg=None):
+        """刷新命令预览；只生成命令文本，不会检查文件或创建输出目录"""
+        self._preview_job = None
         try:
-            if sample_pkg:
-                cmd = self.build_command(sample_pkg)
-            else:
+            if not sample_pkg:
                 # 尝试构建一个更有意义的预览路径
                 input_dir = self.input_entry.get().strip()
-                output_dir = self.output_entry.get().strip()
-
-                if input_dir and os.path.exists(input_dir):
-                    # 尝试找到第一个 .pkg 文件作为样本 (不进行递归扫描，太耗时)
-                    pkg_files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if
-                                 f.lower().endswith(".pkg") and os.path.isfile(os.path.join(input_dir, f))]
-                    if pkg_files:
-                        cmd = self.build_command(pkg_files[0])
-                else:
-                    # 使用默认的假路径
-                    fake_pkg = r"D:\Games\Steam\steamapps\workshop\content\431960\111111111\scene.pkg"
-                    cmd = self.build_command(fake_pkg)
+                sample_pkg = self.get_sample_package(input_dir) if input_dir else None
+            if not sample_pkg:
+                # 使用默认的假路径
+                sample_pkg = r"D:\Games\Steam\steamapps\workshop\content\431960\111111111\scene.pkg"
+            cmd = self.preview_command(sample_pkg)
 
             self.cmd_preview.delete(1.0, tk.END)
             self.cmd_preview.insert(tk.END, " ".join(cmd))
-        except Exception as e:
+        except Exception:
             pass  # 静默处理预览错误，避免干扰用户
 
 
 if __name__ == "__main__":
+    # 打包为 exe 后，内置 TEX 解码器的进程池需要 freeze_support
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = RePKG_GUI(root)
     root.mainloop()
@@ -0,0 +1,358 @@
+"""
+统一备份存储 / Storage formats for unified backups
+
+.unified_backup/
+    objects/ab/cdef...        去重存储：文件内容按 SHA-256 存放，相同内容在所有批次中只保存一份
+    objects/hash_index.json   路径 + 大小 + mtime → 哈希 的缓存，未变化的文件无需重新读取
+    objects/writer-<id>.lock  正在写入去重存储的批次，存在时不清理未引用的对象
+    backup_<ts>/<项目>.backup.json
+                              每个项目一份小清单，记录格式、文件列表以及原始/存储大小
+    backup_<ts>/<项目>.zip    压缩归档：每个项目一个 zip / tar.gz / tar.xz，流式写入与流式还原
+
+没有 .backup.json 的项目目录是旧版（完整目录树）备份，仍按原方式还原。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import threading
+import time
+import uuid
+import zipfile
+
+OBJECTS_DIR = "objects"
+HASH_INDEX_FILE = "hash_index.json"
+META_SUFFIX = ".backup.json"
+META_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+WRITER_LOCK_PREFIX = "writer-"
+WRITER_LOCK_SUFFIX = ".lock"
+# 写入中的批次定期刷新登记文件的 mtime；超过 WRITER_STALE_SECONDS 未刷新的视为中断批次的遗留
+WRITER_REFRESH_SECONDS = 60
+WRITER_STALE_SECONDS = 3600
+
+# 压缩归档格式 → 文件扩展名
+ARCHIVE_FORMATS = {
+    "zip": ".zip",
+    "tar.gz": ".tar.gz",
+    "tar.xz": ".tar.xz",
+}
+
+
+def meta_path(batch_backup_path, project_name):
+    """项目清单路径 / Path of a project's backup manifest inside a batch"""
+    return os.path.join(batch_backup_path, project_name + META_SUFFIX)
+
+
+def write_meta(batch_backup_path, project_name, meta):
+    """写入项目清单（先写临时文件再替换）"""
+    path = meta_path(batch_backup_path, project_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(meta, version=META_VERSION, project=project_name), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_meta(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_batch_metas(batch_backup_path):
+    """产出批次中的 (项目名, 清单路径)"""
+    for name in sorted(os.listdir(batch_backup_path)):
+        if name.endswith(META_SUFFIX):
+            yield name[:-len(META_SUFFIX)], os.path.join(batch_backup_path, name)
+
+
+class ObjectStore:
+    """
+    按内容哈希存放文件的对象库，可在多个备份线程间共享。
+
+    用法 / Usage:
+        store = ObjectStore(unified_backup_dir)
+        store.begin_write()
+        digest, size, stored = store.put(path)
+        store.end_write()
+        store.materialize(digest, dest_path)
+        store.save_index()
+
+    新对象在项目清单写入前不被任何批次引用，因此写入期间要用 begin_write 登记，
+    collect_garbage 在有批次登记时跳过清理（包括其他进程中的批次）。
+    """
+
+    def __init__(self, unified_backup_dir):
+        self.unified_backup_dir = unified_backup_dir
+        self.root = os.path.join(unified_backup_dir, OBJECTS_DIR)
+        self.index_path = os.path.join(self.root, HASH_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._index = {}
+        self._dirty = False
+        self._writer_lock = None
+        self._writer_refreshed = 0.0
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def object_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def _cached_hash(self, key, st):
+        with self._lock:
+            cached = self._index.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        return None
+
+    def begin_write(self):
+        """登记本批次正在写入：在 objects/ 下创建 writer-<id>.lock，直到 end_write"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{WRITER_LOCK_PREFIX}{uuid.uuid4().hex}{WRITER_LOCK_SUFFIX}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+        self._writer_lock = path
+        self._writer_refreshed = time.monotonic()
+
+    def end_write(self):
+        """删除本批次的写入登记"""
+        path, self._writer_lock = self._writer_lock, None
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _refresh_writer_lock(self):
+        if self._writer_lock and time.monotonic() - self._writer_refreshed > WRITER_REFRESH_SECONDS:
+            self._writer_refreshed = time.monotonic()
+            try:
+                os.utime(self._writer_lock)
+            except OSError:
+                pass
+
+    def active_writers(self):
+        """正在写入去重存储的批次登记文件（忽略超过 WRITER_STALE_SECONDS 未刷新的遗留文件）"""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        writers = []
+        now = time.time()
+        for name in names:
+            if not (name.startswith(WRITER_LOCK_PREFIX) and name.endswith(WRITER_LOCK_SUFFIX)):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if now - os.path.getmtime(path) < WRITER_STALE_SECONDS:
+                    writers.append(path)
+            except OSError:
+                continue
+        return writers
+
+    def put(self, path):
+        """
+        把文件存入对象库，返回 (哈希, 大小, 新写入的字节数)
+        内容已存在时新写入字节数为 0；文件未变化且哈希已缓存时完全不读取文件
+        """
+        self._refresh_writer_lock()
+        st = os.stat(path)
+        key = os.path.normcase(os.path.abspath(path))
+        digest = self._cached_hash(key, st)
+        if digest and os.path.exists(self.object_path(digest)):
+            return digest, st.st_size, 0
+
+        # 边读边计算哈希并写入临时文件，只读取一次源文件
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f"tmp-{uuid.uuid4().hex}")
+        sha = hashlib.sha256()
+        try:
+            with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    sha.update(chunk)
+                    dst.write(chunk)
+            digest = sha.hexdigest()
+            target = self.object_path(digest)
+            stored = 0
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+                stored = st.st_size
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._index[key] = [st.st_size, st.st_mtime_ns, digest]
+            self._dirty = True
+        return digest, st.st_size, stored
+
+    def materialize(self, digest, dest_path, mtime=None):
+        """把对象复制为普通文件（不使用硬链接，避免之后原地覆盖时改动对象库）"""
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copyfile(self.object_path(digest), dest_path)
+        if mtime is not None:
+            os.utime(dest_path, (mtime, mtime))
+
+    def save_index(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            # 只保留仍存在对象的缓存项
+            self._index = {key: value for key, value in self._index.items()
+                           if os.path.exists(self.object_path(value[2]))}
+            payload = json.dumps(self._index, ensure_ascii=False, separators=(",", ":"))
+            self._dirty = False
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.index_path)
+
+    def referenced_digests(self):
+        """所有批次清单中仍被引用的哈希"""
+        referenced = set()
+        for batch in os.listdir(self.unified_backup_dir):
+            batch_path = os.path.join(self.unified_backup_dir, batch)
+            if not batch.startswith("backup_") or not os.path.isdir(batch_path):
+                continue
+            for _, path in iter_batch_metas(batch_path):
+                try:
+                    referenced.update(item["hash"] for item in read_meta(path).get("files", []) if "hash" in item)
+                except (OSError, ValueError):
+                    continue
+        return referenced
+
+    def collect_garbage(self):
+        """
+        删除不再被任何批次引用的对象，返回 (删除数量, 释放字节数)
+        没有任何引用时删除整个 objects 目录；有批次正在写入（active_writers）时不做任何清理
+        """
+        if not os.path.isdir(self.root) or self.active_writers():
+            return 0, 0
+        referenced = self.referenced_digests()
+        removed = freed = 0
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if prefix + name in referenced:
+                    continue
+                path = os.path.join(prefix_dir, name)
+                try:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    continue
+            if not os.listdir(prefix_dir):
+                os.rmdir(prefix_dir)
+
+        if not referenced:
+            shutil.rmtree(self.root, ignore_errors=True)
+            with self._lock:
+                self._index = {}
+                self._dirty = False
+        else:
+            with self._lock:
+                self._dirty = True
+            self.save_index()
+        return removed, freed
+
+
+# ------------------------------------------------------------
+#  压缩归档
+# ------------------------------------------------------------
+def iter_project_files(project_path):
+    """产出项目中的 (绝对路径, 归档内相对路径, stat)，不跟随符号链接"""
+    stack = [project_path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                rel_path = os.path.relpath(entry.path, project_path).replace(os.sep, "/")
+                yield entry.path, rel_path, entry.stat(follow_symlinks=False)
+
+
+def write_archive(project_path, archive_path, archive_format="zip", level=6):
+    """
+    把项目目录流式写入一个压缩归档（先写临时文件，完成后再重命名）
+    返回文件列表 [{"path", "size", "mtime"}]；level 为 0-9，0 表示只打包不压缩
+    """
+    level = max(0, min(9, int(level)))
+    tmp_path = archive_path + ".tmp"
+    files = []
+    try:
+        if archive_format == "zip":
+            compression = zipfile.ZIP_DEFLATED if level else zipfile.ZIP_STORED
+            # strict_timestamps=False：1980 年之前的 mtime 记为 1980-01-01，而不是抛出 ValueError
+            with zipfile.ZipFile(tmp_path, "w", compression=compression, compresslevel=level or None,
+                                 allowZip64=True, strict_timestamps=False) as archive:
+                for path, rel_path, st in iter_project_files(project_path):
+                    archive.write(path, rel_path)
+                    files.append({"path": rel_path, "size": st.st_size, "mtime": st.st_mtime})
+        else:
+            if archive_format == "tar.xz":
+                archive = tarfile.open(tmp_path, "w:xz", preset=level)
+            else:
+                archive = tarfile.open(tmp_path, "w:gz", compresslevel=level)
+            with archive:
+                for path, rel_path, st in iter_project_files(project_path):
+                    archive.add(path, rel_path, recursive=False)
+                    files.append({"path": rel_path, "size": st.st_size, "mtime": st.st_mtime})
+        os.replace(tmp_path, archive_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return files
+
+
+def _safe_destination(dest_root, name):
+    """归档成员的目标路径；成员名包含 .. 或绝对路径时返回 None"""
+    dest_path = os.path.abspath(os.path.join(dest_root, *name.replace("\\", "/").split("/")))
+    if os.path.commonpath([dest_root, dest_path]) != dest_root:
+        return None
+    return dest_path
+
+
+def extract_archive(archive_path, dest_dir, skip=None):
+    """
+    从归档中逐个成员直接流式写入目标目录（不经过临时解压目录）
+    skip(rel_path, size) 返回 True 的成员不写出；返回写出的文件数
+    """
+    dest_root = os.path.abspath(dest_dir)
+    restored = 0
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                dest_path = _safe_destination(dest_root, info.filename)
+                if info.is_dir() or dest_path is None or (skip and skip(info.filename, info.file_size)):
+                    continue
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                with archive.open(info) as src, open(dest_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                os.utime(dest_path, (mtime, mtime))
+                restored += 1
+        return restored
+
+    # "r|*" 为顺序流模式：成员按写入顺序读出，无需随机访问
+    with tarfile.open(archive_path, "r|*") as archive:
+        for member in archive:
+            dest_path = _safe_destination(dest_root, member.name)
+            if not member.isfile() or dest_path is None or (skip and skip(member.name, member.size)):
+                continue
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with archive.extractfile(member) as src, open(dest_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.utime(dest_path, (member.mtime, member.mtime))
+            restored += 1
+    return restored
+
@@ -0,0 +1,232 @@
+"""
+核心路径基准测试 / Benchmark suite for the core batch operations
+
+在临时目录中生成合成工坊目录（见 workshop_gen.py），以 fake_repkg.py 代替 RePKG.exe，
+依次计时以下操作，并输出可对比的 JSON 结果：
+    scan_pkg_files (cold / warm)   扫描 .pkg（首次 / 扫描索引命中）
+    run_batch (full / incremental) 端到端批量提取 / 增量跳过
+    backup_project                 备份全部提取结果
+    restore_selected_backup        还原该批次
+    classify_projects              按 project.json 分类
+    create_transparent_mapping     创建映射链接
+    list_current_status            查看状态
+
+用法 / Usage:
+    python benchmarks/bench_core.py --projects 2000 --latency-ms 20 --output bench.json
+    python benchmarks/bench_core.py --projects 2000 --compare bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import repkg_core  # noqa: E402
+from workshop_gen import generate_library  # noqa: E402
+
+# 与基准结果相差超过该比例（且绝对差值超过最小秒数，过滤计时噪声）时在对比输出中标记
+REGRESSION_THRESHOLD = 0.10
+REGRESSION_MIN_SECONDS = 0.01
+
+
+def make_extractor_wrapper(work_dir):
+    """
+    生成调用 fake_repkg.py 的可执行包装脚本（build_command 直接执行 repkg_path）
+    Windows 上为 .cmd，其他平台为 shell 脚本
+    """
+    script = os.path.join(BENCH_DIR, "fake_repkg.py")
+    if os.name == "nt":
+        wrapper = os.path.join(work_dir, "fake_repkg.cmd")
+        with open(wrapper, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        wrapper = os.path.join(work_dir, "fake_repkg.sh")
+        with open(wrapper, "w", encoding="utf-8") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(wrapper, 0o755)
+    return wrapper
+
+
+def bench_settings(repkg_path, input_dir, output_dir, workers):
+    settings = repkg_core.default_config()
+    settings.update({
+        "repkg_path": repkg_path,
+        "input_dir": input_dir,
+        "output_dir": output_dir,
+        "copy_preview": True,
+        "auto_backup": False,
+        "incremental": True,
+        "tex_builtin": False,
+        "workers": workers,
+    })
+    return settings
+
+
+class Suite:
+    def __init__(self, verbose=False):
+        self.results = {}
+        self.verbose = verbose
+
+    def log(self, message):
+        if self.verbose:
+            sys.stderr.write(message)
+
+    def measure(self, name, fn, *args, items=None, **kwargs):
+        """计时一次调用；核心函数中的 print 输出被丢弃，避免终端输出影响计时"""
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            value = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+        self.results.setdefault(name, {"seconds": [], "items": items})["seconds"].append(elapsed)
+        print(f"  {name:<32} {elapsed:8.3f} s", file=sys.stderr)
+        return value
+
+
+def run_once(suite, work_dir, args):
+    library = os.path.join(work_dir, "431960")
+    output = os.path.join(work_dir, "output")
+    stats = generate_library(library, args.projects, args.entries, args.pkg_kb, args.seed)
+    wrapper = make_extractor_wrapper(work_dir)
+    os.environ["REPKG_FAKE_LATENCY_MS"] = str(args.latency_ms)
+    os.makedirs(output, exist_ok=True)
+    n = args.projects
+
+    # 扫描：首次扫描建立索引，第二次应命中缓存
+    suite.measure("scan_pkg_files.cold", lambda: list(repkg_core.iter_pkg_files(library)), items=n)
+    suite.measure("scan_pkg_files.warm", lambda: list(repkg_core.iter_pkg_files(library)), items=n)
+
+    # 端到端批量提取，再次运行时全部增量跳过
+    settings = bench_settings(wrapper, library, output, args.workers)
+    summary = suite.measure("run_batch.full", repkg_core.run_batch, settings,
+                            repkg_core.iter_pkg_files(library), suite.log, items=n)
+    if summary["failed"]:
+        print(f"  [Warning] {summary['failed']} jobs failed", file=sys.stderr)
+    suite.measure("run_batch.incremental", repkg_core.run_batch, settings,
+                  repkg_core.iter_pkg_files(library), suite.log, items=n)
+
+    # 备份全部提取结果，然后还原
+    projects = sorted(d for d in os.listdir(output) if not d.startswith("."))
+    batch_path = os.path.join(output, ".unified_backup", "backup_bench")
+    os.makedirs(batch_path, exist_ok=True)
+
+    def backup_all():
+        for project in projects:
+            repkg_core.backup_project(os.path.join(output, project), project, batch_path, suite.log)
+
+    suite.measure("backup_project", backup_all, items=len(projects))
+    suite.measure("restore_selected_backup", repkg_core.restore_selected_backup, output, "backup_bench",
+                  suite.log, items=len(projects))
+
+    # 分类、映射与状态（提取结果中带有 project.json）
+    suite.measure("classify_projects", repkg_core.classify_projects, output, suite.log, items=len(projects))
+    suite.measure("create_transparent_mapping", repkg_core.create_transparent_mapping, output,
+                  items=len(projects))
+    suite.measure("list_current_status", repkg_core.list_current_status, output, suite.log, items=len(projects))
+    return stats
+
+
+def summarize(results):
+    summary = {}
+    for name, record in results.items():
+        seconds = record["seconds"]
+        best = min(seconds)
+        summary[name] = {
+            "min": round(best, 4),
+            "median": round(statistics.median(seconds), 4),
+            "runs": [round(s, 4) for s in seconds],
+            "items": record["items"],
+            "items_per_second": round(record["items"] / best, 1) if record["items"] and best > 0 else None,
+        }
+    return summary
+
+
+def compare(current, baseline_path):
+    """打印与基准结果的对比（按 median），超过阈值的变慢项标记为 REGRESSION"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["benchmarks"]
+    regressions = 0
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'change':>8}", file=sys.stderr)
+    for name, record in current.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["median"], record["median"]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > REGRESSION_THRESHOLD and new - old > REGRESSION_MIN_SECONDS:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<32} {old:>9.3f}s {new:>9.3f}s {change:>+7.1%}{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scan, batch, backup, restore, classify and mapping.")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--entries", type=int, default=8, help="entries per package")
+    parser.add_argument("--pkg-kb", type=float, default=64, help="average package size in KB")
+    parser.add_argument("--latency-ms", type=float, default=20, help="extra latency of the stand-in extractor")
+    parser.add_argument("--workers", type=int, default=repkg_core.default_worker_count())
+    parser.add_argument("--repeat", type=int, default=1, help="repeat the whole suite on a fresh tree")
+    parser.add_argument("--seed", type=int, default=431960)
+    parser.add_argument("--work-dir", help="where to build the trees (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated trees")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare against; exit 1 on regressions")
+    parser.add_argument("--verbose", action="store_true", help="show the batch log on stderr")
+    args = parser.parse_args()
+
+    suite = Suite(args.verbose)
+    base_dir = args.work_dir or tempfile.mkdtemp(prefix="repkg_bench_")
+    stats = {}
+    try:
+        for run in range(args.repeat):
+            work_dir = os.path.join(base_dir, f"run{run}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            print(f"[run {run + 1}/{args.repeat}] {work_dir}", file=sys.stderr)
+            stats = run_once(suite, work_dir, args)
+            if not args.keep:
+                shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    benchmarks = summarize(suite.results)
+    payload = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "projects": args.projects, "entries": args.entries, "pkg_kb": args.pkg_kb,
+            "latency_ms": args.latency_ms, "workers": args.workers, "repeat": args.repeat, "seed": args.seed,
+            "pkg_bytes": stats.get("pkg_bytes"),
+        },
+        "benchmarks": benchmarks,
+    }
+    text = json.dumps(payload, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare and compare(benchmarks, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+日志管道基准测试 / Log pipeline benchmark
+
+比较两种写日志方式下 Tk 主循环的响应延迟：
+    direct    工作线程直接调用 Text.insert + see（旧实现）
+    pipeline  工作线程写入 LogPipeline，由主线程按固定帧率合并刷新
+
+主线程每 10 ms 安排一次心跳，记录心跳实际执行时间比预期晚了多少，
+延迟分布（p50 / p99 / max）即代表界面在大量日志下的卡顿程度。
+
+用法 / Usage (需要图形界面 / requires a display):
+    python benchmarks/bench_log_pipeline.py --lines-per-minute 100000 --seconds 10
+"""
+import argparse
+import importlib.util
+import os
+import threading
+import time
+import tkinter as tk
+from tkinter import scrolledtext
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEARTBEAT_MS = 10
+
+
+def load_gui_module():
+    """按文件路径加载 RePKG-GUI.py（文件名含连字符，无法直接 import）"""
+    spec = importlib.util.spec_from_file_location("repkg_gui", os.path.join(ROOT_DIR, "RePKG-GUI.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(mode, lines_per_minute, seconds, producers=4):
+    gui = load_gui_module()
+    root = tk.Tk()
+    root.title(f"log benchmark ({mode})")
+    text = scrolledtext.ScrolledText(root, font=("Consolas", 9), wrap="word")
+    text.pack(fill="both", expand=True)
+
+    if mode == "pipeline":
+        pipeline = gui.LogPipeline(root, text)
+        pipeline.start()
+        write = pipeline.write
+    else:
+        def write(message):
+            text.insert(tk.END, message)
+            text.see(tk.END)
+
+    stop = threading.Event()
+    interval = producers * 60.0 / lines_per_minute
+    written = [0] * producers
+
+    def producer(worker_id):
+        next_time = time.perf_counter()
+        while not stop.is_set():
+            write(f"[worker {worker_id}] line {written[worker_id]}: Extracting materials/texture.tex ...\n")
+            written[worker_id] += 1
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    def heartbeat(expected):
+        now = time.perf_counter()
+        latencies.append(max(0.0, now - expected))
+        if now < deadline:
+            root.after(HEARTBEAT_MS, heartbeat, now + HEARTBEAT_MS / 1000)
+        else:
+            root.quit()
+
+    def start():
+        for worker_id in range(producers):
+            threading.Thread(target=producer, args=(worker_id,), daemon=True).start()
+        heartbeat(time.perf_counter())
+
+    root.after(0, start)
+    root.mainloop()
+    stop.set()
+    root.destroy()
+
+    return {
+        "mode": mode,
+        "lines": sum(written),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Tk UI latency while worker threads flood the log.")
+    parser.add_argument("--lines-per-minute", type=int, default=100000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--modes", default="pipeline,direct", help="comma separated: pipeline,direct")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        result = run(mode.strip(), args.lines_per_minute, args.seconds)
+        print(f"{result['mode']:>8}: {result['lines']} lines, heartbeat latency "
+              f"p50 {result['p50_ms']:.1f} ms / p99 {result['p99_ms']:.1f} ms / max {result['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
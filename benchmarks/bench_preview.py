@@ -0,0 +1,110 @@
+"""
+预览图查找基准 / Benchmark for the preview image lookup
+
+对比旧的查找方式（每个包最多 14 次 glob：preview.* 与 <包名>.* 各 7 种扩展名）
+与按目录索引的查找（每个项目目录只列出一次）。--latency-ms 为每次文件系统调用
+（stat / lstat / scandir）额外增加的延迟，用于模拟网络共享、机械硬盘等慢速存储。
+
+用法 / Usage:
+    python benchmarks/bench_preview.py --projects 5000 --latency-ms 0.5
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import repkg_core  # noqa: E402
+from workshop_gen import generate_library  # noqa: E402
+
+LEGACY_EXTENSIONS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.bmp', '*.tiff', '*.webp']
+
+
+def legacy_find_preview_image(pkg_path):
+    """旧实现（仅用于对比）/ The previous glob-based lookup, kept here as the baseline"""
+    pkg_dir = os.path.dirname(pkg_path)
+    pkg_name = os.path.splitext(os.path.basename(pkg_path))[0]
+    for stem in ("preview", pkg_name):
+        for ext in LEGACY_EXTENSIONS:
+            matches = glob.glob(os.path.join(pkg_dir, f"{stem}{ext}"))
+            if matches:
+                return matches[0]
+    return None
+
+
+class SlowFilesystem:
+    """统计并减慢 os.stat / os.lstat / os.scandir 调用（with 语句内有效）"""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self._originals = {}
+
+    def _wrap(self, fn):
+        def slow(*args, **kwargs):
+            self.calls += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return fn(*args, **kwargs)
+        return slow
+
+    def __enter__(self):
+        for name in ("stat", "lstat", "scandir"):
+            self._originals[name] = getattr(os, name)
+            setattr(os, name, self._wrap(self._originals[name]))
+        return self
+
+    def __exit__(self, *exc):
+        for name, fn in self._originals.items():
+            setattr(os, name, fn)
+
+
+def measure(label, lookup, pkg_paths, latency_ms):
+    with SlowFilesystem(latency_ms) as fs:
+        started = time.perf_counter()
+        found = sum(1 for pkg_path in pkg_paths if lookup(pkg_path))
+        elapsed = time.perf_counter() - started
+    print(f"  {label:<24} {elapsed:8.3f} s  {fs.calls / len(pkg_paths):5.1f} calls/package  "
+          f"({found}/{len(pkg_paths)} found)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and the indexed preview lookup.")
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="extra latency per filesystem call")
+    parser.add_argument("--work-dir", help="where to build the tree (default: a temporary directory)")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="repkg_bench_preview_")
+    try:
+        library = os.path.join(work_dir, "431960")
+        generate_library(library, args.projects, entries=1, pkg_kb=1)
+        pkg_paths = list(repkg_core.iter_pkg_files(library))
+        # 真实目录中的预览图格式各异，也有缺失的：三分之一改为 .gif，三分之一删除
+        for index, pkg_path in enumerate(pkg_paths):
+            preview = os.path.join(os.path.dirname(pkg_path), "preview.jpg")
+            if index % 3 == 1:
+                os.replace(preview, os.path.join(os.path.dirname(pkg_path), "preview.gif"))
+            elif index % 3 == 2:
+                os.remove(preview)
+        print(f"{len(pkg_paths)} packages, {args.latency_ms} ms per filesystem call", file=sys.stderr)
+
+        legacy = measure("glob (legacy)", legacy_find_preview_image, pkg_paths, args.latency_ms)
+        dir_index = repkg_core.DirectoryIndex()
+        indexed = measure("directory index", lambda p: repkg_core.find_preview_image(p, dir_index), pkg_paths,
+                          args.latency_ms)
+        print(f"  speedup: {legacy / indexed:.1f}x" if indexed > 0 else "")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+RePKG 替身提取器 / Stand-in for RePKG.exe used by the benchmarks
+
+接受与 RePKG 相同形式的命令行：
+    fake_repkg.py extract [-t] [-c] [-n] [--overwrite] [-r] [--no-tex-convert] -o OUTPUT INPUT.pkg
+    fake_repkg.py info INPUT.pkg
+使用 pkg_reader 解析真实的 PKG 条目表，把条目写入输出目录，并打印与 RePKG 类似的日志。
+
+环境变量 REPKG_FAKE_LATENCY_MS 为每个包额外增加的固定延迟（模拟 RePKG 启动与 TEX 转换耗时），
+默认 0。环境变量 REPKG_FAKE_FAIL 包含在包路径中时返回退出码 1，用于模拟失败。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pkg_reader import PkgFormatError, PkgReader  # noqa: E402
+
+FLAGS = {"-t", "--tex", "-c", "--copyproject", "-n", "--usename", "--overwrite", "-r", "--recursive",
+         "--no-tex-convert"}
+
+
+def parse_args(argv):
+    if not argv or argv[0] not in ("extract", "info"):
+        raise SystemExit("usage: fake_repkg.py extract|info [options] -o OUTPUT INPUT")
+    mode, output, inputs = argv[0], None, []
+    args = iter(argv[1:])
+    for arg in args:
+        if arg in ("-o", "--output"):
+            output = next(args, None)
+        elif arg not in FLAGS:
+            inputs.append(arg)
+    if len(inputs) != 1:
+        raise SystemExit("fake_repkg.py expects exactly one input package")
+    return mode, output, inputs[0]
+
+
+def main(argv=None):
+    mode, output, pkg_path = parse_args(sys.argv[1:] if argv is None else argv)
+    latency = float(os.environ.get("REPKG_FAKE_LATENCY_MS", "0")) / 1000
+    fail_marker = os.environ.get("REPKG_FAKE_FAIL")
+
+    started = time.perf_counter()
+    try:
+        with PkgReader(pkg_path) as pkg:
+            print(f"Reading package {pkg_path} ({pkg.magic}, {len(pkg.entries)} entries)")
+            if mode == "extract":
+                output = output or "./output"
+                for entry in pkg.entries:
+                    dest = os.path.join(output, *entry.name.replace("\\", "/").split("/"))
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    data = pkg.read(entry)
+                    try:
+                        with open(dest, "wb") as f:
+                            f.write(data)
+                    finally:
+                        data.release()
+                    print(f"* Extracting: {entry.name}")
+            else:
+                for entry in pkg.entries:
+                    print(f"  {entry.name} ({entry.size} bytes)")
+    except (OSError, PkgFormatError) as e:
+        print(f"Failed to read {pkg_path}: {e}")
+        return 1
+
+    remaining = latency - (time.perf_counter() - started)
+    if remaining > 0:
+        time.sleep(remaining)
+    if fail_marker and fail_marker in pkg_path:
+        print("Simulated failure")
+        return 1
+    print("Done")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
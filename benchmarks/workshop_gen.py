@@ -0,0 +1,110 @@
+"""
+合成创意工坊目录生成器 / Synthetic Wallpaper Engine workshop library generator
+
+生成与 steamapps/workshop/content/431960 结构相同的目录树：
+    <root>/<workshop id>/project.json      随机 type（scene / video / web / application）
+    <root>/<workshop id>/preview.jpg       小图占位
+    <root>/<workshop id>/scene.pkg         合法的 PKGV0001 容器（可被 pkg_reader 与 fake_repkg 读取）
+
+相同的 --seed 总是生成相同的目录树，便于不同版本之间的基准结果对比。
+生成后所有目录的 mtime 会被设为一小时前，使扫描索引在第二次扫描时即可命中缓存。
+
+用法 / Usage:
+    python benchmarks/workshop_gen.py D:\\bench\\431960 --projects 2000 --pkg-kb 64
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import time
+
+PROJECT_TYPES = ["scene", "scene", "scene", "video", "video", "web", "application"]
+ENTRY_TEMPLATES = ["scene.json", "materials/{n}.tex", "materials/{n}.json", "models/{n}.json",
+                   "shaders/{n}.frag", "shaders/{n}.vert", "sounds/{n}.mp3", "effects/{n}.json"]
+
+# 合法 JPEG 的最小文件头，足够被识别为图像
+_JPEG_STUB = bytes.fromhex("ffd8ffe000104a46494600010100000100010000ffd9")
+
+
+def write_pkg(path, entries):
+    """按 PKGV0001 布局写出 PKG 文件；entries 为 [(name, bytes), ...]"""
+    header = bytearray()
+    magic = b"PKGV0001"
+    header += struct.pack("<I", len(magic)) + magic
+    header += struct.pack("<I", len(entries))
+    offset = 0
+    for name, data in entries:
+        encoded = name.encode("utf-8")
+        header += struct.pack("<I", len(encoded)) + encoded
+        header += struct.pack("<II", offset, len(data))
+        offset += len(data)
+    with open(path, "wb") as f:
+        f.write(header)
+        for _, data in entries:
+            f.write(data)
+
+
+def make_entries(rng, entry_count, pkg_bytes):
+    """生成 entry_count 个条目，总大小约为 pkg_bytes"""
+    names = []
+    for n in range(entry_count):
+        template = ENTRY_TEMPLATES[n % len(ENTRY_TEMPLATES)]
+        names.append(template.format(n=n))
+    sizes = [max(1, pkg_bytes // entry_count)] * entry_count
+    # 数据内容不参与任何校验，使用重复的随机块即可，避免生成大量随机数
+    block = rng.randbytes(4096) if hasattr(rng, "randbytes") else os.urandom(4096)
+    return [(name, (block * (size // len(block) + 1))[:size]) for name, size in zip(names, sizes)]
+
+
+def generate_library(root, projects=2000, entries=8, pkg_kb=64, seed=431960):
+    """
+    生成合成工坊目录树，返回统计字典（projects / pkg_bytes / root）
+    已存在的目录会被原样覆盖写入
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    total_bytes = 0
+    project_dirs = []
+    for index in range(projects):
+        workshop_id = str(1000000000 + index)
+        project_dir = os.path.join(root, workshop_id)
+        os.makedirs(project_dir, exist_ok=True)
+        project_dirs.append(project_dir)
+
+        project_type = rng.choice(PROJECT_TYPES)
+        with open(os.path.join(project_dir, "project.json"), "w", encoding="utf-8") as f:
+            json.dump({"title": f"Synthetic wallpaper {index}", "type": project_type, "file": "scene.json",
+                       "preview": "preview.jpg", "workshopid": workshop_id}, f)
+        with open(os.path.join(project_dir, "preview.jpg"), "wb") as f:
+            f.write(_JPEG_STUB)
+
+        size = max(1024, int(pkg_kb * 1024 * rng.uniform(0.5, 1.5)))
+        pkg_entries = make_entries(rng, entries, size)
+        write_pkg(os.path.join(project_dir, "scene.pkg"), pkg_entries)
+        total_bytes += size
+
+    # 把目录 mtime 设为过去的时间，使扫描索引认为目录已“稳定”
+    settled = time.time() - 3600
+    for path in project_dirs + [root]:
+        os.utime(path, (settled, settled))
+    return {"root": root, "projects": projects, "pkg_bytes": total_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Wallpaper Engine workshop library.")
+    parser.add_argument("root", help="target directory, e.g. .../workshop/content/431960")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--entries", type=int, default=8, help="entries per package")
+    parser.add_argument("--pkg-kb", type=float, default=64, help="average package size in KB")
+    parser.add_argument("--seed", type=int, default=431960)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = generate_library(args.root, args.projects, args.entries, args.pkg_kb, args.seed)
+    print(f"generated {stats['projects']} projects ({stats['pkg_bytes'] / 1024 / 1024:.1f} MB of packages) "
+          f"in {time.perf_counter() - started:.1f}s: {stats['root']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+测试夹具 / Shared pytest fixtures
+提取测试使用 benchmarks/fake_repkg.py 代替 RePKG.exe，工坊目录由 benchmarks/workshop_gen.py 生成。
+"""
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+import bench_core  # noqa: E402
+import scan_index  # noqa: E402
+from workshop_gen import generate_library  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def index_cache_dir(tmp_path, monkeypatch):
+    """扫描与元数据索引写入临时目录，而不是程序目录下的 assets/index_cache"""
+    cache_dir = str(tmp_path / "index_cache")
+    monkeypatch.setattr(scan_index, "INDEX_CACHE_DIR", cache_dir)
+    return cache_dir
+
+
+@pytest.fixture
+def library(tmp_path):
+    """生成一个含 6 个项目的小型工坊目录，返回其路径"""
+    root = str(tmp_path / "431960")
+    generate_library(root, projects=6, entries=4, pkg_kb=4)
+    return root
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    """调用 fake_repkg.py 的可执行包装脚本"""
+    monkeypatch.setenv("REPKG_FAKE_LATENCY_MS", "0")
+    monkeypatch.delenv("REPKG_FAKE_FAIL", raising=False)
+    return bench_core.make_extractor_wrapper(str(tmp_path))
+
+
+@pytest.fixture
+def in_place_settings(library, extractor):
+    """原地替换模式（输入目录即输出目录，自动备份）的设置工厂"""
+    def make(backup_mode="copy", **overrides):
+        settings = bench_core.bench_settings(extractor, library, library, 2)
+        settings.update(auto_backup=True, backup_mode=backup_mode)
+        settings.update(overrides)
+        return settings
+    return make
+
+
+def snapshot_tree(root):
+    """目录树中所有文件的 {相对路径: 内容}，跳过以 . 开头的目录与文件（备份、索引等旁路数据）"""
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for name in filenames:
+            if name.startswith("."):
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return tree
@@ -0,0 +1,159 @@
+"""
+批量任务日志 / Append-only job journal for resuming interrupted batches
+
+run_batch 在输出根目录写入 .repkg_journal.jsonl，每行一条 JSON 记录：
+    {"e": "batch", "input", "options", "time"}   批次开始（继续上次的批次时为 "resume"）
+    {"e": "backup", "path"}                      创建了本批次的备份目录
+    {"e": "start", "p"}                          包的备份已完成，开始提取
+    {"e": "end", "p", "c", "r"}                  提取结束：退出码，成功时附带增量清单记录
+批次正常结束并保存增量清单后删除日志；界面被关闭或程序崩溃时日志保留，下次运行可以只处理未完成的包，
+并沿用已有的 backup_<ts> 批次（已开始提取的包不会被再次备份，否则会把提取了一半的文件当作原始文件）。
+
+每条记录直接写入文件（没有用户态缓冲，进程被结束也不会丢失），fsync 按批进行：
+每 SYNC_EVERY 条记录或距上次同步超过 SYNC_SECONDS 秒时同步一次。
+只有系统崩溃或断电才可能丢失最后一批记录，对应的包在继续运行时会被重新提取。
+"""
+import json
+import os
+import threading
+import time
+
+JOURNAL_FILE = ".repkg_journal.jsonl"
+SYNC_EVERY = 64
+SYNC_SECONDS = 1.0
+
+
+def journal_path(output_root):
+    return os.path.join(output_root, JOURNAL_FILE)
+
+
+class JournalState:
+    """回放日志得到的未完成批次状态"""
+
+    __slots__ = ("input_dir", "options", "backup_path", "started", "exit_codes", "records", "entries")
+
+    def __init__(self):
+        self.input_dir = ""
+        self.options = ""
+        self.backup_path = None
+        self.started = set()  # 已开始提取的包
+        self.exit_codes = {}  # 包 → 最近一次的退出码
+        self.records = {}  # 包 → 增量清单记录（成功的包）
+        self.entries = 0
+
+    @property
+    def completed(self):
+        """已成功提取、继续运行时可以跳过的包"""
+        return {pkg_path for pkg_path, code in self.exit_codes.items() if code == 0}
+
+    @property
+    def interrupted(self):
+        """已开始提取但没有结束记录的包"""
+        return self.started.difference(self.exit_codes)
+
+    @property
+    def failed(self):
+        return {pkg_path for pkg_path, code in self.exit_codes.items() if code != 0}
+
+
+def replay(output_root):
+    """
+    读取输出根目录中的任务日志，返回 JournalState；没有日志（上次批次已正常结束）时返回 None
+    最后一行可能因崩溃而不完整，无法解析的行被忽略
+    """
+    try:
+        with open(journal_path(output_root), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    state = JournalState()
+    loads = json.loads
+    for line in data.splitlines():
+        try:
+            record = loads(line)
+            event = record["e"]
+        except (ValueError, KeyError, TypeError):
+            continue
+        state.entries += 1
+        if event == "end":
+            state.exit_codes[record["p"]] = record["c"]
+            if record.get("r"):
+                state.records[record["p"]] = record["r"]
+        elif event == "start":
+            state.started.add(record["p"])
+        elif event == "backup":
+            state.backup_path = record["path"]
+        elif event in ("batch", "resume"):
+            # 继续运行或重试时日志可能以 "resume" 开头，其中同样记录了输入目录与选项
+            state.input_dir = record.get("input", "")
+            state.options = record.get("options", "")
+    return state if state.entries else None
+
+
+def discard(output_root):
+    """删除任务日志（放弃继续上次的批次）"""
+    try:
+        os.remove(journal_path(output_root))
+    except FileNotFoundError:
+        pass
+
+
+class JobJournal:
+    """
+    追加写入的任务日志，可在多个工作线程间共享。
+    无法创建日志文件时（例如输出目录只读）write() 不做任何事，不影响提取。
+
+    用法 / Usage:
+        journal = JobJournal(output_root)
+        journal.open({"e": "batch", ...}, append=False)
+        journal.write({"e": "start", "p": pkg_path})
+        journal.close()
+        discard(output_root)             # 批次正常结束且增量清单已保存
+    """
+
+    def __init__(self, output_root):
+        self.path = journal_path(output_root)
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def open(self, header, append=False):
+        """打开日志并写入批次记录；append 为 True 时在上次的日志后继续写入"""
+        # buffering=0：每条记录立即交给操作系统
+        self._file = open(self.path, "ab" if append else "wb", buffering=0)
+        self.write(header)
+        self.sync()
+
+    def write(self, record):
+        if self._file is None:
+            return
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= SYNC_EVERY or time.monotonic() - self._last_sync >= SYNC_SECONDS:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            if self._file is not None and self._pending:
+                self._sync_locked()
+
+    def close(self):
+        """同步并关闭（日志保留，由调用方在保存增量清单后 discard）"""
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                if self._pending:
+                    self._sync_locked()
+            finally:
+                self._file.close()
+                self._file = None
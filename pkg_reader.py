@@ -0,0 +1,249 @@
+"""
+Wallpaper Engine PKG 容器读取器（纯 Python，基于 mmap）
+In-process reader for Wallpaper Engine PKG containers (pure Python, mmap based)
+
+PKG 文件布局（小端序）/ File layout (little-endian):
+    uint32 magic_length + magic            例如 "PKGV0001"
+    uint32 entry_count
+    entry_count × {
+        uint32 name_length + name          条目相对路径，如 "materials/a.tex"
+        uint32 offset                      相对于数据区起点的偏移
+        uint32 size
+    }
+    数据区 / data area                     紧随条目表之后
+"""
+import fnmatch
+import mmap
+import os
+import struct
+
+_UINT32 = struct.Struct("<I")
+
+MAX_MAGIC_LENGTH = 32
+MAX_NAME_LENGTH = 255
+
+
+class PkgFormatError(ValueError):
+    """PKG 文件格式错误 / Raised when a file is not a valid PKG container"""
+
+
+class PkgEntry:
+    """PKG 中的单个条目（名称、数据区内偏移、大小）"""
+
+    __slots__ = ("name", "offset", "size")
+
+    def __init__(self, name, offset, size):
+        self.name = name
+        self.offset = offset
+        self.size = size
+
+    @property
+    def extension(self):
+        """小写扩展名（含点），如 '.tex'"""
+        return os.path.splitext(self.name)[1].lower()
+
+    def __repr__(self):
+        return f"PkgEntry({self.name!r}, offset={self.offset}, size={self.size})"
+
+
+class PkgReader:
+    """
+    以只读 mmap 方式打开 PKG 文件，解析条目表，并以零拷贝 memoryview 暴露条目数据。
+    注意：在调用 close() 之前必须释放所有通过 read() 获得的 memoryview。
+
+    用法 / Usage:
+        with PkgReader(path) as pkg:
+            for entry in pkg.entries:
+                data = pkg.read(entry)   # memoryview, zero-copy
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.magic = ""
+        self.entries = []
+        self.header_size = 0
+        self._file = open(path, "rb")
+        try:
+            if os.fstat(self._file.fileno()).st_size == 0:
+                raise PkgFormatError(f"空文件 / Empty file: {path}")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+        try:
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_uint32(self, pos):
+        if pos + 4 > len(self._mmap):
+            raise PkgFormatError(f"文件头被截断 / Truncated header: {self.path}")
+        return _UINT32.unpack_from(self._mmap, pos)[0], pos + 4
+
+    def _read_string(self, pos, max_length):
+        length, pos = self._read_uint32(pos)
+        if length > max_length or pos + length > len(self._mmap):
+            raise PkgFormatError(f"无效的字符串长度 {length} / Invalid string length: {self.path}")
+        value = self._mmap[pos:pos + length].decode("utf-8", errors="replace")
+        return value, pos + length
+
+    def _parse_header(self):
+        self.magic, pos = self._read_string(0, MAX_MAGIC_LENGTH)
+        if not self.magic.startswith("PKGV"):
+            raise PkgFormatError(f"不是 PKG 文件（magic={self.magic!r}）/ Not a PKG file: {self.path}")
+
+        entry_count, pos = self._read_uint32(pos)
+        raw_entries = []
+        for _ in range(entry_count):
+            name, pos = self._read_string(pos, MAX_NAME_LENGTH)
+            offset, pos = self._read_uint32(pos)
+            size, pos = self._read_uint32(pos)
+            raw_entries.append((name, offset, size))
+
+        self.header_size = pos
+        data_size = len(self._mmap) - pos
+        for name, offset, size in raw_entries:
+            if offset + size > data_size:
+                raise PkgFormatError(f"条目 {name} 超出文件范围 / Entry out of bounds: {self.path}")
+            self.entries.append(PkgEntry(name, offset, size))
+
+    @property
+    def total_size(self):
+        """所有条目数据的总字节数"""
+        return sum(entry.size for entry in self.entries)
+
+    def read(self, entry):
+        """返回条目数据的零拷贝 memoryview / Zero-copy view of an entry's bytes"""
+        start = self.header_size + entry.offset
+        return self._view[start:start + entry.size]
+
+    def find(self, name):
+        """按名称查找条目（大小写不敏感，兼容 '/' 与 '\\'）"""
+        wanted = name.replace("\\", "/").lower()
+        for entry in self.entries:
+            if entry.name.replace("\\", "/").lower() == wanted:
+                return entry
+        return None
+
+    def close(self):
+        if self._file is None:
+            return
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def read_pkg_entries(path):
+    """只读取条目表并立即关闭文件 / Read only the entry table of a PKG file"""
+    with PkgReader(path) as pkg:
+        return pkg.magic, list(pkg.entries)
+
+
+def format_pkg_info(path):
+    """生成与 RePKG info 模式类似的文本摘要 / Text summary similar to RePKG's info mode"""
+    magic, entries = read_pkg_entries(path)
+    lines = [f"Package: {path}\n",
+             f"  Magic: {magic}\n",
+             f"  Entries: {len(entries)}\n",
+             f"  Total size: {sum(e.size for e in entries)} bytes\n"]
+    for entry in sorted(entries, key=lambda e: e.name):
+        lines.append(f"    {entry.name} ({entry.size} bytes)\n")
+    return "".join(lines)
+
+
+def parse_filter_text(text):
+    """将逗号/分号/换行分隔的过滤规则文本拆分为列表"""
+    for sep in (";", "\n"):
+        text = text.replace(sep, ",")
+    return [token.strip() for token in text.split(",") if token.strip()]
+
+
+def _match_pattern(name, pattern):
+    """
+    单条规则匹配（大小写不敏感）:
+        - "mp3" / ".mp3"          按扩展名匹配
+        - "scene.json" / "*.frag" 匹配文件名
+        - "shaders/*"             含 '/' 时匹配完整相对路径
+    """
+    pattern = pattern.replace("\\", "/").lower()
+    has_wildcard = any(ch in pattern for ch in "*?[")
+    if not has_wildcard and "/" not in pattern and (pattern.startswith(".") or "." not in pattern):
+        return name.endswith("." + pattern.lstrip("."))
+    if "/" in pattern:
+        return fnmatch.fnmatchcase(name, pattern)
+    return fnmatch.fnmatchcase(name.rsplit("/", 1)[-1], pattern)
+
+
+def compile_entry_filter(include=None, exclude=None):
+    """
+    根据包含/排除规则生成条目过滤函数；include 为空表示包含全部
+    Build a predicate ``f(entry_name) -> bool`` from include/exclude patterns
+    """
+    include = list(include or [])
+    exclude = list(exclude or [])
+
+    def predicate(entry_name):
+        name = entry_name.replace("\\", "/").lower()
+        if include and not any(_match_pattern(name, p) for p in include):
+            return False
+        return not any(_match_pattern(name, p) for p in exclude)
+
+    return predicate
+
+
+def extract_entries(pkg_path, output_dir, predicate=None, overwrite=True):
+    """
+    只提取满足过滤条件的条目到输出目录（保持包内相对路径）
+    Extract the entries accepted by ``predicate`` into ``output_dir``
+
+    返回统计字典：written / written_bytes / skipped / skipped_bytes / total_bytes
+    """
+    stats = {"written": 0, "written_bytes": 0, "skipped": 0, "skipped_bytes": 0, "total_bytes": 0}
+    output_root = os.path.abspath(output_dir)
+
+    with PkgReader(pkg_path) as pkg:
+        for entry in pkg.entries:
+            stats["total_bytes"] += entry.size
+            dest_path = os.path.abspath(os.path.join(output_root, *entry.name.replace("\\", "/").split("/")))
+            accepted = predicate is None or predicate(entry.name)
+            # 防止条目名称中的 .. 写出输出目录
+            inside = os.path.commonpath([output_root, dest_path]) == output_root
+            if not accepted or not inside or (not overwrite and os.path.exists(dest_path)):
+                stats["skipped"] += 1
+                stats["skipped_bytes"] += entry.size
+                continue
+
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            data = pkg.read(entry)
+            try:
+                with open(dest_path, "wb") as f:
+                    f.write(data)
+            finally:
+                data.release()
+            stats["written"] += 1
+            stats["written_bytes"] += entry.size
+    return stats
+
+
+def format_size(num_bytes):
+    """人类可读的字节数 / Human readable byte count"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
@@ -0,0 +1,159 @@
+"""
+project.json 元数据索引 / Cached, parallel project.json loader
+
+分类与状态统计需要读取每个项目的 project.json。本模块用线程池一次性并行读取所有文件，
+并把解析结果（type / title 或解析错误）保存在程序的索引缓存目录中（与扫描索引相同，不写入库目录），
+以“相对路径 + mtime + 大小”为键：再次运行时只有发生变化的 project.json 才会被重新解析。
+
+解析失败的文件同样被缓存（直到文件被修改），调用方可以一次性汇总报告。
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_index import MTIME_SETTLE_SECONDS, cache_path, write_atomic
+
+PROJECT_META_FILE = ".repkg_project_meta.json"
+PROJECT_META_VERSION = 1
+PROJECT_JSON = "project.json"
+
+
+class ProjectMeta:
+    """单个项目的元数据；没有 project.json 时 exists 为 False，解析失败时 error 为错误信息"""
+
+    __slots__ = ("type", "title", "error", "exists")
+
+    def __init__(self, type="", title="", error=None, exists=True):
+        self.type = type
+        self.title = title
+        self.error = error
+        self.exists = exists
+
+    def __repr__(self):
+        return f"ProjectMeta(type={self.type!r}, title={self.title!r}, error={self.error!r}, exists={self.exists})"
+
+
+def parse_project_json(json_path):
+    """读取并解析 project.json，返回 ProjectMeta（不抛出解析错误）"""
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("顶层不是 JSON 对象 / top level is not a JSON object")
+        project_type = data.get("type", "")
+        title = data.get("title", "")
+        return ProjectMeta(project_type.strip() if isinstance(project_type, str) else "",
+                           title if isinstance(title, str) else "")
+    except (OSError, ValueError) as e:
+        return ProjectMeta(error=str(e))
+
+
+class ProjectMetaIndex:
+    """
+    以 mtime 校验的 project.json 解析缓存。
+
+    用法 / Usage:
+        index = ProjectMetaIndex(root_dir)
+        metas = index.load(project_dirs)      # {项目目录: ProjectMeta}
+        index.rename(old_dir, new_dir)        # 移动项目后保留缓存
+        index.save()
+    """
+
+    def __init__(self, root_dir, index_path=None, workers=None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_path = index_path or cache_path(self.root_dir, PROJECT_META_FILE)
+        self.workers = workers
+        self._prefix = os.path.join(self.root_dir, "")
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == PROJECT_META_VERSION and isinstance(data.get("entries"), dict):
+                self.entries = data["entries"]
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _key(self, project_dir):
+        # 项目目录通常以根目录开头，直接截取前缀比 relpath 快得多
+        if project_dir.startswith(self._prefix):
+            return project_dir[len(self._prefix):].replace(os.sep, "/")
+        return os.path.relpath(os.path.abspath(project_dir), self.root_dir).replace(os.sep, "/")
+
+    def _load_one(self, project_dir):
+        json_path = os.path.join(project_dir, PROJECT_JSON)
+        try:
+            st = os.stat(json_path)
+        except OSError:
+            return ProjectMeta(exists=False)
+
+        key = self._key(project_dir)
+        with self._lock:
+            cached = self.entries.get(key)
+        if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+            with self._lock:
+                self.hits += 1
+            return ProjectMeta(cached["type"], cached["title"], cached["error"])
+
+        meta = parse_project_json(json_path)
+        # 刚修改过的文件可能仍在写入（或 mtime 精度不足），暂不缓存
+        stable = (time.time() - st.st_mtime_ns / 1e9) > MTIME_SETTLE_SECONDS
+        with self._lock:
+            self.misses += 1
+            if stable:
+                self.entries[key] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "type": meta.type,
+                                     "title": meta.title, "error": meta.error}
+                self._dirty = True
+        return meta
+
+    def load(self, project_dirs):
+        """并行读取多个项目的元数据，返回 {项目目录: ProjectMeta}（保持输入顺序）"""
+        project_dirs = list(project_dirs)
+        if not project_dirs:
+            return {}
+        # 按块提交任务：缓存命中时单个项目只需一次 stat，逐个提交的线程池开销反而更大
+        workers = self.workers or min(32, (os.cpu_count() or 1) + 4)
+        chunk_size = max(1, -(-len(project_dirs) // (workers * 4)))
+        chunks = [project_dirs[i:i + chunk_size] for i in range(0, len(project_dirs), chunk_size)]
+        metas = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk, results in zip(chunks, pool.map(lambda chunk: [self._load_one(d) for d in chunk], chunks)):
+                metas.update(zip(chunk, results))
+        return metas
+
+    def rename(self, old_dir, new_dir):
+        """项目目录被移动后迁移缓存记录（移动不会改变 project.json 的 mtime）"""
+        with self._lock:
+            record = self.entries.pop(self._key(old_dir), None)
+            if record is not None:
+                self.entries[self._key(new_dir)] = record
+                self._dirty = True
+
+    def prune(self):
+        """移除已不存在的项目的缓存记录"""
+        with self._lock:
+            for key in list(self.entries):
+                if not os.path.isfile(os.path.join(self.root_dir, key, PROJECT_JSON)):
+                    del self.entries[key]
+                    self._dirty = True
+
+    def save(self):
+        """保存索引（没有变化时不写入，写入时先写临时文件再替换）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"version": PROJECT_META_VERSION, "entries": self.entries}, ensure_ascii=False,
+                                 separators=(",", ":"))
+            self._dirty = False
+        try:
+            write_atomic(self.index_path, payload)
+        except OSError as e:
+            print(f"  [Warning]  无法保存元数据索引 / Cannot save project metadata index {self.index_path}: {e}")
@@ -0,0 +1,300 @@
+"""
+RePKG 命令行入口（无需图形界面）/ Headless command-line entry point
+
+与 RePKG-GUI.py 共用 repkg_core 中的逻辑和 assets/repkg_config.json 配置，
+命令行参数只覆盖本次运行的设置，不会写回配置文件。本模块不导入 tkinter，
+可在计划任务或服务账户中运行。
+
+用法 / Usage:
+    python repkg_cli.py extract [--input DIR] [--output DIR] [--workers N] [--include R] [--exclude R] [--resume | --fresh]
+    python repkg_cli.py info [--input DIR]
+    python repkg_cli.py classify [DIR] [--map]
+    python repkg_cli.py map [DIR] [--remove]
+    python repkg_cli.py status [DIR] [--bytes]
+    python repkg_cli.py backup list [ROOT]
+    python repkg_cli.py backup restore NAME [ROOT] [--project ID ...]
+    python repkg_cli.py backup prune [ROOT] [--keep-last N] [--keep-days N] [--max-gb N] [--dry-run]
+
+全局选项 / Global options:
+    --config PATH   配置文件（默认为脚本目录下的 assets/repkg_config.json）
+    --json          在标准输出打印 JSON 结果，日志改写到标准错误
+    --timing        在标准错误打印启动耗时与总耗时
+
+退出码 / Exit codes:
+    0  成功 / success
+    1  部分任务失败 / some jobs failed
+    2  参数错误 / usage error
+    3  配置或路径错误、运行异常 / configuration error or unexpected exception
+    4  没有可处理的内容（未找到 .pkg 或备份）/ nothing to do
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+
+import job_journal  # noqa: E402
+import repkg_core  # noqa: E402
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG_PATH = os.path.join(SCRIPT_DIR, repkg_core.CONFIG_FILE)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_ERROR = 3
+EXIT_NOTHING = 4
+
+
+class CliError(Exception):
+    """配置或参数无效，以 EXIT_ERROR 退出"""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="repkg_cli", description="RePKG batch tool without the GUI")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="path to repkg_config.json")
+    parser.add_argument("--json", action="store_true", help="print a JSON result on stdout, logs go to stderr")
+    parser.add_argument("--timing", action="store_true", help="print startup and total time on stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("extract", "extract all packages under the input directory"),
+                            ("info", "print the entry table of all packages")):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("--input", help="input directory (default: config input_dir)")
+        sub.add_argument("--output", help="output directory (default: config output_dir)")
+        sub.add_argument("--repkg", help="path to RePKG.exe (default: config repkg_path)")
+        sub.add_argument("--workers", type=int, help="number of concurrent jobs")
+        sub.add_argument("--no-recursive", action="store_true", help="only scan the top level of the input")
+        if name == "extract":
+            sub.add_argument("--include", help="only extract matching entries, e.g. \"tex,json\"")
+            sub.add_argument("--exclude", help="skip matching entries, e.g. \"mp3,ogg\"")
+            sub.add_argument("--no-incremental", action="store_true", help="extract unchanged packages again")
+            journal = sub.add_mutually_exclusive_group()
+            journal.add_argument("--resume", action="store_true",
+                                 help="continue an interrupted batch: skip packages it finished and reuse its backup")
+            journal.add_argument("--fresh", action="store_true",
+                                 help="discard the journal of an interrupted batch and start a new one")
+
+    sub = commands.add_parser("classify", help="move projects into folders named after their type")
+    sub.add_argument("dir", nargs="?", help="classify root (default: config classify_dir)")
+    sub.add_argument("--map", action="store_true", help="create hidden mapping links afterwards")
+
+    sub = commands.add_parser("map", help="create (or remove) hidden mapping links")
+    sub.add_argument("dir", nargs="?", help="classify root (default: config classify_dir)")
+    sub.add_argument("--remove", action="store_true", help="remove all mapping links instead")
+
+    sub = commands.add_parser("status", help="list categories and mapping links")
+    sub.add_argument("dir", nargs="?", help="classify root (default: config classify_dir)")
+    sub.add_argument("--bytes", action="store_true", help="also measure the size of each category (walks every project)")
+
+    backup = commands.add_parser("backup", help="list or restore unified backups")
+    backup_commands = backup.add_subparsers(dest="backup_command", required=True)
+    sub = backup_commands.add_parser("list", help="list backup batches, newest first")
+    sub.add_argument("root", nargs="?", help="unified backup root (default: config unified_backup_root)")
+    sub = backup_commands.add_parser("restore", help="restore one backup batch")
+    sub.add_argument("name", help="backup batch name, e.g. backup_20250101_120000")
+    sub.add_argument("root", nargs="?", help="unified backup root (default: config unified_backup_root)")
+    sub.add_argument("--project", action="append", dest="projects", metavar="ID",
+                     help="restore only this project (repeatable; default: the whole batch)")
+    sub.add_argument("--workers", type=int, help="projects restored in parallel (default: config workers)")
+    sub = backup_commands.add_parser("prune", help="delete the oldest batches according to retention rules")
+    sub.add_argument("root", nargs="?", help="unified backup root (default: config unified_backup_root)")
+    sub.add_argument("--keep-last", type=int, help="keep the newest N batches (default: config backup_keep_last)")
+    sub.add_argument("--keep-days", type=float, help="keep batches newer than N days (default: config backup_keep_days)")
+    sub.add_argument("--max-gb", type=float, help="keep the total size under N GB (default: config backup_max_gb)")
+    sub.add_argument("--dry-run", action="store_true", help="only list the batches that would be deleted")
+    return parser
+
+
+def resolve_path(path):
+    """配置中的相对路径按脚本目录解析，与在脚本目录启动 GUI 时的行为一致"""
+    if path and not os.path.isabs(path):
+        return os.path.join(SCRIPT_DIR, path)
+    return path
+
+
+def choose_path(arg, config_value):
+    """命令行中给出的路径按当前目录解析，否则使用配置中的值（按脚本目录解析）"""
+    return os.path.abspath(arg) if arg else resolve_path(config_value)
+
+
+def require_dir(path, what):
+    if not path:
+        raise CliError(f"未设置{what} / {what} is not configured")
+    if not os.path.isdir(path):
+        raise CliError(f"{what}不存在 / Directory not found: {path}")
+    return path
+
+
+def cmd_extract(args, settings, log):
+    # 命令行中的路径在覆盖配置前转为绝对路径，之后的 resolve_path 不会再改变它们
+    if args.input:
+        settings["input_dir"] = os.path.abspath(args.input)
+    if args.output:
+        settings["output_dir"] = os.path.abspath(args.output)
+    if args.repkg:
+        settings["repkg_path"] = os.path.abspath(args.repkg)
+    if args.workers:
+        settings["workers"] = args.workers
+    if args.no_recursive:
+        settings["recursive"] = False
+    if args.command == "info":
+        settings["mode"] = "info"
+    else:
+        settings["mode"] = "extract"
+        if args.include is not None:
+            settings["include_filters"] = args.include
+        if args.exclude is not None:
+            settings["exclude_filters"] = args.exclude
+        if args.no_incremental:
+            settings["incremental"] = False
+
+    settings["repkg_path"] = resolve_path(settings["repkg_path"])
+    output_dir = resolve_path(settings["output_dir"])
+    if not output_dir:
+        raise CliError("未设置输出目录 / output directory is not configured")
+
+    # 继续被中断的批次：未指定 --input 时使用该批次的输入目录
+    resume = None
+    if getattr(args, "resume", False):
+        resume = job_journal.replay(output_dir)
+        if resume is None:
+            log("没有未完成的批次，开始新的批次 / No interrupted batch found, starting a new one\n")
+        elif resume.input_dir and not args.input:
+            settings["input_dir"] = resume.input_dir
+    elif getattr(args, "fresh", False):
+        job_journal.discard(output_dir)
+    elif args.command == "extract" and job_journal.replay(output_dir) is not None:
+        # 新的批次会覆盖任务日志，与 GUI 一样先让用户决定是否继续
+        log(f"[Error] 输出目录中有未完成的批次 / An interrupted batch was found in {output_dir}: "
+            "use --resume to continue it or --fresh to discard it\n")
+        return EXIT_USAGE, {"error": "interrupted batch"}
+
+    input_dir = require_dir(resolve_path(settings["input_dir"]), "输入目录")
+    os.makedirs(output_dir, exist_ok=True)
+    settings["input_dir"], settings["output_dir"] = input_dir, output_dir
+
+    # 选项或输入目录与上次不同时不能继续，否则按旧设置提取的包会被当作已完成而跳过
+    reason = resume and repkg_core.check_resume(settings, resume)
+    if reason:
+        raise CliError(f"无法继续上次的批次 / Cannot resume the interrupted batch: {reason}")
+
+    summary = repkg_core.run_batch(settings, repkg_core.iter_pkg_files(input_dir, settings["recursive"]), log,
+                                   resume=resume)
+    if summary["discovered"] == 0:
+        code = EXIT_NOTHING
+    else:
+        code = EXIT_FAILED if summary["failed"] else EXIT_OK
+    return code, summary
+
+
+def cmd_classify(args, settings, log):
+    target_dir = require_dir(choose_path(args.dir, settings["classify_dir"]), "分类根目录")
+    classified, errors = repkg_core.classify_projects(target_dir, log, create_mapping=args.map)
+    return (EXIT_FAILED if errors else EXIT_OK), {"classified": classified, "errors": errors}
+
+
+def cmd_map(args, settings, log):
+    target_dir = require_dir(choose_path(args.dir, settings["classify_dir"]), "分类根目录")
+    if args.remove:
+        removed = repkg_core.remove_all_mappings(target_dir, log, settings.get("workers"))
+        return EXIT_OK, {"removed": removed}
+    result = repkg_core.create_transparent_mapping(target_dir, log, settings.get("workers"))
+    return (EXIT_FAILED if result["failed"] else EXIT_OK), result
+
+
+def cmd_status(args, settings, log):
+    target_dir = require_dir(choose_path(args.dir, settings["classify_dir"]), "分类根目录")
+    return EXIT_OK, repkg_core.list_current_status(target_dir, log, args.bytes, settings.get("workers"))
+
+
+def cmd_backup(args, settings, log):
+    root = require_dir(choose_path(args.root, settings["unified_backup_root"]), "统一备份根目录")
+    backups = repkg_core.list_backups(root)
+    if args.backup_command == "list":
+        for name in backups:
+            log(f"{name}\n")
+        return (EXIT_OK if backups else EXIT_NOTHING), {"backups": backups}
+    if args.backup_command == "prune":
+        for option, key in (("keep_last", "backup_keep_last"), ("keep_days", "backup_keep_days"),
+                            ("max_gb", "backup_max_gb")):
+            if getattr(args, option) is not None:
+                settings[key] = getattr(args, option)
+        rules = repkg_core.get_retention_rules(settings)
+        if not any(rules):
+            log("[Error] 未设置任何保留规则 / No retention rule: use --keep-last, --keep-days or --max-gb\n")
+            return EXIT_USAGE, {"deleted": []}
+        result = repkg_core.apply_backup_retention(root, log, *rules, dry_run=args.dry_run,
+                                                   workers=settings.get("workers"))
+        return (EXIT_OK if result["deleted"] else EXIT_NOTHING), result
+
+    if args.name not in backups:
+        log(f"[Error] 未找到批次备份 / Backup not found: {args.name}\n")
+        return EXIT_NOTHING, {"restored": False}
+    restored = repkg_core.restore_selected_backup(root, args.name, log, args.projects,
+                                                  args.workers or settings.get("workers"))
+    return (EXIT_OK if restored else EXIT_FAILED), {"restored": restored}
+
+
+COMMANDS = {
+    "extract": cmd_extract,
+    "info": cmd_extract,
+    "classify": cmd_classify,
+    "map": cmd_map,
+    "status": cmd_status,
+    "backup": cmd_backup,
+}
+
+
+def main(argv=None):
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_USAGE if e.code else EXIT_OK
+
+    startup_ms = (time.perf_counter() - _STARTED) * 1000
+    if args.timing:
+        print(f"[timing] startup {startup_ms:.1f} ms", file=sys.stderr)
+
+    # JSON 模式下标准输出只保留结果，日志（包括核心模块中的 print）写到标准错误
+    stream = sys.stderr if args.json else sys.stdout
+    stdout = sys.stdout
+
+    def log(message):
+        stream.write(message)
+        stream.flush()
+
+    settings = repkg_core.load_config(args.config)
+    try:
+        sys.stdout = stream
+        code, result = COMMANDS[args.command](args, settings, log)
+    except CliError as e:
+        code, result = EXIT_ERROR, {"error": str(e)}
+        print(f"[Error] {e}", file=sys.stderr)
+    except Exception as e:
+        code, result = EXIT_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        print(f"[Error] {type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        sys.stdout = stdout
+
+    total_ms = (time.perf_counter() - _STARTED) * 1000
+    if args.timing:
+        print(f"[timing] total {total_ms:.1f} ms", file=sys.stderr)
+    if args.json:
+        payload = {"command": args.command, "exit_code": code, "startup_ms": round(startup_ms, 1),
+                   "total_ms": round(total_ms, 1), "result": result}
+        json.dump(payload, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    return code
+
+
+if __name__ == "__main__":
+    # 内置 TEX 解码器使用进程池，打包为 exe 后需要 freeze_support（未打包时跳过，避免拖慢启动）
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,2215 @@
+"""
+RePKG 核心逻辑（不依赖 tkinter）/ Core RePKG batch logic without any GUI dependency
+
+图形界面（RePKG-GUI.py）与命令行（repkg_cli.py）共用本模块。
+所有操作都通过 settings 字典（与 repkg_config.json 的键一致）和 log_callback 驱动，
+因此可以在没有显示器的环境（计划任务、服务账户）中运行。
+
+为保证命令行启动速度，ctypes、subprocess、tex_decoder（NumPy）和线程/进程池均在使用时才导入。
+"""
+import datetime  # 用于备份时间戳
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import backup_store
+import job_journal
+import run_report
+from project_meta import ProjectMetaIndex
+from scan_index import ScanIndex
+from pkg_reader import (PkgFormatError, compile_entry_filter, extract_entries, format_pkg_info, format_size,
+                        parse_filter_text, read_pkg_entries)
+
+CONFIG_FILE = "assets/repkg_config.json"
+MANIFEST_FILE = ".repkg_manifest.json"
+
+UNIFIED_BACKUP_DIR = ".unified_backup"
+
+# 原地替换模式的备份方式 / Backup modes for in-place replace
+BACKUP_MODES = {
+    "hardlink": "硬链接快照（同一磁盘上几乎不占用额外空间）",
+    "minimal": "差异备份（只备份提取会覆盖的文件）",
+    "dedup": "内容去重存储（相同文件在所有批次中只保存一份）",
+    "archive": "压缩归档（每个项目一个压缩文件）",
+    "copy": "完整复制",
+}
+
+
+class BackupError(OSError):
+    """项目备份不完整 / Raised when a project could not be fully backed up; the extraction must not run"""
+
+
+# 预览图像扩展名，按优先级排列
+PREVIEW_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tiff", ".webp")
+_PREVIEW_PRIORITY = {ext: rank for rank, ext in enumerate(PREVIEW_EXTENSIONS)}
+
+# settings 键与 RePKG 命令行参数的对应关系（顺序即参数顺序）
+COMMAND_OPTIONS = [
+    ("tex", "-t"),
+    ("copyproject", "-c"),
+    ("usename", "-n"),
+    ("overwrite", "--overwrite"),
+    ("recursive", "-r"),
+]
+
+
+def win_path(path: str) -> str:
+    """将路径统一转换为 Windows 格式（反斜杠）"""
+    return os.path.normpath(path)
+
+
+def default_worker_count():
+    """
+    根据 CPU 核心数给出默认并发任务数（提取主要受磁盘限制，上限为 8）
+    Default number of concurrent extraction jobs based on core count
+    """
+    return max(1, min(8, os.cpu_count() or 1))
+
+
+def set_file_hidden(file_path):
+    """
+    设置文件为隐藏属性
+    Set file as hidden attribute
+    """
+    try:
+        # 使用 Windows API 设置文件属性为隐藏
+        import ctypes
+        FILE_ATTRIBUTE_HIDDEN = 0x2
+        ctypes.windll.kernel32.SetFileAttributesW(file_path, FILE_ATTRIBUTE_HIDDEN)
+        return True
+    except Exception as e:
+        print(f"  [Warning]  无法设置隐藏属性 / Cannot set hidden attribute for {file_path}: {e}")
+        return False
+
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256 哈希 / Compute SHA-256 of file content"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_key(pkg_path):
+    """清单中使用的包路径键（绝对路径，大小写规范化）"""
+    return os.path.normcase(os.path.abspath(pkg_path))
+
+
+def load_manifest(output_root):
+    """
+    读取输出根目录中的增量提取清单
+    Load the incremental extraction manifest stored in the output root
+    """
+    manifest_path = os.path.join(output_root, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if isinstance(manifest.get("packages"), dict):
+                return manifest
+        except Exception as e:
+            print(f"  [Warning]  无法读取增量清单 / Cannot read manifest {manifest_path}: {e}")
+    return {"version": 1, "packages": {}}
+
+
+def save_manifest(output_root, manifest):
+    """
+    写入增量提取清单（先写临时文件再替换，避免中断时损坏）
+    Save the manifest atomically
+    """
+    manifest_path = os.path.join(output_root, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def package_fingerprint(pkg_path, with_hash=False):
+    """获取包的指纹：大小、修改时间以及可选的内容哈希"""
+    st = os.stat(pkg_path)
+    return {
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "hash": file_content_hash(pkg_path) if with_hash else None,
+    }
+
+
+def is_package_unchanged(record, pkg_path, options_signature, output_dir, with_hash=False):
+    """
+    判断包自上次提取后是否未变化（输入、选项一致且输出目录仍存在）
+    Return True when a package can be skipped by incremental extraction
+    """
+    if not record or record.get("options") != options_signature:
+        return False
+    if not os.path.isdir(output_dir):
+        return False
+    try:
+        st = os.stat(pkg_path)
+    except OSError:
+        return False
+    if st.st_size != record.get("size"):
+        return False
+    if with_hash:
+        # 启用哈希时以内容为准，即使修改时间被 Steam 更新也可跳过
+        return bool(record.get("hash")) and file_content_hash(pkg_path) == record["hash"]
+    return st.st_mtime == record.get("mtime")
+
+
+def _is_mapping_target(name, target):
+    """判断链接是否为本工具创建的映射：相对路径 <分类>/<同名项目>"""
+    parts = target.replace("\\", "/").strip("/").split("/")
+    return not os.path.isabs(target) and len(parts) == 2 and parts[1] == name and not parts[0].startswith(".")
+
+
+def plan_mappings(parent_dir, remove=False):
+    """
+    计算映射差异 / Diff the desired mapping links against the links in parent_dir
+    期望的链接集合来自各分类目录（不含 Unknown 与隐藏目录）中的项目；remove 为 True 时期望集合为空。
+    只有指向 <分类>/<项目> 的映射链接会被修改或删除，其他符号链接与普通文件保持不动。
+    返回 {"create", "retarget", "remove": [(名称, 目标)], "unchanged": 数量, "skipped": [名称]}
+    """
+    existing_links = {}
+    occupied = set()
+    category_dirs = []
+    with os.scandir(parent_dir) as it:
+        for entry in it:
+            if entry.is_symlink():
+                try:
+                    existing_links[entry.name] = os.readlink(entry.path)
+                except OSError:
+                    occupied.add(entry.name)
+                continue
+            occupied.add(entry.name)
+            if entry.is_dir() and entry.name != "Unknown" and not entry.name.startswith('.'):
+                category_dirs.append(entry.name)
+
+    desired = {}
+    skipped = []
+    if not remove:
+        for category in sorted(category_dirs):
+            with os.scandir(os.path.join(parent_dir, category)) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        continue
+                    if entry.name in occupied or entry.name in desired:
+                        # 与根目录中的真实项目或其他分类中的同名项目冲突
+                        skipped.append(entry.name)
+                        continue
+                    desired[entry.name] = os.path.join(category, entry.name)
+
+    plan = {"create": [], "retarget": [], "remove": [], "unchanged": 0, "skipped": sorted(skipped)}
+    for name, target in sorted(desired.items()):
+        current = existing_links.get(name)
+        if current is None:
+            plan["create"].append((name, target))
+        elif os.path.normpath(current) == os.path.normpath(target):
+            plan["unchanged"] += 1
+        elif _is_mapping_target(name, current):
+            plan["retarget"].append((name, target))
+        else:
+            plan["skipped"].append(name)  # 用户自己的同名链接，不覆盖
+    for name, current in sorted(existing_links.items()):
+        if name not in desired and _is_mapping_target(name, current):
+            plan["remove"].append((name, current))
+    return plan
+
+
+def reconcile_mappings(parent_dir, log_callback=None, remove=False, workers=None):
+    """
+    只应用映射的最小变更集：创建缺少的链接、修正指向错误的链接、删除多余的映射链接，
+    已正确的链接完全不触碰（不会触发文件夹监视程序）。workers 大于 1 时用线程池并行执行文件系统调用。
+    返回 {"created", "retargeted", "removed", "failed": [名称], "unchanged": 数量, "skipped": [名称]}
+    """
+    plan = plan_mappings(parent_dir, remove)
+
+    def create(name, target):
+        link_path = os.path.join(parent_dir, name)
+        os.symlink(target, link_path)
+        set_file_hidden(link_path)
+
+    def retarget(name, target):
+        # 先把旧链接改名保留，新链接创建失败时换回，不会丢失原有的映射
+        link_path = os.path.join(parent_dir, name)
+        old_path = f"{link_path}.repkg_old"
+        os.rename(link_path, old_path)
+        try:
+            create(name, target)
+        except OSError:
+            os.rename(old_path, link_path)
+            raise
+        os.unlink(old_path)
+
+    def delete(name, _):
+        os.unlink(os.path.join(parent_dir, name))
+
+    operations = ([("created", create, item) for item in plan["create"]] +
+                  [("retargeted", retarget, item) for item in plan["retarget"]] +
+                  [("removed", delete, item) for item in plan["remove"]])
+
+    def run(operation):
+        kind, action, (name, target) = operation
+        try:
+            action(name, target)
+            return kind, name, None
+        except OSError as e:
+            return kind, name, e
+
+    if workers and workers > 1 and len(operations) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, operations))
+    else:
+        results = [run(operation) for operation in operations]
+
+    result = {"created": [], "retargeted": [], "removed": [], "failed": [], "unchanged": plan["unchanged"],
+              "skipped": plan["skipped"]}
+    for kind, name, error in results:
+        if error is None:
+            result[kind].append(name)
+            continue
+        result["failed"].append(name)
+        if log_callback:
+            log_callback(f"  [Error] 映射链接操作失败 / Link operation failed for {name}: {error}\n")
+
+    if log_callback:
+        log_callback(f"  [Success] 映射差异 / Mapping diff: 新建 created {len(result['created'])}，"
+                     f"修正 retargeted {len(result['retargeted'])}，删除 removed {len(result['removed'])}，"
+                     f"未变 unchanged {result['unchanged']}\n")
+        if result["skipped"]:
+            log_callback(f"  [Warning]  跳过 {len(result['skipped'])} 个同名冲突的项目 / "
+                         f"Skipped {len(result['skipped'])} conflicting items\n")
+    return result
+
+
+def create_transparent_mapping(parent_dir, log_callback=None, workers=None):
+    """
+    为分类后的项目创建透明映射（隐藏版本），只修改与期望不一致的链接
+    Create transparent mapping for classified projects (hidden version)
+    """
+    if log_callback:
+        log_callback(f" 创建透明映射 / Creating transparent mapping...\n")
+    return reconcile_mappings(parent_dir, log_callback, workers=workers)
+
+
+def classify_projects(parent_dir, log_callback=None, create_mapping=False):
+    """
+    根据 project.json 的 'type' 字段分类子文件夹。
+    create_mapping: 是否在分类后自动创建透明映射
+    """
+
+    if log_callback:
+        log_callback(f"📂 开始分类项目 / Starting project classification: {parent_dir}\n")
+
+    # 定义 Unknown 文件夹路径
+    unknown_dir = os.path.join(parent_dir, "Unknown")
+    os.makedirs(unknown_dir, exist_ok=True)
+
+    # 统计信息
+    classified_count = 0
+    error_count = 0
+
+    # 遍历父目录下所有子文件夹（使用扫描索引，目录未变化时无需重新列出）
+    scan_index = ScanIndex(parent_dir)
+    items_to_process = [entry.name for entry in scan_index.list_dir(parent_dir) if
+                        entry.is_dir and
+                        entry.name not in ["Unknown", "scene", "video"] and
+                        not entry.name.startswith('.') and
+                        not entry.name.endswith('.py') and
+                        not entry.name.endswith('.md')]
+
+    # 先并行读取全部 project.json（未变化的文件直接使用元数据索引中的结果），再依次移动
+    meta_index = ProjectMetaIndex(parent_dir)
+    metas = meta_index.load(os.path.join(parent_dir, item) for item in items_to_process)
+
+    # 解析失败的文件集中报告，不与移动日志穿插
+    invalid = [(item_path, meta.error) for item_path, meta in metas.items() if meta.error]
+    if invalid and log_callback:
+        log_callback(f"[错误/Error] {len(invalid)} 个 project.json 无法解析，将归类到 Unknown / "
+                     f"{len(invalid)} project.json files could not be parsed:\n")
+        log_callback("".join(f"  {os.path.join(item_path, 'project.json')}: {error}\n"
+                             for item_path, error in invalid))
+    error_count += len(invalid)
+
+    for item in items_to_process:
+        item_path = os.path.join(parent_dir, item)
+
+        # 默认分类为 Unknown（没有 project.json、解析失败或 type 为空）
+        category = metas[item_path].type or "Unknown"
+
+        # 目标目录路径
+        target_dir = os.path.join(parent_dir, category)
+        os.makedirs(target_dir, exist_ok=True)
+
+        # 移动文件夹
+        target_path = os.path.join(target_dir, item)
+
+        # 若目标已存在，则重命名避免冲突 (此逻辑可能导致用户项目名改变，但为确保操作成功暂时保留)
+        if os.path.exists(target_path):
+            base = item
+            counter = 1
+            original_target_path = target_path
+            while os.path.exists(target_path):
+                new_name = f"{base}_{counter}"
+                target_path = os.path.join(target_dir, new_name)
+                counter += 1
+            if log_callback:
+                log_callback(
+                    f"[警告/Warning] 目标路径 {original_target_path} 已存在，重命名 {item} → {os.path.basename(target_path)}\n")
+
+        try:
+            shutil.move(item_path, target_path)
+            meta_index.rename(item_path, target_path)
+            if log_callback:
+                log_callback(f"[分类/Classified] {item} → {category}\n")
+            classified_count += 1
+        except Exception as e:
+            if log_callback:
+                log_callback(f"[错误/Error] 移动 {item} 失败: {e}\n")
+            error_count += 1
+
+    scan_index.save()
+    meta_index.save()
+
+    if log_callback:
+        log_callback(f"\n 分类统计 / Classification statistics:\n")
+        log_callback(f"  [Success] 成功分类 / Successfully classified: {classified_count}\n")
+        log_callback(f"  [Error] 分类失败 / Classification failed: {error_count}\n")
+
+    # 根据标志创建透明映射
+    if classified_count > 0 and create_mapping:
+        if log_callback:
+            log_callback(f"\n 自动创建透明映射 / Auto-creating transparent mapping...\n")
+        create_transparent_mapping(parent_dir, log_callback)
+
+        if log_callback:
+            log_callback(f"\n[Success] 分类和映射完成 / Classification and mapping completed.\n")
+            log_callback(f"  📁 项目已按类型分类到子目录 / Projects classified into subdirectories\n")
+            log_callback(f"   已创建透明映射链接 / Transparent mapping links created\n")
+            log_callback(f"  👁️  映射链接已隐藏，对用户不可见 / Mapping links are hidden from users\n")
+    elif classified_count > 0 and not create_mapping:
+        if log_callback:
+            log_callback(f"\n[Success] 分类完成 / Classification completed. (跳过创建映射 / Skip creating mapping)\n")
+    else:
+        if log_callback:
+            log_callback(f"\n[Warning]  没有项目需要分类 / No projects to classify\n")
+
+    return classified_count, error_count
+
+
+def remove_all_mappings(parent_dir, log_callback=None, workers=None):
+    """
+    移除所有映射链接（只删除指向 <分类>/<项目> 的映射，其他符号链接保持不动）
+    Remove all mapping links
+    """
+
+    if log_callback:
+        log_callback(f"  移除所有映射链接 / Removing all mapping links...\n")
+
+    removed_count = len(reconcile_mappings(parent_dir, log_callback, remove=True, workers=workers)["removed"])
+
+    if log_callback:
+        log_callback(
+            f"  [Success] 成功移除 {removed_count} 个映射链接 / Successfully removed {removed_count} mapping links\n")
+    return removed_count
+
+
+def _tree_bytes(path):
+    """目录树中所有文件的总字节数（不跟随符号链接）"""
+    try:
+        return sum(st.st_size for _, _, st in backup_store.iter_project_files(path))
+    except OSError:
+        return 0
+
+
+def library_status(parent_dir, with_bytes=False, workers=None):
+    """
+    一次 os.scandir 遍历生成分类根目录的结构化状态 / Structured status of a classified library
+    复用 DirEntry 中的类型信息：根目录与每个分类目录各只列出一次，映射链接是否失效由扫描结果判断，
+    隐藏属性读取自 lstat 结果中的 st_file_attributes（仅 Windows）。
+    with_bytes 为 True 时并行统计每个分类的占用字节数（需要遍历所有项目，较慢）。
+    返回可直接序列化为 JSON 的字典
+    """
+    links = []
+    category_names = []
+    with os.scandir(parent_dir) as it:
+        for entry in it:
+            if entry.is_symlink():
+                try:
+                    target = os.readlink(entry.path)
+                    attributes = getattr(entry.stat(follow_symlinks=False), "st_file_attributes", None)
+                except OSError:
+                    target, attributes = None, None
+                links.append((entry.name, target, attributes))
+            elif entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                category_names.append(entry.name)
+
+    # 每个分类目录列出一次；Unknown 排在最后
+    category_names.sort(key=lambda name: (name == "Unknown", name.lower()))
+    projects = {}
+    for category in category_names:
+        with os.scandir(os.path.join(parent_dir, category)) as it:
+            projects[category] = sorted(entry.name for entry in it if entry.is_dir())
+    known_targets = {os.path.join(category, name) for category, names in projects.items() for name in names}
+
+    link_records = []
+    mapped = set()
+    dangling = []
+    for name, target, attributes in sorted(links):
+        normalized = os.path.normpath(target) if target else None
+        if normalized in known_targets:
+            broken = False
+            if os.path.basename(normalized) == name:
+                mapped.add(normalized)
+        else:
+            broken = target is None or not os.path.exists(os.path.join(parent_dir, target))
+        if broken:
+            dangling.append(name)
+        hidden = None if attributes is None else bool(attributes & 0x2)  # FILE_ATTRIBUTE_HIDDEN
+        link_records.append({"name": name, "target": target, "hidden": hidden, "dangling": broken})
+
+    # project.json 元数据（元数据索引命中时不解析），用于找出类型与所在分类不符的项目
+    project_paths = {category: [os.path.join(parent_dir, category, name) for name in names]
+                     for category, names in projects.items()}
+    meta_index = ProjectMetaIndex(parent_dir, workers=workers)
+    metas = meta_index.load(path for paths in project_paths.values() for path in paths)
+    meta_index.save()
+
+    category_bytes = {}
+    if with_bytes:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for category, paths in project_paths.items():
+                category_bytes[category] = sum(pool.map(_tree_bytes, paths, chunksize=64))
+
+    categories = {}
+    unmapped = []
+    for category, names in projects.items():
+        paths = project_paths[category]
+        if category != "Unknown":
+            unmapped += [name for name in names if os.path.join(category, name) not in mapped]
+        categories[category] = {
+            "projects": len(names),
+            "mapped": sum(1 for name in names if os.path.join(category, name) in mapped),
+            "misplaced": sum(1 for path in paths if (metas[path].type or "Unknown") != category),
+            "invalid_project_json": sum(1 for path in paths if metas[path].error),
+            "bytes": category_bytes.get(category, 0) if with_bytes else None,
+        }
+
+    return {
+        "root": os.path.abspath(parent_dir),
+        "categories": categories,
+        "total_projects": sum(item["projects"] for item in categories.values()),
+        "mapping_links": len(mapped),
+        "links": link_records,
+        "dangling_links": dangling,
+        "unmapped_projects": sorted(unmapped),
+        "misplaced_projects": sum(item["misplaced"] for item in categories.values()),
+        "invalid_project_json": sum(item["invalid_project_json"] for item in categories.values()),
+        "total_bytes": sum(category_bytes.values()) if with_bytes else None,
+    }
+
+
+def list_current_status(parent_dir, log_callback=None, with_bytes=False, workers=None):
+    """
+    列出当前状态（文本输出到 log_callback），返回 library_status 的结构化结果
+    List current status
+    """
+
+    if log_callback:
+        log_callback(f"📋 当前状态 / Current status in: {parent_dir}\n\n")
+
+    status = library_status(parent_dir, with_bytes, workers)
+    if not log_callback:
+        return status
+
+    log_callback(f"📁 分类目录 / Category directories:\n")
+    for category, item in status["categories"].items():
+        extra = f"，已映射 {item['mapped']}" if category != "Unknown" else ""
+        if item["misplaced"]:
+            extra += f"，{item['misplaced']} 个类型不符 / mismatched"
+        if item["bytes"] is not None:
+            extra += f"，{format_size(item['bytes'])}"
+        log_callback(f"  {category}: {item['projects']} 个项目 / projects{extra}\n")
+
+    hidden = sum(1 for link in status["links"] if link["hidden"])
+    log_callback(f"\n 映射链接 / Mapping links:\n")
+    log_callback(f"  符号链接 / Links: {len(status['links'])}（映射 / mapping {status['mapping_links']}，"
+                 f"隐藏 / hidden {hidden}）\n")
+    for name in status["dangling_links"]:
+        target = next(link["target"] for link in status["links"] if link["name"] == name)
+        log_callback(f"  [Warning] 失效链接 / Dangling link: {name} -> {target}\n")
+
+    log_callback(f"\n 总体统计 / Overall statistics:\n")
+    log_callback(f"  总项目数 / Total projects: {status['total_projects']}\n")
+    log_callback(f"  映射链接数 / Mapping links: {status['mapping_links']}\n")
+    log_callback(f"  未映射项目数 / Unmapped projects: {len(status['unmapped_projects'])}\n")
+    if status["dangling_links"]:
+        log_callback(f"  失效链接数 / Dangling links: {len(status['dangling_links'])}\n")
+    if status["misplaced_projects"] or status["invalid_project_json"]:
+        log_callback(f"  类型与分类不符 / Misplaced projects: {status['misplaced_projects']}"
+                     f"（project.json 无法解析 / invalid: {status['invalid_project_json']}）\n")
+    if status["total_bytes"] is not None:
+        log_callback(f"  总占用 / Total size: {format_size(status['total_bytes'])}\n")
+    return status
+
+
+# ------------------------------------------------------------
+#  配置读写
+# ------------------------------------------------------------
+def default_config():
+    """默认配置 / Default configuration"""
+    return {
+        "app_name": "RePKG 批量提取 GUI",
+        "version": "v4 (Modified)",
+        "platform": "Windows 版",
+        "author": "by YuefChen",
+        "repkg_path": os.path.join(os.getcwd(), "RePKG.exe"),
+        "input_dir": "",
+        "output_dir": "",
+        "mode": "extract",
+        "tex": True,
+        "copyproject": True,
+        "usename": True,
+        "overwrite": True,
+        "recursive": True,
+        "copy_preview": True,
+        "auto_backup": True,
+        "backup_mode": "hardlink",
+        "archive_format": "zip",
+        "archive_level": 1,
+        "backup_keep_last": 0,
+        "backup_keep_days": 0,
+        "backup_max_gb": 0,
+        "incremental": True,
+        "manifest_hash": False,
+        "tex_builtin": False,
+        "include_filters": "",
+        "exclude_filters": "",
+        "workers": default_worker_count(),
+        "classify_dir": "",
+        "unified_backup_root": ""
+    }
+
+
+def load_config(config_path=CONFIG_FILE):
+    """读取配置文件并补全缺失的默认项 / Load the config file merged with defaults"""
+    config = default_config()
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                loaded_config = json.load(f)
+
+            # 合并默认配置和加载的配置
+            for key, value in config.items():
+                if key not in loaded_config:
+                    loaded_config[key] = value
+            return loaded_config
+        except Exception:
+            return config
+    return config
+
+
+def save_config(config, config_path=CONFIG_FILE):
+    """写入配置文件 / Save the config file"""
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+# ------------------------------------------------------------
+#  命令生成（确保Windows路径）
+# ------------------------------------------------------------
+def use_builtin_tex(settings):
+    """是否使用进程内 TEX 解码器（需勾选转换 TEX 且已安装 NumPy）"""
+    if not (settings["mode"] == "extract" and settings["tex"] and settings["tex_builtin"]):
+        return False
+    import tex_decoder
+    return tex_decoder.NUMPY_AVAILABLE
+
+
+def get_command_options(settings):
+    """获取当前启用的 RePKG 命令选项参数列表"""
+    options = [option for key, option in COMMAND_OPTIONS if settings[key]]
+
+    # 使用内置解码器时让 RePKG 只解包，纹理转换由 tex_decoder 完成
+    if use_builtin_tex(settings) and "-t" in options:
+        options.remove("-t")
+        options.append("--no-tex-convert")
+    return options
+
+
+def get_entry_filters(settings):
+    """读取选择性提取的包含/排除规则列表"""
+    return (parse_filter_text(settings["include_filters"]),
+            parse_filter_text(settings["exclude_filters"]))
+
+
+def get_options_signature(settings):
+    """用于增量清单的选项签名：模式、命令选项与过滤规则一致时才允许跳过"""
+    include, exclude = get_entry_filters(settings)
+    signature = " ".join([settings["mode"]] + get_command_options(settings))
+    if include or exclude:
+        signature += f" include={','.join(include)} exclude={','.join(exclude)}"
+    return signature
+
+
+def get_project_name(pkg_path):
+    """获取项目名称（pkg文件所在目录的名称）"""
+    pkg_dir = os.path.dirname(pkg_path)
+    # 如果是递归搜索，项目名是相对于输入根目录的路径，但RePKG默认使用pkg所在目录名作为项目名，这里保持一致
+    return os.path.basename(pkg_dir)
+
+
+def get_output_dir(settings, pkg_path):
+    """包的提取输出目录：输出根目录（未设置时为 ./output）下的项目名子目录"""
+    output_root = settings["output_dir"].strip() or "./output"
+    return os.path.join(output_root, get_project_name(pkg_path))
+
+
+def preview_command(settings, pkg_path):
+    """
+    只生成命令行，不访问文件系统（不检查 RePKG 是否存在，也不创建输出目录），供界面预览使用
+    Compose the RePKG command line without touching the filesystem
+    """
+    # 使用 Windows 路径（反斜杠 + 引号）
+    cmd = [win_path(settings["repkg_path"].strip()), settings["mode"]] + get_command_options(settings)
+    cmd += ["-o", win_path(get_output_dir(settings, pkg_path)), win_path(pkg_path)]
+    return cmd
+
+
+def build_command(settings, pkg_path):
+    """生成实际执行的命令：检查 RePKG 可执行文件并创建输出目录"""
+    exe_path = settings["repkg_path"].strip()
+    if not os.path.isfile(exe_path):
+        raise FileNotFoundError(f"未找到 RePKG 可执行文件: {exe_path}")
+    os.makedirs(get_output_dir(settings, pkg_path), exist_ok=True)
+    return preview_command(settings, pkg_path)
+
+
+def find_sample_package(input_dir):
+    """
+    为命令预览找一个示例 .pkg：先看输入目录本身，再依次看第一层子目录，找到即停止（不做完整扫描）
+    没有找到时返回 None
+    """
+    subdirs = []
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if entry.name.lower().endswith(".pkg") and entry.is_file():
+                return entry.path
+            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                subdirs.append(entry.path)
+    for subdir in sorted(subdirs):
+        try:
+            with os.scandir(subdir) as it:
+                for entry in it:
+                    if entry.name.lower().endswith(".pkg") and entry.is_file():
+                        return entry.path
+        except OSError:
+            continue
+    return None
+
+
+# ------------------------------------------------------------
+#  扫描 .pkg 文件
+# ------------------------------------------------------------
+def iter_pkg_files(root_dir, recursive=True):
+    """逐个产出 .pkg 文件路径，使提取可以在扫描完成前开始"""
+    # 使用持久化扫描索引代替 os.walk：只重新列出 mtime 变化过的目录
+    scan_index = ScanIndex(root_dir)
+    try:
+        for dirpath, dirnames, filenames in scan_index.walk(recursive=recursive):
+            # 不扫描统一备份目录，否则原地替换时备份中的 .pkg 会被当作新项目再次提取
+            if UNIFIED_BACKUP_DIR in dirnames:
+                dirnames.remove(UNIFIED_BACKUP_DIR)
+            for f in filenames:
+                if f.lower().endswith(".pkg"):
+                    yield os.path.join(dirpath, f)
+    finally:
+        scan_index.save()
+
+
+class DirectoryIndex:
+    """
+    目录文件名索引 / Per-directory listing cache shared by a batch's worker threads
+    每个目录只列出一次，保存 小写文件名 → 实际文件名，供大小写不敏感的查找使用
+    """
+
+    def __init__(self):
+        self._dirs = {}
+        self._lock = threading.Lock()
+        self.listings = 0
+
+    def files(self, dir_path):
+        """返回目录中文件的 {小写文件名: 文件名}；目录不存在时返回空字典"""
+        key = os.path.normcase(os.path.abspath(dir_path))
+        with self._lock:
+            cached = self._dirs.get(key)
+        if cached is not None:
+            return cached
+        names = {}
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        names.setdefault(entry.name.lower(), entry.name)
+        except OSError:
+            pass
+        with self._lock:
+            self.listings += 1
+            self._dirs[key] = names
+        return names
+
+
+def find_preview_image(pkg_path, dir_index=None):
+    """
+    查找与pkg文件同级的preview图像文件
+    只列出一次目录，按 preview.* 优先、其次 <包名>.*，同类中按 PREVIEW_EXTENSIONS 的顺序选择（不区分大小写）
+    dir_index 为批次共享的 DirectoryIndex，同一目录的多个包不会重复列出
+    """
+    pkg_dir = os.path.dirname(pkg_path)
+    pkg_name = os.path.splitext(os.path.basename(pkg_path))[0].lower()
+    names = (dir_index or DirectoryIndex()).files(pkg_dir)
+
+    best_rank, best_name = None, None
+    for lower_name, name in names.items():
+        stem, ext = os.path.splitext(lower_name)
+        if ext not in _PREVIEW_PRIORITY or stem not in ("preview", pkg_name):
+            continue
+        rank = (stem != "preview", _PREVIEW_PRIORITY[ext])
+        if best_rank is None or rank < best_rank:
+            best_rank, best_name = rank, name
+    return os.path.join(pkg_dir, best_name) if best_name else None
+
+
+def copy_preview_image(pkg_path, output_dir, log_callback, copy_preview=True, dir_index=None):
+    """
+    拷贝预览图像到输出目录，并同步拷贝 project.json
+    - 拷贝 preview 图像只有在 copy_preview 启用时发生
+    - project.json 始终同步拷贝
+    预览图与 project.json 的查找共用一次目录列出（dir_index 未提供时临时创建）
+    """
+    success_preview = False
+    dir_index = dir_index or DirectoryIndex()
+
+    # 拷贝 preview 图像（受选项控制）
+    if copy_preview:
+        preview_path = find_preview_image(pkg_path, dir_index)
+        if preview_path:
+            try:
+                os.makedirs(output_dir, exist_ok=True)
+                # 获取预览图像的文件名和扩展名
+                preview_filename = os.path.basename(preview_path)
+                preview_name, preview_ext = os.path.splitext(preview_filename)
+                # 如果预览图像不是preview开头，重命名为preview
+                if not preview_name.lower().startswith('preview'):
+                    preview_filename = f"preview{preview_ext}"
+                dest_path = os.path.join(output_dir, preview_filename)
+                shutil.copy2(preview_path, dest_path)
+                success_preview = True
+            except Exception as e:
+                log_callback(f"[Error] 拷贝预览图像失败: {e}\n")
+
+    # 无论是否拷贝preview，总是尝试同步拷贝 project.json
+    try:
+        pkg_dir = os.path.dirname(pkg_path)
+        project_json_name = dir_index.files(pkg_dir).get("project.json")
+        if project_json_name:
+            project_json_src = os.path.join(pkg_dir, project_json_name)
+            os.makedirs(output_dir, exist_ok=True)
+            dest_project_json = os.path.join(output_dir, "project.json")
+            shutil.copy2(project_json_src, dest_project_json)
+    except Exception as e:
+        log_callback(f"[Error] 同步拷贝 project.json 失败: {e}\n")
+
+    return success_preview
+
+
+def list_gallery_projects(root_dir, workers=None):
+    """
+    列出图库中的项目：输入根目录（<根>/<项目>）或分类根目录（<根>/<分类>/<项目>）均可
+    含 project.json 或 .pkg 的子目录视为项目，否则视为分类目录并列出其中的项目；映射链接与隐藏目录被跳过。
+    预览图与 find_preview_image 的查找规则相同，title / type 来自元数据索引。
+    返回按 (分类, 目录名) 排序的 [{"path", "name", "category", "preview", "title", "type"}]
+    """
+    dir_index = DirectoryIndex()
+
+    def subdirs(path):
+        with os.scandir(path) as it:
+            return sorted(entry.name for entry in it if
+                          entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'))
+
+    def is_project(files):
+        return "project.json" in files or any(name.endswith(".pkg") for name in files)
+
+    projects = []  # (分类, 目录名, 路径, 文件表)
+    for name in subdirs(root_dir):
+        path = os.path.join(root_dir, name)
+        files = dir_index.files(path)
+        if is_project(files):
+            projects.append(("", name, path, files))
+            continue
+        try:
+            children = subdirs(path)
+        except OSError:
+            continue
+        for child in children:
+            child_path = os.path.join(path, child)
+            projects.append((name, child, child_path, dir_index.files(child_path)))
+
+    meta_index = ProjectMetaIndex(root_dir, workers=workers)
+    metas = meta_index.load(path for _, _, path, _ in projects)
+    meta_index.save()
+
+    items = []
+    for category, name, path, files in projects:
+        # 预览图与 <包名>.* 同样按包名查找；没有 .pkg 时只匹配 preview.*
+        pkg_name = min((files[lower] for lower in files if lower.endswith(".pkg")), default="preview.pkg")
+        meta = metas[path]
+        items.append({
+            "path": path,
+            "name": name,
+            "category": category,
+            "preview": find_preview_image(os.path.join(path, pkg_name), dir_index),
+            "title": meta.title,
+            "type": meta.type,
+        })
+    return items
+
+
+# ------------------------------------------------------------
+#  备份
+# ------------------------------------------------------------
+def prepare_backup_environment(output_dir_root, is_in_place_replace, log_callback):
+    """准备统一备份环境 / Prepare unified backup environment"""
+    if not is_in_place_replace:
+        return None
+
+    log_callback("[Warning] ⚠️ 原地替换模式已激活：提取前将自动备份现有文件到统一备份目录 `/.unified_backup/`。\n\n")
+
+    unified_backup_root = os.path.join(output_dir_root, UNIFIED_BACKUP_DIR)
+    os.makedirs(unified_backup_root, exist_ok=True)
+    set_file_hidden(unified_backup_root)
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    batch_backup_path = os.path.join(unified_backup_root, f"backup_{timestamp}")
+    os.makedirs(batch_backup_path, exist_ok=True)
+
+    log_callback(f"🕒 批次备份目录已创建: {os.path.basename(batch_backup_path)}\n\n")
+    return batch_backup_path
+
+
+def predicted_output_files(pkg_path, output_dir, settings=None):
+    """
+    根据 PKG 条目表预测提取会写入（覆盖）的文件，返回 (路径集合, 词干集合)，均为 normcase 后的绝对路径
+    路径集合为条目本身与 project.json 拷贝；词干集合中的路径以任意扩展名写出
+    （TEX 转换后的图像、preview.* 拷贝）。
+    提供 settings 时按所选选项收窄：info 模式不写文件，只计入符合包含/排除规则的条目，
+    未启用 --overwrite 时已存在的条目不会被覆盖，未启用预览拷贝时不计 preview.*
+    无法解析 PKG 时返回 None
+    """
+    try:
+        _, entries = read_pkg_entries(pkg_path)
+    except (OSError, PkgFormatError):
+        return None
+
+    output_root = os.path.abspath(output_dir)
+    predicted = set()
+    stems = set()
+    if settings is not None and settings["mode"] != "extract":
+        return predicted, stems
+
+    include, exclude = get_entry_filters(settings) if settings is not None else ([], [])
+    accept = compile_entry_filter(include, exclude) if include or exclude else None
+    overwrite = settings is None or settings["overwrite"]
+    for entry in entries:
+        if accept and not accept(entry.name):
+            continue
+        path = os.path.join(output_root, *entry.name.replace("\\", "/").split("/"))
+        if entry.extension == ".tex":
+            stems.add(os.path.normcase(os.path.splitext(path)[0]))
+        if overwrite or not os.path.exists(path):
+            predicted.add(os.path.normcase(path))
+
+    # project.json 与预览图从包所在目录拷贝，原地替换时源与目标相同，不会改变内容
+    if os.path.normcase(os.path.dirname(os.path.abspath(pkg_path))) != os.path.normcase(output_root):
+        predicted.add(os.path.normcase(os.path.join(output_root, "project.json")))
+        if settings is None or settings["copy_preview"]:
+            stems.add(os.path.normcase(os.path.join(output_root, "preview")))
+    return predicted, stems
+
+
+def _is_predicted_output(path, predicted):
+    """判断文件是否会被提取覆盖；TEX 纹理的转换结果与预览图按“同目录同名（任意扩展名）”匹配"""
+    outputs, stems = predicted
+    key = os.path.normcase(path)
+    if key in outputs:
+        return True
+    stem = os.path.splitext(key)[0]
+    return stem in stems or stem in outputs
+
+
+def _copy_file(src, dst, stats):
+    started = time.perf_counter()
+    shutil.copy2(src, dst, follow_symlinks=False)
+    stats["copy_seconds"] += time.perf_counter() - started
+    stats["copied_files"] += 1
+    stats["copied_bytes"] += os.lstat(dst).st_size
+
+
+def snapshot_project(project_path, project_backup_path, predicted, log_callback):
+    """
+    以硬链接方式为项目创建快照 / Hardlink snapshot of a project directory
+
+    未变化的文件只在备份目录中创建硬链接（不占用额外空间）。由于硬链接共享同一份数据，
+    而 RePKG 会原地截断重写已存在的文件，因此会被提取覆盖的文件需要先“断开链接”：
+    复制一份新文件替换项目中的原路径，旧数据只保留在备份中。
+    跨文件系统或文件系统不支持硬链接时回退为复制。
+    """
+    stats = {"linked_files": 0, "linked_bytes": 0, "copied_files": 0, "copied_bytes": 0,
+             "detached_files": 0, "copy_seconds": 0.0}
+    failed = 0
+    links_supported = True
+    stack = [(project_path, project_backup_path)]
+    while stack:
+        src_dir, dst_dir = stack.pop()
+        os.makedirs(dst_dir, exist_ok=True)
+        with os.scandir(src_dir) as it:
+            entries = list(it)
+        for entry in entries:
+            dst = os.path.join(dst_dir, entry.name)
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, dst))
+                    continue
+                if entry.is_symlink() or not links_supported:
+                    _copy_file(entry.path, dst, stats)
+                    continue
+                try:
+                    os.link(entry.path, dst)
+                except OSError:
+                    # 跨文件系统（EXDEV）或不支持硬链接（FAT/exFAT）：本项目剩余文件直接复制
+                    links_supported = False
+                    _copy_file(entry.path, dst, stats)
+                    continue
+                size = entry.stat(follow_symlinks=False).st_size
+                stats["linked_files"] += 1
+                stats["linked_bytes"] += size
+
+                if _is_predicted_output(entry.path, predicted):
+                    # 断开链接：项目中换成一份独立的副本，备份中的数据不会被提取覆盖
+                    tmp_path = entry.path + ".repkg_detach"
+                    started = time.perf_counter()
+                    shutil.copy2(entry.path, tmp_path)
+                    os.replace(tmp_path, entry.path)
+                    stats["copy_seconds"] += time.perf_counter() - started
+                    stats["detached_files"] += 1
+                    stats["linked_files"] -= 1
+                    stats["linked_bytes"] -= size
+                    stats["copied_bytes"] += size
+            except Exception as e:
+                failed += 1
+                log_callback(f"  [Error] 备份失败: {os.path.relpath(entry.path, project_path)} ({e})\n")
+
+    if not links_supported:
+        log_callback("  [Warning] 备份目录不支持硬链接（跨磁盘或文件系统不支持），已回退为复制。\n")
+    if failed:
+        raise BackupError(f"{failed} 个文件未能备份 / {failed} files could not be backed up")
+    return stats
+
+
+def minimal_backup_project(output_dir, project_name, batch_backup_path, predicted, log_callback):
+    """
+    差异备份 / Back up only the files the extraction will overwrite
+
+    只查看预测输出所在的目录：已存在且会被覆盖的文件复制到 <批次>/<项目>/，
+    尚不存在的输出记录在项目清单的 created / created_dirs 中，还原时删除。
+    不会被提取触及的内容（.pkg 源文件、其余文件）不进入备份。
+    """
+    stats = {"copied_files": 0, "copied_bytes": 0, "untouched_bytes": 0, "copy_seconds": 0.0}
+    output_root = os.path.normcase(os.path.abspath(output_dir))
+    project_backup_path = os.path.join(batch_backup_path, project_name)
+    outputs, stems = predicted
+
+    def relative(key):
+        return os.path.relpath(key, output_root).replace(os.sep, "/")
+
+    files = []
+    failed = 0
+    backed_up = set()
+    missing_dirs = set()
+    for dir_key in sorted({os.path.dirname(key) for key in outputs | stems}):
+        try:
+            with os.scandir(dir_key) as it:
+                entries = list(it)
+        except FileNotFoundError:
+            # 提取时才会创建的目录（连同尚不存在的上级目录）
+            while dir_key != output_root and dir_key.startswith(output_root) and not os.path.isdir(dir_key):
+                missing_dirs.add(dir_key)
+                dir_key = os.path.dirname(dir_key)
+            continue
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False) or not _is_predicted_output(entry.path, predicted):
+                continue
+            rel_path = relative(os.path.join(dir_key, entry.name))
+            try:
+                dst = os.path.join(project_backup_path, *rel_path.split("/"))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                _copy_file(entry.path, dst, stats)
+                st = entry.stat(follow_symlinks=False)
+                files.append({"path": rel_path, "size": st.st_size, "mtime": st.st_mtime})
+                backed_up.add(rel_path)
+            except Exception as e:
+                failed += 1
+                log_callback(f"  [Error] 备份失败: {rel_path} ({e})\n")
+    if failed:
+        raise BackupError(f"{failed} 个会被覆盖的文件未能备份 / {failed} files could not be backed up")
+
+    created = sorted(relative(key) for key in outputs if relative(key) not in backed_up and not os.path.exists(key))
+    original_bytes = sum(st.st_size for _, _, st in backup_store.iter_project_files(output_dir)) \
+        if os.path.isdir(output_dir) else 0
+    stats["untouched_bytes"] = max(0, original_bytes - stats["copied_bytes"])
+    backup_store.write_meta(batch_backup_path, project_name, {
+        "format": "minimal",
+        "files": files,
+        "created": created,
+        "created_dirs": sorted((relative(key) for key in missing_dirs), reverse=True),
+        "stems": sorted(relative(key) for key in stems),
+        "original_bytes": original_bytes,
+        "stored_bytes": stats["copied_bytes"],
+    })
+    return stats
+
+
+def dedup_backup_project(project_path, project_name, batch_backup_path, store, log_callback):
+    """
+    把项目文件存入去重对象库，批次目录中只写一份项目清单
+    Store a project in the content-addressed object store and write its manifest
+    """
+    stats = {"deduped_files": 0, "deduped_bytes": 0, "copied_files": 0, "copied_bytes": 0, "copy_seconds": 0.0}
+    files = []
+    failed = 0
+    stack = [project_path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            entries = list(it)
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if entry.is_symlink():
+                    continue
+                started = time.perf_counter()
+                digest, size, stored = store.put(entry.path)
+                rel_path = os.path.relpath(entry.path, project_path).replace(os.sep, "/")
+                files.append({"path": rel_path, "hash": digest, "size": size,
+                              "mtime": entry.stat(follow_symlinks=False).st_mtime})
+                if stored:
+                    stats["copy_seconds"] += time.perf_counter() - started
+                    stats["copied_files"] += 1
+                    stats["copied_bytes"] += stored
+                else:
+                    stats["deduped_files"] += 1
+                    stats["deduped_bytes"] += size
+            except Exception as e:
+                failed += 1
+                log_callback(f"  [Error] 备份失败: {os.path.relpath(entry.path, project_path)} ({e})\n")
+    if failed:
+        raise BackupError(f"{failed} 个文件未能备份 / {failed} files could not be backed up")
+
+    if files:
+        backup_store.write_meta(batch_backup_path, project_name, {
+            "format": "dedup",
+            "files": files,
+            "original_bytes": sum(item["size"] for item in files),
+            "stored_bytes": stats["copied_bytes"],
+        })
+    return stats
+
+
+def archive_backup_project(project_path, project_name, batch_backup_path, archive_format, level, log_callback):
+    """
+    把项目流式写入 <批次>/<项目>.zip（或 .tar.gz / .tar.xz），并写入项目清单
+    批次中的多个项目由 run_batch 的工作线程并行压缩（zlib / lzma 压缩时会释放 GIL）
+    """
+    if archive_format not in backup_store.ARCHIVE_FORMATS:
+        archive_format = "zip"
+    archive_name = project_name + backup_store.ARCHIVE_FORMATS[archive_format]
+    archive_path = os.path.join(batch_backup_path, archive_name)
+    started = time.perf_counter()
+    try:
+        files = backup_store.write_archive(project_path, archive_path, archive_format, level)
+    except Exception as e:
+        log_callback(f"  [Error] 创建压缩归档失败: {e}\n")
+        raise BackupError(f"创建压缩归档失败 / Cannot create archive: {e}") from e
+    original_bytes = sum(item["size"] for item in files)
+    stored_bytes = os.path.getsize(archive_path)
+    backup_store.write_meta(batch_backup_path, project_name, {
+        "format": "archive",
+        "archive": archive_name,
+        "files": files,
+        "original_bytes": original_bytes,
+        "stored_bytes": stored_bytes,
+    })
+    return {"copied_files": len(files), "copied_bytes": stored_bytes, "archived_bytes": original_bytes,
+            "copy_seconds": time.perf_counter() - started}
+
+
+def _remove_backup_entry(batch_backup_path, project_name):
+    """删除批次中某个项目的备份（目录、清单与归档），用于重新备份上次未完成的项目"""
+    paths = [os.path.join(batch_backup_path, project_name), backup_store.meta_path(batch_backup_path, project_name)]
+    paths += [os.path.join(batch_backup_path, project_name + ext) for ext in backup_store.ARCHIVE_FORMATS.values()]
+    for path in paths:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+
+
+def backup_project(project_path, project_name, batch_backup_path, log_callback, mode="copy", pkg_path=None,
+                   output_dir=None, store=None, archive_format="zip", archive_level=1, settings=None):
+    """
+    备份当前项目文件到统一目录 / Backup one project into unified backup path
+    mode 为 "hardlink" 时使用硬链接快照，为 "minimal" 时只备份会被覆盖的文件
+    （两者都需要 pkg_path 与提取输出目录 output_dir 来预测会被覆盖的文件，settings 为提取选项），
+    为 "dedup" 时存入去重对象库（store 可在批次内共享，未提供时临时创建），
+    为 "archive" 时写入按 archive_format / archive_level 压缩的归档，否则完整复制
+    返回统计字典（linked_* / copied_* / seconds），供批次汇总节省的空间与时间
+    任何文件未能备份时抛出 BackupError：调用方不能继续提取，否则会覆盖唯一的原始文件
+    """
+    project_backup_path = os.path.join(batch_backup_path, project_name)
+    started = time.perf_counter()
+
+    if mode == "dedup":
+        log_callback(f"  → 正在备份项目 {project_name} 到去重存储...\n")
+        own_store = store is None
+        if own_store:
+            store = backup_store.ObjectStore(os.path.dirname(batch_backup_path))
+            store.begin_write()
+        try:
+            stats = dedup_backup_project(project_path, project_name, batch_backup_path, store, log_callback)
+        finally:
+            if own_store:
+                store.end_write()
+        if own_store:
+            store.save_index()
+        stats["seconds"] = time.perf_counter() - started
+        log_callback(f"  ✅ 已备份 {stats['copied_files'] + stats['deduped_files']} 个文件：新写入 "
+                     f"{format_size(stats['copied_bytes'])}，{stats['deduped_files']} 个已存在于存储中 "
+                     f"({format_size(stats['deduped_bytes'])})\n")
+        return stats
+
+    if mode == "archive":
+        log_callback(f"  → 正在压缩备份项目 {project_name}...\n")
+        stats = archive_backup_project(project_path, project_name, batch_backup_path, archive_format,
+                                       archive_level, log_callback)
+        stats["seconds"] = time.perf_counter() - started
+        if stats.get("copied_files"):
+            log_callback(f"  ✅ 已压缩 {stats['copied_files']} 个文件：{format_size(stats['archived_bytes'])} → "
+                         f"{format_size(stats['copied_bytes'])}，耗时 {stats['seconds']:.2f} 秒\n")
+        return stats
+
+    if mode in ("hardlink", "minimal"):
+        predicted = predicted_output_files(pkg_path, output_dir or project_path, settings) if pkg_path else None
+        if predicted is None:
+            log_callback("  [Warning] 无法读取包的条目表，本项目改用完整复制备份。\n")
+        elif mode == "minimal":
+            log_callback(f"  → 正在差异备份项目 {project_name}...\n")
+            stats = minimal_backup_project(output_dir or project_path, project_name, batch_backup_path, predicted,
+                                           log_callback)
+            stats["seconds"] = time.perf_counter() - started
+            log_callback(f"  ✅ 已备份 {stats['copied_files']} 个会被覆盖的文件 ({format_size(stats['copied_bytes'])})，"
+                         f"跳过未受影响的 {format_size(stats['untouched_bytes'])}\n")
+            return stats
+        else:
+            log_callback(f"  → 正在创建项目快照 {project_name}...\n")
+            stats = snapshot_project(project_path, project_backup_path, predicted, log_callback)
+            stats["seconds"] = time.perf_counter() - started
+            log_callback(f"  ✅ 快照完成：硬链接 {stats['linked_files']} 个文件 ({format_size(stats['linked_bytes'])})，"
+                         f"复制 {stats['copied_files'] + stats['detached_files']} 个 "
+                         f"({format_size(stats['copied_bytes'])})，耗时 {stats['seconds']:.2f} 秒\n")
+            return stats
+
+    os.makedirs(project_backup_path, exist_ok=True)
+    log_callback(f"  → 正在备份项目 {project_name}...\n")
+
+    copied_count = 0
+    copied_bytes = 0
+    failed = 0
+    for item in os.listdir(project_path):
+        src = os.path.join(project_path, item)
+        dst = os.path.join(project_backup_path, item)
+        try:
+            if os.path.isdir(src):
+                shutil.copytree(src, dst)
+            else:
+                shutil.copy2(src, dst)
+                copied_bytes += os.path.getsize(dst)
+            copied_count += 1
+        except Exception as e:
+            failed += 1
+            log_callback(f"  [Error] 备份失败: {item} ({e})\n")
+    if failed:
+        raise BackupError(f"{failed} 个文件/目录未能备份 / {failed} items could not be backed up")
+
+    if copied_count > 0:
+        log_callback(f"  ✅ 已备份 {copied_count} 个文件。\n")
+    else:
+        try:
+            os.rmdir(project_backup_path)
+        except:
+            pass
+        log_callback(f"  ⚠️ 未发现可备份内容，跳过。\n")
+    seconds = time.perf_counter() - started
+    return {"linked_files": 0, "linked_bytes": 0, "copied_files": copied_count, "copied_bytes": copied_bytes,
+            "detached_files": 0, "copy_seconds": seconds, "seconds": seconds}
+
+
+# ------------------------------------------------------------
+#  提取
+# ------------------------------------------------------------
+def convert_textures(output_dir, log_callback, tex_pool=None):
+    """使用内置解码器转换输出目录中的 .tex 纹理"""
+    import tex_decoder
+    tex_files = tex_decoder.find_tex_files(output_dir)
+    if not tex_files:
+        return
+    results = tex_decoder.convert_textures(tex_files, tex_pool)
+    failed = [(path, error) for path, _, error in results if error]
+    for path, error in failed:
+        log_callback(f"  [Warning] 纹理转换失败 {os.path.relpath(path, output_dir)}: {error}\n")
+    log_callback(f"  🖼️ 内置解码器已转换 {len(results) - len(failed)}/{len(results)} 个纹理\n")
+
+
+def execute_selective_extraction(settings, pkg_path, output_dir, include, exclude, log_callback, tex_pool=None,
+                                 job_stats=None, dir_index=None):
+    """
+    按包含/排除规则在进程内提取条目 / Extract only the matching entries in-process
+    返回 0 表示成功；写入/跳过的字节数会合并到 job_stats 中供批次汇总，
+    输出文件数与字节数（output_files / output_bytes）即写入的条目
+    """
+    stats = extract_entries(pkg_path, output_dir, compile_entry_filter(include, exclude), settings["overwrite"])
+    log_callback(f"  🎯 选择性提取: 写入 {stats['written']} 个条目 ({format_size(stats['written_bytes'])})，"
+                 f"跳过 {stats['skipped']} 个 ({format_size(stats['skipped_bytes'])}，"
+                 f"完整提取为 {format_size(stats['total_bytes'])})\n")
+
+    if settings["tex"]:
+        import tex_decoder
+        if tex_decoder.NUMPY_AVAILABLE:
+            convert_textures(output_dir, log_callback, tex_pool)
+        elif tex_decoder.find_tex_files(output_dir):
+            log_callback("  [Warning] 未安装 NumPy，选择性提取的 .tex 纹理未转换。\n")
+
+    copy_started = time.perf_counter()
+    if copy_preview_image(pkg_path, output_dir, log_callback, settings["copy_preview"], dir_index):
+        log_callback(f"  📷 已拷贝预览图像到 {output_dir}\n")
+    log_callback("\n")
+    if job_stats is not None:
+        job_stats.update(stats, output_files=stats["written"], output_bytes=stats["written_bytes"])
+        job_stats["preview_seconds"] = time.perf_counter() - copy_started
+    return 0
+
+
+def execute_extraction(settings, pkg_path, output_dir, log_callback, tex_pool=None, job_stats=None, dir_index=None):
+    """
+    执行 repkg 提取命令并输出日志 / Execute extraction command and stream logs
+    dir_index 为批次共享的目录索引，用于查找预览图像
+    提供 job_stats 时记录本次写出的文件数与字节数（output_files / output_bytes）：
+    RePKG 的输出按提取前后输出目录的差异统计，不含原有的文件与预览图拷贝
+    返回 RePKG 的退出码 / Returns RePKG's exit code
+    """
+    # info 模式直接在进程内解析 PKG 条目表，无需启动 RePKG.exe
+    if settings["mode"] == "info":
+        try:
+            log_callback(format_pkg_info(pkg_path))
+            log_callback(f"  ✅ 完成 {os.path.basename(pkg_path)} (内置解析器)\n\n")
+            return 0
+        except (OSError, PkgFormatError) as e:
+            log_callback(f"  [Warning] 内置解析失败，改用 RePKG: {e}\n")
+
+    # 设置了过滤规则时，在进程内只写出匹配的条目
+    include, exclude = get_entry_filters(settings)
+    if include or exclude:
+        try:
+            return execute_selective_extraction(settings, pkg_path, output_dir, include, exclude,
+                                                log_callback, tex_pool, job_stats, dir_index)
+        except (OSError, PkgFormatError) as e:
+            log_callback(f"  [Warning] 选择性提取失败，改用 RePKG 完整提取: {e}\n")
+
+    import subprocess
+    cmd = build_command(settings, pkg_path)
+    log_callback(f"  → 执行命令: {' '.join(cmd)}\n")
+    files_before = run_report.file_states(output_dir) if job_stats is not None else None
+
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding="utf-8", errors="ignore"
+    )
+
+    for line in process.stdout:
+        log_callback(line)
+
+    process.wait()
+
+    log_callback(f"  ✅ 完成 {os.path.basename(pkg_path)} (退出码 {process.returncode})\n")
+
+    if process.returncode == 0 and use_builtin_tex(settings):
+        convert_textures(output_dir, log_callback, tex_pool)
+    if job_stats is not None:
+        job_stats["output_files"], job_stats["output_bytes"] = run_report.produced_footprint(
+            files_before, run_report.file_states(output_dir))
+
+    # 拷贝预览图像 / Copy preview image if enabled
+    copy_started = time.perf_counter()
+    if copy_preview_image(pkg_path, output_dir, log_callback, settings["copy_preview"], dir_index):
+        log_callback(f"  📷 已拷贝预览图像到 {output_dir}\n")
+    if job_stats is not None:
+        job_stats["preview_seconds"] = time.perf_counter() - copy_started
+
+    log_callback("\n")
+    return process.returncode
+
+
+def check_resume(settings, resume):
+    """
+    检查任务日志能否在当前设置下继续 / Whether an interrupted batch can be resumed with these settings
+    输入目录或选项签名与上次不同时返回原因，否则返回 None：
+    否则按旧设置提取的包会被当作已完成而跳过，增量清单也会记录与实际输出不符的选项
+    """
+    if win_path(resume.input_dir.strip()) != win_path(settings["input_dir"].strip()):
+        return f"输入目录已更改 / Input directory changed: {resume.input_dir}"
+    if resume.options != get_options_signature(settings):
+        return f"提取选项已更改 / Extraction options changed: {resume.options}"
+    return None
+
+
+def retry_state(settings, summary):
+    """
+    为重试失败的包构造 run_batch 的 resume 参数 / Resume state for retrying the failed packages of a batch
+    沿用原批次的备份目录；已开始提取（项目可能已被部分覆盖）的包不再备份，否则备份中保存的是提取了一半的文件
+    settings 与 summary 为原批次的设置与 run_batch 的返回值
+    """
+    state = job_journal.JournalState()
+    state.input_dir = settings["input_dir"].strip()
+    state.options = get_options_signature(settings)
+    state.backup_path = summary.get("backup_path")
+    state.started = set(summary.get("partial", ()))
+    return state
+
+
+def run_batch(settings, pkg_source, log_callback, progress_callback=None, first_package_callback=None,
+              job_callback=None, resume=None):
+    """
+    批量运行主逻辑 / Main entry for batch execution
+    pkg_source 可以是列表或扫描生成器：发现的包经有界队列交给 N 个工作线程并发提取，
+    因此第一个包的提取与其余包的扫描同时进行。
+    每个任务的日志先缓存在本地，任务结束后整体写入 log_callback，保证同一项目的输出不被打散。
+
+    progress_callback(text) 在进度变化时调用；first_package_callback(pkg_path) 在发现第一个包时调用。
+    提供 job_callback(event) 时，每个包的状态变化（skipped / queued / running，结束时为 ok / failed 及任务指标，
+    见 run_report.job_record）以字典形式回调，任务日志放在结束事件的 "output" 中，不再写入 log_callback。
+    提取模式的运行过程记录在输出根目录的任务日志中（见 job_journal.py），批次正常结束后删除；
+    resume 为 job_journal.replay() 的结果时继续上次被中断的批次：跳过已成功的包，并沿用已有的批次备份目录；
+    输入目录或选项与上次不同时（见 check_resume）拒绝运行，任务日志保持不变。
+    返回批次汇总字典（discovered / queued / done / failed / skipped / saved_seconds / skipped_bytes，
+    本批次的备份目录 backup_path，以及已开始提取但失败的包 partial，用于 retry_state），
+    提取过任何包时还包含 report_json / report_csv（见 run_report.py）。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    progress_callback = progress_callback or (lambda text: None)
+    input_dir_root = settings["input_dir"].strip()
+    output_dir_root = settings["output_dir"].strip()
+
+    # 增量提取：跳过输入与选项均未变化的包
+    # info 模式不写出任何文件，既不参考也不修改增量清单，否则会覆盖提取记录、下次提取时全部重新提取
+    extracting = settings["mode"] == "extract"
+    incremental = settings["incremental"] and extracting
+    with_hash = settings["manifest_hash"]
+    options_signature = get_options_signature(settings)
+    manifest = load_manifest(output_dir_root) if extracting else {"version": 1, "packages": {}}
+
+    is_in_place_replace = (win_path(input_dir_root) == win_path(output_dir_root)) and settings["auto_backup"]
+    backup_state = {"path": None, "store": None}
+
+    workers = max(1, int(settings["workers"]))
+    backup_mode = settings["backup_mode"] if settings["backup_mode"] in BACKUP_MODES else "copy"
+    backup_totals = {"linked_files": 0, "linked_bytes": 0, "copied_files": 0, "copied_bytes": 0,
+                     "detached_files": 0, "deduped_files": 0, "deduped_bytes": 0, "archived_bytes": 0,
+                     "untouched_bytes": 0, "copy_seconds": 0.0, "seconds": 0.0}
+    progress = {"discovered": 0, "queued": 0, "done": 0, "failed": 0, "skipped": 0,
+                "saved_seconds": 0.0, "skipped_bytes": 0, "scanning": True}
+    progress_lock = threading.Lock()
+    job_metrics = []
+    partial = []  # 已开始提取但失败的包
+    batch_started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    batch_started = time.perf_counter()
+
+    def open_dedup_store(batch_backup_path):
+        # 批次结束前一直登记为写入者，期间还原或保留清理不会回收本批次刚存入、尚未写入清单的对象
+        store = backup_store.ObjectStore(os.path.dirname(batch_backup_path))
+        store.begin_write()
+        return store
+
+    if resume:
+        reason = check_resume(settings, resume)
+        if reason:
+            log_callback(f"[Error] 无法继续上次的批次 / Cannot resume the interrupted batch: {reason}\n"
+                         "请使用与上次相同的设置，或放弃任务日志后重新开始。\n\n")
+            return {key: value for key, value in progress.items() if key != "scanning"}
+
+    log_callback(f"⚙️ 并发任务数 / Workers: {workers}\n\n")
+
+    # 任务日志：界面被关闭或程序崩溃后，下次可以只处理未完成的包
+    # info 模式不打开日志（未打开时 write() 不做任何事），以免覆盖输出目录中未完成的提取批次
+    journal = job_journal.JobJournal(output_dir_root)
+    try:
+        if extracting:
+            journal.open({"e": "resume" if resume else "batch", "input": input_dir_root,
+                          "options": options_signature, "time": batch_started_at}, append=resume is not None)
+    except OSError as e:
+        log_callback(f"[Warning] 无法创建任务日志，本批次中断后将无法继续 / Cannot create job journal: {e}\n\n")
+    completed = resume.completed if resume else set()
+    if resume:
+        # 上次已成功的包写入增量清单，之后的增量提取同样可以跳过它们
+        manifest["packages"].update((manifest_key(pkg_path), record) for pkg_path, record in resume.records.items())
+        if is_in_place_replace and resume.backup_path and os.path.isdir(resume.backup_path):
+            backup_state["path"] = resume.backup_path
+            if backup_mode == "dedup":
+                backup_state["store"] = open_dedup_store(resume.backup_path)
+            journal.write({"e": "backup", "path": resume.backup_path})
+        log_callback(f"⏯️ 继续上次未完成的批次 / Resuming: 跳过已完成的 {len(completed)} 个包"
+                     + (f"，沿用备份 {os.path.basename(backup_state['path'])}" if backup_state["path"] else "")
+                     + "\n\n")
+
+    # 预览图查找的目录索引在所有任务间共享，每个项目目录只列出一次
+    dir_index = DirectoryIndex()
+
+    # 内置 TEX 解码器在所有任务间共享一个进程池
+    tex_pool = None
+    if use_builtin_tex(settings):
+        from concurrent.futures import ProcessPoolExecutor
+        tex_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        log_callback("🖼️ 使用内置 TEX 解码器 / Using builtin TEX decoder\n\n")
+    elif settings["tex_builtin"] and settings["mode"] == "extract" and settings["tex"]:
+        log_callback("[Warning] 未安装 NumPy，TEX 转换仍由 RePKG 完成。\n\n")
+
+    def progress_text():
+        more = "+" if progress["scanning"] else ""
+        return (f"已发现 {progress['discovered']}{more} / 已处理 {progress['done'] + progress['skipped']} "
+                f"(失败 {progress['failed']}，跳过 {progress['skipped']})")
+
+    def get_batch_backup_path():
+        # 第一个需要提取的包到来时才创建批次备份目录
+        with progress_lock:
+            if backup_state["path"] is None:
+                backup_state["path"] = prepare_backup_environment(output_dir_root, True, log_callback)
+                if backup_mode == "dedup":
+                    backup_state["store"] = open_dedup_store(backup_state["path"])
+                journal.write({"e": "backup", "path": backup_state["path"]})
+            return backup_state["path"]
+
+    def run_job(index, pkg_path):
+        project_name = get_project_name(pkg_path)
+        output_dir = os.path.join(output_dir_root, project_name)
+        project_path = os.path.dirname(pkg_path)
+
+        job_log = []
+        job_log_callback = job_log.append
+        job_log_callback(f"[#{index}] 📦 处理项目: {project_name}\n")
+
+        exit_code = -1
+        record = None
+        job_stats = {}
+        backup_stats = {}
+        pkg_bytes = 0
+        backup_seconds = extract_seconds = 0.0
+        extraction_started = False
+        started = time.perf_counter()
+        try:
+            # 回调也放在 try 中：出错时同样要归还队列名额，否则扫描会永远等待
+            if job_callback:
+                job_callback({"pkg_path": pkg_path, "project": project_name, "status": "running"})
+            fingerprint = package_fingerprint(pkg_path, with_hash)
+            pkg_bytes = fingerprint["size"]
+
+            # Step 1: 备份（若启用）
+            if is_in_place_replace and resume and pkg_path in resume.started:
+                # 上次已开始提取：批次中的备份才是原始文件，不能再次备份
+                job_log_callback("  ⏯️ 沿用上次运行时的备份 / Keeping the backup from the interrupted run\n")
+            elif is_in_place_replace:
+                batch_backup_path = get_batch_backup_path()
+                if resume:
+                    _remove_backup_entry(batch_backup_path, project_name)
+                try:
+                    backup_stats = backup_project(project_path, project_name, batch_backup_path, job_log_callback,
+                                                  backup_mode, pkg_path, output_dir, backup_state["store"],
+                                                  settings["archive_format"], settings["archive_level"], settings)
+                except BackupError:
+                    # 不完整的备份不能用于还原，删除后跳过本项目的提取
+                    _remove_backup_entry(batch_backup_path, project_name)
+                    raise
+                backup_seconds = time.perf_counter() - started
+            journal.write({"e": "start", "p": pkg_path})
+            extraction_started = True
+
+            # Step 2: 提取执行
+            extract_started = time.perf_counter()
+            exit_code = execute_extraction(settings, pkg_path, output_dir, job_log_callback, tex_pool, job_stats,
+                                           dir_index)
+            extract_seconds = time.perf_counter() - extract_started
+            if exit_code == 0 and extracting:
+                record = dict(fingerprint, path=pkg_path, options=options_signature,
+                              duration=round(time.perf_counter() - started, 3))
+            journal.write({"e": "end", "p": pkg_path, "c": exit_code, "r": record})
+        except BackupError as e:
+            job_log_callback(f"  [Error] 备份失败，已跳过提取以免覆盖原始文件 / Backup failed, extraction skipped: "
+                             f"{e}\n\n")
+        except Exception as e:
+            job_log_callback(f"  [Error] 执行出错: {e}\n\n")
+        finally:
+            slots.release()
+        failed = exit_code != 0
+
+        # 任务指标：输出的文件数与字节数由 execute_extraction 统计本次写出的文件
+        metrics = run_report.job_record(index, project_name, pkg_path, exit_code, time.perf_counter() - started,
+                                        extract_seconds, backup_seconds, job_stats.get("preview_seconds", 0.0),
+                                        pkg_bytes, job_stats.get("output_files", 0), job_stats.get("output_bytes", 0))
+        job_log_callback(f"  ⏱️ 耗时 {metrics['wall_seconds']:.2f} 秒，输入 {format_size(pkg_bytes)}，"
+                         f"输出 {metrics['output_files']} 个文件 ({format_size(metrics['output_bytes'])})\n")
+
+        # 整体输出该任务的日志，并更新进度
+        with progress_lock:
+            progress["done"] += 1
+            if failed:
+                progress["failed"] += 1
+                if extraction_started:
+                    partial.append(pkg_path)
+            if record:
+                manifest["packages"][manifest_key(pkg_path)] = record
+            job_metrics.append(metrics)
+            for key, value in backup_stats.items():
+                backup_totals[key] += value
+            progress["skipped_bytes"] += job_stats.get("skipped_bytes", 0)
+            if job_callback:
+                job_callback(dict(metrics, output="".join(job_log)))
+                if failed:
+                    log_callback(f"[Error] [#{index}] {project_name} 提取失败（退出码 {exit_code}）/ "
+                                 f"Extraction failed\n")
+            else:
+                job_log.append(f"  📊 进度 / Progress: {progress_text()}\n\n")
+                log_callback("".join(job_log))
+            progress_callback(progress_text())
+
+    # 有界队列：最多 2×workers 个任务在排队或运行，扫描会在队列满时暂停
+    slots = threading.Semaphore(workers * 2)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for pkg_path in pkg_source:
+                with progress_lock:
+                    progress["discovered"] += 1
+                    first = progress["discovered"] == 1
+
+                if first and first_package_callback:
+                    first_package_callback(pkg_path)
+
+                if pkg_path in completed:
+                    if job_callback:
+                        job_callback({"pkg_path": pkg_path, "project": get_project_name(pkg_path),
+                                      "status": "skipped"})
+                    with progress_lock:
+                        progress["skipped"] += 1
+                        progress_callback(progress_text())
+                    continue
+
+                if incremental:
+                    record = manifest["packages"].get(manifest_key(pkg_path))
+                    output_dir = os.path.join(output_dir_root, get_project_name(pkg_path))
+                    if is_package_unchanged(record, pkg_path, options_signature, output_dir, with_hash):
+                        if job_callback:
+                            job_callback({"pkg_path": pkg_path, "project": get_project_name(pkg_path),
+                                          "status": "skipped"})
+                        with progress_lock:
+                            progress["skipped"] += 1
+                            progress["saved_seconds"] += record.get("duration", 0)
+                            progress_callback(progress_text())
+                        continue
+
+                if job_callback:
+                    job_callback({"pkg_path": pkg_path, "project": get_project_name(pkg_path), "status": "queued"})
+                with progress_lock:
+                    progress["queued"] += 1
+                    index = progress["queued"]
+                slots.acquire()
+                try:
+                    pool.submit(run_job, index, pkg_path)
+                except Exception:
+                    slots.release()
+                    raise
+
+            with progress_lock:
+                progress["scanning"] = False
+                progress_callback(progress_text())
+                log_callback(f"🔍 扫描完成，共发现 {progress['discovered']} 个 .pkg 文件 / "
+                             f"Scan finished: {progress['discovered']} packages\n\n")
+    finally:
+        journal.close()
+        if backup_state["store"]:
+            try:
+                backup_state["store"].save_index()
+            except OSError as e:
+                log_callback(f"[Warning] 保存备份哈希缓存失败: {e}\n")
+            finally:
+                backup_state["store"].end_write()
+    if tex_pool:
+        tex_pool.shutdown()
+
+    # 上次批次中成功的包只记录在任务日志里，即使本次没有提取任何包也要写入增量清单
+    manifest_saved = True
+    if extracting and (progress["queued"] or resume):
+        try:
+            save_manifest(output_dir_root, manifest)
+        except Exception as e:
+            manifest_saved = False
+            log_callback(f"[Warning] 保存增量清单失败: {e}\n")
+
+    # 批次正常结束且增量清单已保存后才删除任务日志；出现异常或清单保存失败时保留，以便下次继续
+    if extracting and manifest_saved:
+        job_journal.discard(output_dir_root)
+
+    summary = {key: value for key, value in progress.items() if key != "scanning"}
+    summary["backup_path"] = backup_state["path"]
+    summary["partial"] = sorted(partial)
+    if progress["discovered"] == 0:
+        log_callback("[Warning] 未找到任何 .pkg 文件。\n")
+        return summary
+
+    if progress["queued"]:
+        report = run_report.build_report(job_metrics, batch_started_at, time.perf_counter() - batch_started,
+                                         progress["skipped"], options_signature)
+        totals = report["totals"]
+        log_callback(f"📈 吞吐量 / Throughput: 输入 {format_size(totals['input_bytes'])}，"
+                     f"输出 {totals['output_files']} 个文件 ({format_size(totals['output_bytes'])})，"
+                     f"{totals['input_mb_per_second']:.1f} MB/s；单包耗时 p50 {report['job_seconds']['p50']:.2f} 秒 / "
+                     f"p99 {report['job_seconds']['p99']:.2f} 秒\n")
+        for job in report["slowest"][:3]:
+            log_callback(f"  🐢 {job['project']}: {job['wall_seconds']:.2f} 秒 ({format_size(job['pkg_bytes'])})\n")
+        try:
+            summary["report_json"], summary["report_csv"] = run_report.write_run_report(output_dir_root, report)
+            log_callback(f"📝 运行报告已保存 / Run report saved: {summary['report_json']}\n")
+        except Exception as e:
+            log_callback(f"[Warning] 保存运行报告失败: {e}\n")
+
+    if backup_totals["linked_files"]:
+        # 按本批次实际复制的速度估算硬链接节省的时间
+        copy_rate = backup_totals["copied_bytes"] / backup_totals["copy_seconds"] if (
+                backup_totals["copied_bytes"] >= 1024 * 1024 and backup_totals["copy_seconds"] > 0) else 0
+        saved = f"，按复制速度估算节省约 {backup_totals['linked_bytes'] / copy_rate:.1f} 秒" if copy_rate else ""
+        log_callback(f"🔗 快照备份：硬链接 {backup_totals['linked_files']} 个文件，节省磁盘空间 "
+                     f"{format_size(backup_totals['linked_bytes'])}；复制 "
+                     f"{backup_totals['copied_files'] + backup_totals['detached_files']} 个文件 "
+                     f"({format_size(backup_totals['copied_bytes'])})，备份共耗时 {backup_totals['seconds']:.1f} 秒"
+                     f"{saved}\n")
+    if backup_totals["deduped_files"]:
+        log_callback(f"🧩 去重备份：{backup_totals['deduped_files']} 个文件已存在于存储中，节省磁盘空间 "
+                     f"{format_size(backup_totals['deduped_bytes'])}；新写入 {backup_totals['copied_files']} 个文件 "
+                     f"({format_size(backup_totals['copied_bytes'])})，备份共耗时 {backup_totals['seconds']:.1f} 秒\n")
+    if backup_totals["archived_bytes"]:
+        ratio = backup_totals["copied_bytes"] / backup_totals["archived_bytes"]
+        log_callback(f"📦 压缩备份：{backup_totals['copied_files']} 个文件，原始 "
+                     f"{format_size(backup_totals['archived_bytes'])} → 压缩后 "
+                     f"{format_size(backup_totals['copied_bytes'])} ({ratio:.0%})，"
+                     f"备份共耗时 {backup_totals['seconds']:.1f} 秒\n")
+    if backup_totals["untouched_bytes"]:
+        total = backup_totals["untouched_bytes"] + backup_totals["copied_bytes"]
+        log_callback(f"✂️ 差异备份：只备份了 {backup_totals['copied_files']} 个会被覆盖的文件 "
+                     f"({format_size(backup_totals['copied_bytes'])})，跳过未受影响的 "
+                     f"{format_size(backup_totals['untouched_bytes'])} ({backup_totals['untouched_bytes'] / total:.0%})，"
+                     f"备份共耗时 {backup_totals['seconds']:.1f} 秒\n")
+    summary["backup"] = backup_totals
+
+    # 本批次创建了新的备份时，按保留规则清理旧批次（最新的批次始终保留）
+    retention = get_retention_rules(settings)
+    if backup_state["path"] and any(retention):
+        try:
+            summary["retention"] = apply_backup_retention(output_dir_root, log_callback, *retention, workers=workers)
+        except Exception as e:
+            log_callback(f"[Warning] 备份清理失败: {e}\n")
+
+    if progress["skipped"]:
+        log_callback(f"⏭️ 增量提取：跳过 {progress['skipped']} 个未变化的包，"
+                     f"预计节省 {progress['saved_seconds']:.1f} 秒 / Skipped {progress['skipped']} "
+                     f"unchanged packages, saved ~{progress['saved_seconds']:.1f}s\n")
+
+    log_callback(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] ✅ 所有任务完成！"
+                 f"共提取 {progress['queued']} 个，失败 {progress['failed']} 个。\n")
+    if progress["skipped_bytes"]:
+        log_callback(f"🎯 选择性提取共少写入 {format_size(progress['skipped_bytes'])} / "
+                     f"Skipped {format_size(progress['skipped_bytes'])} compared with a full extraction\n")
+    return summary
+
+
+# ------------------------------------------------------------
+#  备份还原 (统一备份)
+# ------------------------------------------------------------
+def list_backups(unified_backup_root):
+    """扫描统一备份根目录下的 .unified_backup 文件夹，返回批次备份列表"""
+    unified_backup_dir = os.path.join(unified_backup_root, ".unified_backup")
+    backups = []
+    if os.path.isdir(unified_backup_dir):
+        for item in os.listdir(unified_backup_dir):
+            # 检查是否为以 'backup_' 开头且是目录
+            if item.startswith("backup_") and os.path.isdir(os.path.join(unified_backup_dir, item)):
+                backups.append(item)
+    return sorted(backups, reverse=True)  # 最近的备份在前
+
+
+def describe_backup(unified_backup_root, backup_name):
+    """
+    汇总批次备份的项目数、格式以及原始/存储大小（只读取项目清单，旧版目录树备份的大小记为未知）
+    返回 {"projects", "formats", "original_bytes", "stored_bytes"}
+    """
+    batch_backup_path = os.path.join(unified_backup_root, UNIFIED_BACKUP_DIR, backup_name)
+    info = {"projects": 0, "formats": [], "original_bytes": 0, "stored_bytes": 0}
+    metas = dict(backup_store.iter_batch_metas(batch_backup_path))
+    for project_name, path in metas.items():
+        try:
+            meta = backup_store.read_meta(path)
+        except (OSError, ValueError):
+            continue
+        info["projects"] += 1
+        info["original_bytes"] += meta.get("original_bytes", 0)
+        info["stored_bytes"] += meta.get("stored_bytes", 0)
+        if meta.get("format") not in info["formats"]:
+            info["formats"].append(meta.get("format"))
+    legacy = [d for d in os.listdir(batch_backup_path)
+              if d not in metas and os.path.isdir(os.path.join(batch_backup_path, d))]
+    if legacy:
+        info["projects"] += len(legacy)
+        info["formats"].append("tree")
+        info["original_bytes"] = info["stored_bytes"] = None
+    return info
+
+
+def list_backup_projects(unified_backup_root, backup_name):
+    """列出批次备份中的项目名：旧版为完整目录树，其余格式为 <项目>.backup.json 清单"""
+    batch_backup_path = os.path.join(unified_backup_root, UNIFIED_BACKUP_DIR, backup_name)
+    projects = [d for d in os.listdir(batch_backup_path) if os.path.isdir(os.path.join(batch_backup_path, d))]
+    projects += [name for name, _ in backup_store.iter_batch_metas(batch_backup_path) if name not in projects]
+    return sorted(projects)
+
+
+def _link_or_copy_tree(src_dir, dst_dir):
+    """用硬链接（不支持时复制）把目录树复制到新位置，源目录保持不变"""
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        target_dir = os.path.join(dst_dir, os.path.relpath(dirpath, src_dir))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in filenames:
+            src = os.path.join(dirpath, name)
+            dst = os.path.join(target_dir, name)
+            if os.path.lexists(dst):
+                os.remove(dst)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst, follow_symlinks=False)
+
+
+def _stage_minimal_project(project_path, staging_path, project_backup_path, meta):
+    """
+    差异备份的暂存：以当前项目为基础，删除提取新建的文件与目录，再放回被覆盖前的文件
+    返回还原（放回或删除）的文件数量
+    """
+    os.makedirs(staging_path)
+    _link_or_copy_tree(project_path, staging_path)
+    backed_up = {os.path.normcase(item["path"]) for item in meta.get("files", [])}
+    stems = {os.path.normcase(stem) for stem in meta.get("stems", [])}
+    removed_count = 0
+
+    def remove(rel_path):
+        nonlocal removed_count
+        path = os.path.join(staging_path, *rel_path.split("/"))
+        if os.path.normcase(rel_path) not in backed_up and os.path.isfile(path):
+            os.remove(path)
+            removed_count += 1
+
+    for rel_path in meta.get("created", []):
+        remove(rel_path)
+    # 按词干写出的文件（TEX 转换结果、预览图）：备份中没有的即为提取新建
+    for stem_dir in {os.path.dirname(stem) for stem in meta.get("stems", [])}:
+        dir_path = os.path.join(staging_path, *stem_dir.split("/"))
+        if not os.path.isdir(dir_path):
+            continue
+        for name in os.listdir(dir_path):
+            rel_path = f"{stem_dir}/{name}" if stem_dir else name
+            if os.path.normcase(os.path.splitext(rel_path)[0]) in stems:
+                remove(rel_path)
+
+    if os.path.isdir(project_backup_path):
+        _link_or_copy_tree(project_backup_path, staging_path)
+    for rel_dir in meta.get("created_dirs", []):
+        try:
+            os.rmdir(os.path.join(staging_path, *rel_dir.split("/")))
+        except OSError:
+            pass  # 目录中仍有提取以外的内容
+    return removed_count + len(backed_up)
+
+
+def _stage_project(project_path, staging_path, batch_backup_path, project_name, meta, store):
+    """
+    在暂存目录中组装还原后的项目：保留当前的 .pkg 源文件，其余内容全部来自备份
+    （差异备份则以当前项目为基础，只撤销提取造成的改动）
+    返回还原的文件/目录数量
+    """
+    if meta is not None and meta.get("format") == "minimal":
+        return _stage_minimal_project(project_path, staging_path, os.path.join(batch_backup_path, project_name),
+                                      meta)
+    os.makedirs(staging_path)
+
+    # 1. 当前项目中的 .pkg 不属于提取内容，硬链接到暂存目录中保留
+    if os.path.isdir(project_path):
+        for item in os.listdir(project_path):
+            src = os.path.join(project_path, item)
+            if item.lower().endswith(".pkg") and os.path.isfile(src):
+                try:
+                    os.link(src, os.path.join(staging_path, item))
+                except OSError:
+                    shutil.copy2(src, os.path.join(staging_path, item))
+
+    def keep_existing_pkg(rel_path, size):
+        # 已保留且大小一致的 .pkg 无需再从备份中写出
+        dest_path = os.path.join(staging_path, *rel_path.split("/"))
+        return rel_path.lower().endswith(".pkg") and os.path.isfile(dest_path) and os.path.getsize(dest_path) == size
+
+    # 2. 写入备份内容
+    if meta is None:
+        project_backup_path = os.path.join(batch_backup_path, project_name)
+        items = os.listdir(project_backup_path)
+        _link_or_copy_tree(project_backup_path, staging_path)
+        return len(items)
+
+    if meta.get("format") == "archive":
+        # 直接从归档中流式写出，不经过临时目录
+        return backup_store.extract_archive(os.path.join(batch_backup_path, meta["archive"]), staging_path,
+                                            keep_existing_pkg)
+
+    restored_count = 0
+    for item in meta.get("files", []):
+        if keep_existing_pkg(item["path"], item["size"]):
+            continue
+        store.materialize(item["hash"], os.path.join(staging_path, *item["path"].split("/")), item.get("mtime"))
+        restored_count += 1
+    return restored_count
+
+
+def restore_project(unified_root, batch_backup_path, project_name, log_callback, store=None):
+    """
+    原子地还原单个项目 / Atomically restore one project from a batch
+
+    先在项目旁边的暂存目录中组装完整的还原结果，再通过两次重命名换入：
+    项目 → 旧目录，暂存目录 → 项目。任何一步失败时项目保持原样（或被换回）。
+    成功后从批次中删除该项目的备份。返回 True 表示成功。
+    """
+    project_path = os.path.join(unified_root, project_name)
+    token = f"{os.getpid()}_{threading.get_ident()}"
+    staging_path = os.path.join(unified_root, f".{project_name}.restore_{token}")
+    old_path = os.path.join(unified_root, f".{project_name}.old_{token}")
+    meta_file = backup_store.meta_path(batch_backup_path, project_name)
+
+    log_callback(f"\n--- 还原项目: {project_name} ---\n")
+    try:
+        meta = backup_store.read_meta(meta_file) if os.path.isfile(meta_file) else None
+        restored_count = _stage_project(project_path, staging_path, batch_backup_path, project_name, meta, store)
+    except Exception as e:
+        log_callback(f"  [Error] 组装还原内容失败，项目保持不变: {e}\n")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        return False
+
+    # 换入：两次重命名，第二次失败时把原目录换回
+    try:
+        had_project = os.path.exists(project_path)
+        if had_project:
+            os.rename(project_path, old_path)
+        try:
+            os.rename(staging_path, project_path)
+        except OSError:
+            if had_project:
+                os.rename(old_path, project_path)
+            raise
+    except OSError as e:
+        log_callback(f"  [Error] 切换到还原内容失败（目录可能被占用），项目保持不变: {e}\n")
+        shutil.rmtree(staging_path, ignore_errors=True)
+        return False
+
+    shutil.rmtree(old_path, ignore_errors=True)
+    log_callback(f"  [Success] 成功还原 {restored_count} 个文件/目录\n")
+
+    # 从批次中移除已还原项目的备份
+    stale = [os.path.join(batch_backup_path, project_name), meta_file]
+    if meta and meta.get("archive"):
+        stale.append(os.path.join(batch_backup_path, meta["archive"]))
+    for path in stale:
+        if not os.path.lexists(path):
+            continue
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            log_callback(f"  [Warning] 删除已还原项目的备份失败: {e}\n")
+    return True
+
+
+def restore_selected_backup(unified_root, backup_name, log_callback, projects=None, workers=None):
+    """
+    将选中的批次备份还原到统一根目录，批次不存在时返回 False
+    projects 为要还原的项目名列表（默认整个批次）；多个项目由 workers 个线程并行还原，
+    每个项目在暂存目录中组装后原子地换入，中断时不会留下半还原的项目
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    unified_backup_dir = os.path.join(unified_root, UNIFIED_BACKUP_DIR)
+    batch_backup_path = os.path.join(unified_backup_dir, backup_name)
+
+    if not os.path.isdir(batch_backup_path):
+        log_callback(f"[Error] 错误: 批次备份目录不存在: {batch_backup_path}\n")
+        return False
+
+    log_callback(f"⚙️  开始还原批次备份: {backup_name}...\n")
+
+    available = list_backup_projects(unified_root, backup_name)
+    projects_to_restore = available if projects is None else [p for p in projects if p in available]
+    for project_name in set(projects or []) - set(available):
+        log_callback(f"[Warning]  批次中没有项目 {project_name}，跳过。\n")
+
+    if not available:
+        log_callback("[Warning]  此批次备份中未找到任何项目内容，跳过还原。\n")
+        try:
+            os.rmdir(batch_backup_path)
+            log_callback(f"    已删除空的批次备份文件夹: {backup_name}\n")
+        except:
+            pass
+        return True
+
+    workers = max(1, int(workers or default_worker_count()))
+    log_callback(f"[Success] 发现 {len(projects_to_restore)} 个项目需要还原（并发 {workers}）。\n")
+
+    store = backup_store.ObjectStore(unified_backup_dir)
+    log_lock = threading.Lock()
+
+    def run_restore(project_name):
+        # 每个项目的日志整体输出，避免并发时互相穿插
+        project_log = []
+        ok = restore_project(unified_root, batch_backup_path, project_name, project_log.append, store)
+        with log_lock:
+            log_callback("".join(project_log))
+        return ok
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_restore, projects_to_restore))
+    failed = results.count(False)
+
+    # 批次中的项目全部还原后删除批次目录
+    if not list_backup_projects(unified_root, backup_name):
+        log_callback(f"\n  清理批次备份目录...\n")
+        try:
+            shutil.rmtree(batch_backup_path)  # 递归删除
+            log_callback(f"  [Success] 已删除批次备份文件夹: {backup_name}\n")
+        except Exception as e:
+            log_callback(f"  [Warning]  删除批次备份文件夹 {backup_name} 失败 (可能非空): {e}\n")
+
+    # 去重存储中不再被任何批次引用的对象随之删除（有批次正在写入时跳过，留到之后的还原或清理）
+    if store.active_writers():
+        log_callback("  [Warning] 另一个批次正在写入去重存储，暂不删除未引用的对象 / "
+                     "Another batch is writing to the dedup store, skipping object cleanup\n")
+    else:
+        removed, freed = store.collect_garbage()
+        if removed:
+            log_callback(f"  [Success] 已从去重存储中删除 {removed} 个不再引用的对象，释放 {format_size(freed)}\n")
+
+    # 检查是否需要删除 .unified_backup 根目录
+    try:
+        if not os.listdir(unified_backup_dir):
+            os.rmdir(unified_backup_dir)
+            log_callback(f"    已删除空的统一备份根目录: .unified_backup\n")
+    except:
+        pass  # 忽略错误
+
+    if failed:
+        log_callback(f"\n[Warning] 还原完成，{failed} 个项目失败（保持原样，备份仍保留在 {backup_name} 中）。\n")
+        return False
+    log_callback(f"\n🎉 批次备份还原完成！已将 {len(projects_to_restore)} 个项目还原到 {backup_name} 批次版本。\n")
+    return True
+
+
+# ------------------------------------------------------------
+#  备份保留策略
+# ------------------------------------------------------------
+GB = 1024 ** 3
+
+
+def get_retention_rules(settings):
+    """读取备份保留规则 (保留最近 N 个批次, 保留 N 天内的批次, 总大小上限字节数)，0 表示不限制"""
+    return (max(0, int(settings.get("backup_keep_last") or 0)),
+            max(0.0, float(settings.get("backup_keep_days") or 0)),
+            int(max(0.0, float(settings.get("backup_max_gb") or 0)) * GB))
+
+
+def batch_created_at(batch_name, batch_path):
+    """批次创建时间：优先解析名称中的时间戳 backup_YYYYmmdd_HHMMSS，否则使用目录 mtime"""
+    try:
+        return datetime.datetime.strptime(batch_name[len("backup_"):], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return datetime.datetime.fromtimestamp(os.path.getmtime(batch_path))
+
+
+def measure_backup_batch(batch_path):
+    """
+    统计一个批次删除后能释放的空间，返回 (独占字节数, 引用的去重对象 {哈希: 大小})
+    硬链接快照中与项目共享数据的文件（st_nlink > 1）删除后不释放空间，不计入
+    """
+    exclusive_bytes = 0
+    digests = {}
+    stack = [batch_path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                if st.st_nlink <= 1:
+                    exclusive_bytes += st.st_size
+                if entry.name.endswith(backup_store.META_SUFFIX):
+                    for item in backup_store.read_meta(entry.path).get("files", []):
+                        if "hash" in item:
+                            digests[item["hash"]] = item["size"]
+            except (OSError, ValueError):
+                continue
+    return exclusive_bytes, digests
+
+
+def measure_backups(unified_backup_root, workers=None):
+    """
+    并行统计所有批次（每个批次一个线程遍历），按创建时间从旧到新返回
+    [{"name", "created_at", "bytes", "digests"}]
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    unified_backup_dir = os.path.join(unified_backup_root, UNIFIED_BACKUP_DIR)
+    names = list_backups(unified_backup_root)
+    paths = [os.path.join(unified_backup_dir, name) for name in names]
+    with ThreadPoolExecutor(max_workers=max(1, int(workers or default_worker_count()))) as pool:
+        sizes = list(pool.map(measure_backup_batch, paths))
+    batches = [{"name": name, "created_at": batch_created_at(name, path), "bytes": size, "digests": digests}
+               for name, path, (size, digests) in zip(names, paths, sizes)]
+    return sorted(batches, key=lambda batch: (batch["created_at"], batch["name"]))
+
+
+def plan_backup_retention(batches, keep_last=0, keep_days=0, max_bytes=0, now=None):
+    """
+    根据保留规则选出要删除的批次（batches 按从旧到新排列，见 measure_backups）
+    - 既不在最近 keep_last 个、也不在 keep_days 天内的批次过期删除（两条规则都为 0 时不按数量/时间删除）
+    - 之后若总大小仍超过 max_bytes，从最旧的批次开始继续删除
+    - 任何规则下最新的一个批次都不会被删除
+    去重对象按引用计数计算：只有不再被剩余批次引用的对象才计入释放空间
+    返回 (要删除的 [{"name", "reason", "freed_bytes"}], 删除前总字节数, 删除后总字节数)
+    """
+    now = now or datetime.datetime.now()
+    refcount = {}
+    object_sizes = {}
+    for batch in batches:
+        for digest, size in batch["digests"].items():
+            refcount[digest] = refcount.get(digest, 0) + 1
+            object_sizes[digest] = size
+    total_bytes = sum(batch["bytes"] for batch in batches) + sum(object_sizes.values())
+    remaining = total_bytes
+    plan = []
+
+    def delete(batch, reason):
+        nonlocal remaining
+        freed = batch["bytes"]
+        for digest in batch["digests"]:
+            refcount[digest] -= 1
+            if not refcount[digest]:
+                freed += object_sizes[digest]
+        remaining -= freed
+        plan.append({"name": batch["name"], "reason": reason, "freed_bytes": freed})
+
+    kept = []
+    for position, batch in enumerate(batches):
+        newer_count = len(batches) - position - 1
+        # 最新的批次始终保留，即使它已超过 keep_days（例如继续被中断的批次时沿用的旧批次）
+        if newer_count == 0:
+            kept.append(batch)
+            continue
+        in_last = keep_last and newer_count < keep_last
+        in_days = keep_days and (now - batch["created_at"]).total_seconds() <= keep_days * 86400
+        if (keep_last or keep_days) and not (in_last or in_days):
+            delete(batch, "expired")
+        else:
+            kept.append(batch)
+
+    if max_bytes:
+        for batch in kept[:-1]:
+            if remaining <= max_bytes:
+                break
+            delete(batch, "size")
+    return plan, total_bytes, remaining
+
+
+def apply_backup_retention(unified_backup_root, log_callback, keep_last=0, keep_days=0, max_bytes=0,
+                           dry_run=False, workers=None):
+    """
+    按保留规则清理统一备份目录，从最旧的批次开始删除，最后回收去重存储中不再引用的对象
+    dry_run 为 True 时只输出将要删除的批次，不做任何改动
+    返回 {"deleted", "freed_bytes", "total_bytes", "remaining_bytes", "dry_run"}
+    """
+    unified_backup_dir = os.path.join(unified_backup_root, UNIFIED_BACKUP_DIR)
+    result = {"deleted": [], "freed_bytes": 0, "total_bytes": 0, "remaining_bytes": 0, "dry_run": dry_run}
+    if not os.path.isdir(unified_backup_dir):
+        return result
+    if not (keep_last or keep_days or max_bytes):
+        log_callback("[Warning] 未设置任何保留规则，跳过备份清理。\n")
+        return result
+
+    started = time.perf_counter()
+    batches = measure_backups(unified_backup_root, workers)
+    plan, result["total_bytes"], result["remaining_bytes"] = plan_backup_retention(batches, keep_last, keep_days,
+                                                                                   max_bytes)
+    title = "🔍 备份清理预览（不会删除任何内容）" if dry_run else "🧹 备份清理"
+    log_callback(f"{title}: {len(batches)} 个批次共 {format_size(result['total_bytes'])}，"
+                 f"统计耗时 {time.perf_counter() - started:.2f} 秒\n")
+    reasons = {"expired": "超出保留数量/天数", "size": "超出总大小上限"}
+    for item in plan:
+        action = "将删除" if dry_run else "删除"
+        if not dry_run:
+            try:
+                shutil.rmtree(os.path.join(unified_backup_dir, item["name"]))
+            except OSError as e:
+                log_callback(f"  [Warning] 删除批次 {item['name']} 失败: {e}\n")
+                result["remaining_bytes"] += item["freed_bytes"]
+                continue
+        log_callback(f"  {action} {item['name']}（{reasons[item['reason']]}，释放 {format_size(item['freed_bytes'])}）\n")
+        result["deleted"].append(item["name"])
+        result["freed_bytes"] += item["freed_bytes"]
+
+    if result["deleted"] and not dry_run:
+        store = backup_store.ObjectStore(unified_backup_dir)
+        if store.active_writers():
+            log_callback("  [Warning] 另一个批次正在写入去重存储，未引用的对象留到下次清理 / "
+                         "Another batch is writing to the dedup store, skipping object cleanup\n")
+        else:
+            store.collect_garbage()
+    log_callback(f"  {'预计' if dry_run else '已'}删除 {len(result['deleted'])} 个批次，释放 "
+                 f"{format_size(result['freed_bytes'])}，剩余 {format_size(result['remaining_bytes'])}\n")
+    return result
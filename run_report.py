@@ -0,0 +1,165 @@
+"""
+批次运行报告 / Per-batch run report
+
+每个提取任务记录耗时、输入包大小、输出字节数与文件数、备份及预览拷贝耗时，
+批次结束后汇总为 JSON（总计、百分位、最慢的包）和 CSV（每个任务一行），
+保存在输出根目录的 .repkg_reports/ 下，便于发现性能回退和评估硬件。
+"""
+import csv
+import datetime
+import itertools
+import json
+import os
+
+REPORT_DIR = ".repkg_reports"
+SLOWEST_COUNT = 10
+MB = 1024 * 1024
+
+# CSV 列顺序，同时也是单个任务记录的字段
+JOB_FIELDS = [
+    "index", "project", "pkg_path", "status", "exit_code",
+    "wall_seconds", "extract_seconds", "backup_seconds", "preview_seconds",
+    "pkg_bytes", "output_bytes", "output_files", "mb_per_second",
+]
+
+
+def file_states(path):
+    """
+    目录中文件的 {路径: (字节数, 修改时间)}（不跟随符号链接；目录不存在时为空）
+    提取前后各取一次，交给 produced_footprint 比较
+    """
+    states = {}
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            states[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return states
+
+
+def produced_footprint(before, after):
+    """
+    提取产生的文件数与字节数：提取后新增或大小/修改时间发生变化的文件
+    原地提取时项目中原有的文件、重复提取时未被改写的文件都不计入
+    """
+    files = 0
+    total = 0
+    for path, state in after.items():
+        if before.get(path) != state:
+            files += 1
+            total += state[0]
+    return files, total
+
+
+def percentile(values, pct):
+    """最近秩百分位 / Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def distribution(values):
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values, default=0.0), 3),
+    }
+
+
+def job_record(index, project, pkg_path, exit_code, wall_seconds, extract_seconds, backup_seconds,
+               preview_seconds, pkg_bytes, output_files=0, output_bytes=0):
+    """
+    生成单个任务的指标记录 / Build the metrics record of one job
+    output_files / output_bytes 为提取器本次写出的文件（见 repkg_core.execute_extraction），不含输出目录中原有的文件
+    """
+    return {
+        "index": index,
+        "project": project,
+        "pkg_path": pkg_path,
+        "status": "ok" if exit_code == 0 else "failed",
+        "exit_code": exit_code,
+        "wall_seconds": round(wall_seconds, 3),
+        "extract_seconds": round(extract_seconds, 3),
+        "backup_seconds": round(backup_seconds, 3),
+        "preview_seconds": round(preview_seconds, 3),
+        "pkg_bytes": pkg_bytes,
+        "output_bytes": output_bytes,
+        "output_files": output_files,
+        "mb_per_second": round(pkg_bytes / MB / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+def build_report(jobs, started_at, wall_seconds, skipped=0, options=""):
+    """
+    汇总所有任务记录 / Aggregate job records into a report dict
+    吞吐量按批次墙钟时间计算，因此反映了并发带来的整体速度
+    """
+    durations = [job["wall_seconds"] for job in jobs]
+    input_bytes = sum(job["pkg_bytes"] for job in jobs)
+    output_bytes = sum(job["output_bytes"] for job in jobs)
+    slowest = sorted(jobs, key=lambda job: job["wall_seconds"], reverse=True)[:SLOWEST_COUNT]
+    return {
+        "started_at": started_at,
+        "wall_seconds": round(wall_seconds, 3),
+        "options": options,
+        "totals": {
+            "packages": len(jobs),
+            "failed": sum(1 for job in jobs if job["status"] != "ok"),
+            "skipped": skipped,
+            "input_bytes": input_bytes,
+            "output_bytes": output_bytes,
+            "output_files": sum(job["output_files"] for job in jobs),
+            "job_seconds": round(sum(durations), 3),
+            "backup_seconds": round(sum(job["backup_seconds"] for job in jobs), 3),
+            "preview_seconds": round(sum(job["preview_seconds"] for job in jobs), 3),
+            "input_mb_per_second": round(input_bytes / MB / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "output_mb_per_second": round(output_bytes / MB / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        },
+        "job_seconds": distribution(durations),
+        "job_mb_per_second": distribution([job["mb_per_second"] for job in jobs]),
+        "slowest": [{key: job[key] for key in ("project", "pkg_path", "wall_seconds", "pkg_bytes", "status")}
+                    for job in slowest],
+        "jobs": sorted(jobs, key=lambda job: job["index"]),
+    }
+
+
+def write_run_report(output_root, report):
+    """
+    将报告写入 <output_root>/.repkg_reports/run_<时间戳>.json 与 .csv
+    时间戳精确到微秒，名称已被占用时（同一时刻结束的另一个批次）追加序号，不会覆盖已有报告
+    返回 (json_path, csv_path)
+    """
+    report_dir = os.path.join(output_root, REPORT_DIR)
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    for attempt in itertools.count():
+        name = f"run_{stamp}_{attempt}" if attempt else f"run_{stamp}"
+        json_path = os.path.join(report_dir, f"{name}.json")
+        try:
+            # 独占创建：名称的占用检查与创建是同一步
+            f = open(json_path, "x", encoding="utf-8")
+        except FileExistsError:
+            continue
+        break
+    csv_path = os.path.join(report_dir, f"{name}.csv")
+
+    with f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=JOB_FIELDS)
+        writer.writeheader()
+        writer.writerows(report["jobs"])
+    return json_path, csv_path
@@ -0,0 +1,181 @@
+"""
+持久化目录扫描索引 / Persistent directory scan index
+
+记录每个目录的修改时间（mtime）与子项列表，保存在程序目录的 assets/index_cache 中（见 cache_path），
+不写入被扫描的库。再次扫描时只重新列出 mtime 发生变化的目录，其余目录直接使用缓存结果。
+
+目录的 mtime 只在子项被创建、删除或重命名时改变，文件内容变化不会影响它，
+因此缓存的只是“有哪些子项及其类型”，不包含文件大小等属性。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+SCAN_INDEX_FILE = ".repkg_scan_index.json"
+INDEX_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "index_cache")
+SCAN_INDEX_VERSION = 1
+
+# 修改时间距今小于该秒数的目录可能仍在变化（以及 FAT 等文件系统的 2 秒精度），不信任其缓存
+MTIME_SETTLE_SECONDS = 2.0
+
+
+def cache_path(root_dir, file_name):
+    """
+    根目录对应的索引文件路径，例如 assets/index_cache/repkg_scan_index_<哈希>.json
+    以根目录绝对路径的哈希区分不同的库；只读的状态统计等操作因此不会写入库目录
+    """
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(root_dir)).encode("utf-8")).hexdigest()[:16]
+    stem, extension = os.path.splitext(file_name.lstrip("."))
+    return os.path.join(INDEX_CACHE_DIR, f"{stem}_{digest}{extension}")
+
+
+def write_atomic(path, payload):
+    """先写临时文件再替换，中断时不会留下半个索引"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}_{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ScanEntry:
+    """目录中的单个子项"""
+
+    __slots__ = ("name", "is_dir", "is_link")
+
+    def __init__(self, name, is_dir, is_link):
+        self.name = name
+        self.is_dir = is_dir  # 跟随符号链接判断
+        self.is_link = is_link
+
+    def __repr__(self):
+        return f"ScanEntry({self.name!r}, is_dir={self.is_dir}, is_link={self.is_link})"
+
+
+class ScanIndex:
+    """
+    基于目录 mtime 的扫描缓存，可在多线程中共享。
+
+    用法 / Usage:
+        index = ScanIndex(root_dir)
+        for dirpath, dirnames, filenames in index.walk():
+            ...
+        index.save()
+    """
+
+    def __init__(self, root_dir, index_path=None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_path = index_path or cache_path(self.root_dir, SCAN_INDEX_FILE)
+        self._prefix = os.path.join(self.root_dir, "")
+        self.dirs = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == SCAN_INDEX_VERSION and isinstance(data.get("dirs"), dict):
+                self.dirs = data["dirs"]
+        except (OSError, ValueError):
+            self.dirs = {}
+
+    def _key(self, path):
+        # walk() 产生的路径都以根目录开头，直接截取前缀比 relpath 快得多
+        if path == self.root_dir:
+            return "."
+        if path.startswith(self._prefix):
+            return path[len(self._prefix):]
+        return os.path.relpath(os.path.abspath(path), self.root_dir)
+
+    def list_dir(self, path):
+        """
+        列出目录子项（ScanEntry 列表）；目录 mtime 未变化时直接返回缓存
+        目录不存在或无法访问时抛出 OSError
+        """
+        key = self._key(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            cached = self.dirs.get(key)
+        if cached and cached["mtime_ns"] == mtime_ns and cached.get("stable"):
+            self.hits += 1
+            return [ScanEntry(name, "d" in kind, "l" in kind) for name, kind in cached["entries"]]
+
+        self.misses += 1
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_link = entry.is_symlink()
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_link, is_dir = False, False
+                entries.append(ScanEntry(entry.name, is_dir, is_link))
+
+        stable = (time.time() - mtime_ns / 1e9) > MTIME_SETTLE_SECONDS
+        record = {
+            "mtime_ns": mtime_ns,
+            "stable": stable,
+            "entries": [[e.name, ("l" if e.is_link else "") + ("d" if e.is_dir else "f")] for e in entries],
+        }
+        with self._lock:
+            self.dirs[key] = record
+            self._dirty = True
+        return entries
+
+    def walk(self, top=None, recursive=True):
+        """
+        与 os.walk 类似地遍历目录树（不进入符号链接），产出 (dirpath, dirnames, filenames)
+        与 os.walk 相同，可原地修改 dirnames 来跳过子目录
+        """
+        top = top or self.root_dir
+        stack = [top]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                entries = self.list_dir(dirpath)
+            except OSError:
+                continue
+            dirnames = [e.name for e in entries if e.is_dir and not e.is_link]
+            filenames = [e.name for e in entries if not e.is_dir]
+            yield dirpath, dirnames, filenames
+            if not recursive:
+                break
+            stack.extend(os.path.join(dirpath, name) for name in reversed(dirnames))
+
+    def prune(self):
+        """移除已不存在目录的缓存记录"""
+        with self._lock:
+            for key in list(self.dirs):
+                if not os.path.isdir(os.path.join(self.root_dir, key)):
+                    del self.dirs[key]
+                    self._dirty = True
+
+    def save(self):
+        """
+        保存索引（没有变化时不写入）
+        保存失败（如只读目录）时只打印警告，索引仅作为缓存使用
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = json.dumps({"version": SCAN_INDEX_VERSION, "dirs": self.dirs}, ensure_ascii=False,
+                                 separators=(",", ":"))
+            self._dirty = False
+        try:
+            write_atomic(self.index_path, payload)
+        except OSError as e:
+            print(f"  [Warning]  无法保存扫描索引 / Cannot save scan index {self.index_path}: {e}")
@@ -0,0 +1,106 @@
+"""备份保留规则测试 / Tests for plan_backup_retention and apply_backup_retention"""
+import datetime
+import os
+
+import backup_store
+import repkg_core
+
+NOW = datetime.datetime(2025, 6, 1, 12, 0, 0)
+
+
+def make_batches(ages_in_days, size=100, digests=None):
+    """按从旧到新的顺序生成 measure_backups 形式的批次列表"""
+    batches = []
+    for index, age in enumerate(sorted(ages_in_days, reverse=True)):
+        batches.append({
+            "name": f"backup_{index:02d}",
+            "created_at": NOW - datetime.timedelta(days=age),
+            "bytes": size,
+            "digests": dict(digests[index]) if digests else {},
+        })
+    return batches
+
+
+def deleted_names(plan):
+    return [item["name"] for item in plan]
+
+
+def test_keep_days_never_deletes_newest_batch():
+    batches = make_batches([30, 20, 10])
+    plan, total, remaining = repkg_core.plan_backup_retention(batches, keep_days=7, now=NOW)
+    assert deleted_names(plan) == ["backup_00", "backup_01"]
+    assert total == 300 and remaining == 100
+
+
+def test_keep_last_zero_with_keep_days_keeps_newest():
+    batches = make_batches([40, 9])
+    plan, _, _ = repkg_core.plan_backup_retention(batches, keep_last=0, keep_days=7, now=NOW)
+    assert deleted_names(plan) == ["backup_00"]
+
+
+def test_keep_last_and_keep_days_are_a_union():
+    batches = make_batches([30, 20, 5, 1])
+    plan, _, _ = repkg_core.plan_backup_retention(batches, keep_last=1, keep_days=7, now=NOW)
+    assert deleted_names(plan) == ["backup_00", "backup_01"]
+    plan, _, _ = repkg_core.plan_backup_retention(batches, keep_last=3, keep_days=0, now=NOW)
+    assert deleted_names(plan) == ["backup_00"]
+
+
+def test_no_rules_deletes_nothing():
+    batches = make_batches([300, 200])
+    plan, total, remaining = repkg_core.plan_backup_retention(batches, now=NOW)
+    assert plan == [] and total == remaining == 200
+
+
+def test_max_bytes_deletes_oldest_but_keeps_newest():
+    batches = make_batches([3, 2, 1], size=100)
+    plan, _, remaining = repkg_core.plan_backup_retention(batches, max_bytes=150, now=NOW)
+    assert deleted_names(plan) == ["backup_00", "backup_01"]
+    assert all(item["reason"] == "size" for item in plan)
+    assert remaining == 100
+
+    # 即使最新的批次本身就超过上限也保留
+    plan, _, remaining = repkg_core.plan_backup_retention(batches, max_bytes=10, now=NOW)
+    assert "backup_02" not in deleted_names(plan) and remaining == 100
+
+
+def test_shared_objects_are_only_freed_with_their_last_reference():
+    digests = [{"a": 1000}, {"a": 1000, "b": 500}, {"b": 500}]
+    batches = make_batches([3, 2, 1], size=10, digests=digests)
+    plan, total, remaining = repkg_core.plan_backup_retention(batches, keep_last=1, now=NOW)
+    assert total == 30 + 1500
+    freed = {item["name"]: item["freed_bytes"] for item in plan}
+    assert freed == {"backup_00": 10, "backup_01": 1010}
+    assert remaining == 10 + 500
+
+
+def test_apply_keep_days_leaves_newest_batch_on_disk(tmp_path):
+    unified = tmp_path / repkg_core.UNIFIED_BACKUP_DIR
+    old_time = (NOW - datetime.timedelta(days=400)).timestamp()
+    for name in ("backup_20200101_000000", "backup_20200102_000000"):
+        batch = unified / name / "1234"
+        batch.mkdir(parents=True)
+        (batch / "scene.json").write_text("{}")
+        os.utime(unified / name, (old_time, old_time))
+
+    summary = repkg_core.apply_backup_retention(str(tmp_path), lambda message: None, keep_days=7)
+    assert sorted(os.listdir(unified)) == ["backup_20200102_000000"]
+    assert summary["deleted"] == ["backup_20200101_000000"]
+
+
+def test_apply_does_not_collect_objects_while_a_batch_is_writing(tmp_path):
+    unified = tmp_path / repkg_core.UNIFIED_BACKUP_DIR
+    (unified / "backup_20200101_000000").mkdir(parents=True)
+    (unified / "backup_20200102_000000").mkdir()
+    source = tmp_path / "new.bin"
+    source.write_bytes(b"stored by a running batch")
+    writer = backup_store.ObjectStore(str(unified))
+    writer.begin_write()
+    digest, _, _ = writer.put(str(source))
+
+    summary = repkg_core.apply_backup_retention(str(tmp_path), lambda message: None, keep_last=1)
+    assert summary["deleted"] == ["backup_20200101_000000"]
+    assert os.path.isfile(writer.object_path(digest))
+
+    writer.end_write()
+    assert writer.active_writers() == []
@@ -0,0 +1,50 @@
+"""原地替换模式的备份安全性测试 / A project whose backup fails must not be extracted over"""
+import os
+
+import pytest
+
+import backup_store
+import repkg_core
+from conftest import snapshot_tree
+
+
+def run(settings):
+    return repkg_core.run_batch(settings, repkg_core.iter_pkg_files(settings["input_dir"]), lambda message: None)
+
+
+def test_archive_backup_accepts_pre_1980_mtimes(library, in_place_settings):
+    old_file = os.path.join(library, "1000000000", "project.json")
+    os.utime(old_file, (315000000, 315000000))  # 1979-12-25
+    summary = run(in_place_settings("archive"))
+    assert summary["failed"] == 0
+    batch = repkg_core.list_backups(library)[0]
+    assert "1000000000" in repkg_core.list_backup_projects(library, batch)
+
+
+@pytest.mark.parametrize("mode", ["archive", "dedup", "minimal", "hardlink", "copy"])
+def test_failed_backup_skips_extraction(library, in_place_settings, monkeypatch, mode):
+    # 先提取一次并修改提取结果，再次提取时这些文件会被覆盖，必须先备份
+    run(in_place_settings(auto_backup=False))
+    for project in os.listdir(library):
+        scene = os.path.join(library, project, "scene.json")
+        if os.path.isfile(scene):
+            with open(scene, "w", encoding="utf-8") as f:
+                f.write('{"edited": true}')
+    original = snapshot_tree(library)
+
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    # 每种备份方式写入数据时都会经过其中之一
+    monkeypatch.setattr(backup_store, "write_archive", broken)
+    monkeypatch.setattr(backup_store.ObjectStore, "put", broken)
+    monkeypatch.setattr(repkg_core, "_copy_file", broken)
+    monkeypatch.setattr(repkg_core.shutil, "copy2", broken)
+    monkeypatch.setattr(repkg_core.shutil, "copytree", broken)
+    monkeypatch.setattr(repkg_core.os, "link", broken)
+
+    summary = run(in_place_settings(mode, incremental=False))
+    assert summary["queued"] == 6 and summary["failed"] == 6
+    assert snapshot_tree(library) == original
+    for batch in repkg_core.list_backups(library):
+        assert repkg_core.list_backup_projects(library, batch) == []
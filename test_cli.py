@@ -0,0 +1,35 @@
+"""命令行入口测试 / Tests for repkg_cli path handling"""
+import os
+
+import pytest
+
+import bench_core
+import repkg_cli
+import repkg_core
+
+
+@pytest.fixture
+def config(library, extractor, tmp_path):
+    path = str(tmp_path / "config.json")
+    repkg_core.save_config(bench_core.bench_settings(extractor, "", "", 2), path)
+    return path
+
+
+def test_command_line_paths_are_relative_to_the_working_directory(library, config, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    name = os.path.basename(library)
+    assert repkg_cli.main(["--config", config, "status", name]) == repkg_cli.EXIT_OK
+    assert repkg_cli.main(["--config", config, "backup", "list", name]) == repkg_cli.EXIT_NOTHING
+
+    assert repkg_cli.main(["--config", config, "extract", "--input", name, "--output", "out"]) == repkg_cli.EXIT_OK
+    assert len(os.listdir(tmp_path / "out")) >= 6
+    assert not os.path.exists(os.path.join(repkg_cli.SCRIPT_DIR, "out"))
+
+
+def test_config_paths_are_relative_to_the_script_directory(config, tmp_path, monkeypatch):
+    settings = repkg_core.load_config(config)
+    settings["classify_dir"] = "assets"
+    repkg_core.save_config(settings, config)
+    monkeypatch.chdir(tmp_path)
+    assert repkg_cli.choose_path(None, "assets") == os.path.join(repkg_cli.SCRIPT_DIR, "assets")
+    assert repkg_cli.main(["--config", config, "status"]) == repkg_cli.EXIT_OK
@@ -0,0 +1,36 @@
+"""命令生成测试 / Tests for composing RePKG command lines"""
+import os
+
+import pytest
+
+import bench_core
+import repkg_core
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return bench_core.bench_settings(str(tmp_path / "missing" / "RePKG.exe"), str(tmp_path),
+                                     str(tmp_path / "output"), 1)
+
+
+def test_preview_command_touches_nothing(settings, tmp_path):
+    pkg_path = str(tmp_path / "1000000000" / "scene.pkg")
+    cmd = repkg_core.preview_command(settings, pkg_path)
+
+    assert cmd[:2] == [os.path.normpath(settings["repkg_path"]), "extract"]
+    assert cmd[-3:] == ["-o", os.path.normpath(repkg_core.get_output_dir(settings, pkg_path)),
+                        os.path.normpath(pkg_path)]
+    # RePKG 不存在也不报错，输出目录不会被创建
+    assert os.listdir(tmp_path) == []
+
+
+def test_build_command_checks_repkg_and_creates_the_output_dir(settings, tmp_path, extractor):
+    pkg_path = str(tmp_path / "1000000000" / "scene.pkg")
+    with pytest.raises(FileNotFoundError):
+        repkg_core.build_command(settings, pkg_path)
+    assert not os.path.exists(settings["output_dir"])
+
+    settings["repkg_path"] = extractor
+    cmd = repkg_core.build_command(settings, pkg_path)
+    assert cmd == repkg_core.preview_command(settings, pkg_path)
+    assert os.path.isdir(repkg_core.get_output_dir(settings, pkg_path))
@@ -0,0 +1,72 @@
+"""选择性提取测试 / Tests for include/exclude entry filters and the filtered writer"""
+import os
+
+import pytest
+
+from pkg_reader import _match_pattern, compile_entry_filter, extract_entries, parse_filter_text
+from workshop_gen import write_pkg
+
+
+@pytest.mark.parametrize("name, pattern, expected", [
+    ("sounds/a.mp3", "mp3", True),
+    ("sounds/a.mp3", ".mp3", True),
+    ("sounds/a.mp3", "MP3", True),
+    ("sounds/a.mp3.bak", "mp3", False),
+    ("sounds/amp3", "mp3", False),
+    ("scene.json", "scene.json", True),
+    ("models/scene.json", "scene.json", True),
+    ("models/other.json", "scene.json", False),
+    ("shaders/effects/a.frag", "*.frag", True),
+    ("shaders/effects/a.frag", "shaders/*", True),
+    ("materials/shaders/a.frag", "shaders/*", False),
+    ("shaders/a.frag", "shaders\\*", True),
+    ("materials/a.tex", "materials/?.tex", True),
+])
+def test_match_pattern(name, pattern, expected):
+    assert _match_pattern(name, pattern) is expected
+
+
+def test_parse_filter_text_accepts_mixed_separators():
+    assert parse_filter_text(" tex, json;\n mp3 ;; ") == ["tex", "json", "mp3"]
+    assert parse_filter_text("") == []
+
+
+def test_include_then_exclude():
+    accept = compile_entry_filter(["tex", "json"], ["materials/ui/*"])
+    assert accept("materials/a.tex")
+    assert accept("Scene.JSON")
+    assert accept("materials\\b.tex")
+    assert not accept("materials/ui/button.tex")
+    assert not accept("sounds/a.mp3")
+
+    # 没有包含规则时包含全部，只应用排除规则
+    accept = compile_entry_filter(exclude=["mp3", "ogg"])
+    assert accept("materials/a.tex") and not accept("sounds/a.OGG")
+    assert compile_entry_filter()("anything.bin")
+
+
+def test_filtered_writer_never_leaves_the_output_directory(tmp_path):
+    pkg_path = str(tmp_path / "scene.pkg")
+    write_pkg(pkg_path, [("scene.json", b"{}"), ("../escape.txt", b"x" * 3), ("a/../../escape2.txt", b"y"),
+                         ("materials/a.tex", b"tex"), ("sounds/a.mp3", b"mp3" * 2)])
+    output = tmp_path / "out" / "project"
+
+    stats = extract_entries(pkg_path, str(output), compile_entry_filter(exclude=["mp3"]))
+    assert sorted(os.listdir(tmp_path / "out")) == ["project"]
+    assert not os.path.exists(tmp_path / "escape2.txt")
+    assert (output / "scene.json").read_bytes() == b"{}"
+    assert (output / "materials" / "a.tex").read_bytes() == b"tex"
+    assert not (output / "sounds").exists()
+    assert stats == {"written": 2, "written_bytes": 5, "skipped": 3, "skipped_bytes": 10, "total_bytes": 15}
+
+
+def test_filtered_writer_can_keep_existing_files(tmp_path):
+    pkg_path = str(tmp_path / "scene.pkg")
+    write_pkg(pkg_path, [("scene.json", b"{new}"), ("project.json", b"{}")])
+    output = tmp_path / "out"
+    output.mkdir()
+    (output / "scene.json").write_bytes(b"{edited}")
+
+    stats = extract_entries(pkg_path, str(output), overwrite=False)
+    assert (output / "scene.json").read_bytes() == b"{edited}"
+    assert stats["written"] == 1 and stats["skipped"] == 1
@@ -0,0 +1,42 @@
+"""增量提取清单测试 / Tests for skipping unchanged packages via the output manifest"""
+import os
+
+import pytest
+
+import bench_core
+import repkg_core
+
+
+@pytest.fixture
+def settings(library, extractor, tmp_path):
+    output = str(tmp_path / "output")
+    os.makedirs(output)
+    return bench_core.bench_settings(extractor, library, output, 2)
+
+
+def run(settings, mode):
+    log = []
+    summary = repkg_core.run_batch(dict(settings, mode=mode), repkg_core.iter_pkg_files(settings["input_dir"]),
+                                   log.append)
+    return summary, "".join(log)
+
+
+def test_unchanged_packages_are_skipped(settings):
+    assert run(settings, "extract")[0]["done"] == 6
+    summary, _ = run(settings, "extract")
+    assert summary["skipped"] == 6 and summary["queued"] == 0
+
+
+def test_info_runs_neither_use_nor_change_the_manifest(settings):
+    run(settings, "extract")
+    manifest = repkg_core.load_manifest(settings["output_dir"])
+
+    # info 模式每次都要输出条目表，不能因为清单中的提取记录而跳过
+    for _ in range(2):
+        summary, log = run(settings, "info")
+        assert summary["queued"] == 6 and summary["skipped"] == 0
+        assert log.count("内置解析器") == 6
+    assert repkg_core.load_manifest(settings["output_dir"]) == manifest
+
+    summary, _ = run(settings, "extract")
+    assert summary["skipped"] == 6 and summary["queued"] == 0
@@ -0,0 +1,50 @@
+"""扫描与元数据索引缓存测试 / The index caches stay out of the library and are written atomically"""
+import os
+import time
+
+import repkg_core
+from scan_index import MTIME_SETTLE_SECONDS
+
+
+def age_tree(root):
+    """把所有文件与目录的 mtime 调到足够久以前，使索引认为它们已稳定并缓存"""
+    old = time.time() - 10 * MTIME_SETTLE_SECONDS
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        for name in filenames + dirnames:
+            os.utime(os.path.join(dirpath, name), (old, old))
+    os.utime(root, (old, old))
+
+
+def test_read_only_commands_do_not_write_into_the_library(library, index_cache_dir):
+    age_tree(library)
+    before = sorted(os.listdir(library))
+    root_mtime = os.stat(library).st_mtime_ns
+
+    repkg_core.list_current_status(library, lambda message: None)
+    repkg_core.list_gallery_projects(library)
+    list(repkg_core.iter_pkg_files(library))
+
+    assert sorted(os.listdir(library)) == before
+    assert os.stat(library).st_mtime_ns == root_mtime
+    assert sorted(name.split("_")[1] for name in os.listdir(index_cache_dir)) == ["project", "scan"]
+
+
+def test_unchanged_index_is_not_rewritten(library, index_cache_dir):
+    age_tree(library)
+    repkg_core.list_current_status(library, lambda message: None)
+    list(repkg_core.iter_pkg_files(library))
+    stats = {name: os.stat(os.path.join(index_cache_dir, name)) for name in os.listdir(index_cache_dir)}
+
+    repkg_core.list_current_status(library, lambda message: None)
+    list(repkg_core.iter_pkg_files(library))
+    for name, st in stats.items():
+        again = os.stat(os.path.join(index_cache_dir, name))
+        assert (again.st_ino, again.st_mtime_ns) == (st.st_ino, st.st_mtime_ns), name
+    assert not [name for name in os.listdir(index_cache_dir) if name.endswith(".tmp")]
+
+
+def test_classify_keeps_the_scan_index_out_of_the_library(library, index_cache_dir):
+    age_tree(library)
+    repkg_core.classify_projects(library, lambda message: None)
+    assert not [name for name in os.listdir(library) if name.startswith(".repkg_")]
+    assert os.listdir(index_cache_dir)
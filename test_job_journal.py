@@ -0,0 +1,98 @@
+"""任务日志与继续运行测试 / Tests for the job journal and resuming interrupted batches"""
+import os
+
+import pytest
+
+import bench_core
+import job_journal
+import repkg_cli
+import repkg_core
+
+
+@pytest.fixture
+def settings(library, extractor, tmp_path):
+    output = str(tmp_path / "output")
+    os.makedirs(output)
+    return bench_core.bench_settings(extractor, library, output, 2)
+
+
+def run(settings, resume=None):
+    return repkg_core.run_batch(settings, repkg_core.iter_pkg_files(settings["input_dir"]), lambda message: None,
+                                resume=resume)
+
+
+def leave_journal(settings, monkeypatch):
+    """运行一个批次，但让增量清单保存失败，使任务日志保留下来（与批次被中断后的状态相同）"""
+    def broken(output_root, manifest):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(repkg_core, "save_manifest", broken)
+        run(settings)
+    return job_journal.replay(settings["output_dir"])
+
+
+def test_journal_is_removed_after_the_manifest_is_saved(settings):
+    summary = run(settings)
+    assert summary["done"] == 6
+    assert job_journal.replay(settings["output_dir"]) is None
+    assert len(repkg_core.load_manifest(settings["output_dir"])["packages"]) == 6
+
+
+def test_journal_is_kept_when_the_manifest_cannot_be_saved(settings, monkeypatch):
+    state = leave_journal(settings, monkeypatch)
+    assert state is not None and len(state.completed) == 6
+
+    # 继续运行时所有包都已完成：不再提取，但上次的结果要写入增量清单后才能删除日志
+    summary = run(settings, resume=state)
+    assert summary["skipped"] == 6 and summary["queued"] == 0
+    assert len(repkg_core.load_manifest(settings["output_dir"])["packages"]) == 6
+    assert job_journal.replay(settings["output_dir"]) is None
+
+
+@pytest.mark.parametrize("change", [{"include_filters": "json"}, {"mode": "info"}])
+def test_resume_with_changed_options_is_refused(settings, monkeypatch, change):
+    state = leave_journal(settings, monkeypatch)
+    settings.update(change)
+    assert repkg_core.check_resume(settings, state)
+    summary = run(settings, resume=state)
+    assert summary["discovered"] == 0 and summary["queued"] == 0
+    assert len(job_journal.replay(settings["output_dir"]).completed) == 6
+
+
+def test_resume_with_another_input_is_refused(settings, monkeypatch, tmp_path):
+    state = leave_journal(settings, monkeypatch)
+    settings["input_dir"] = str(tmp_path)
+    assert repkg_core.check_resume(settings, state)
+    assert run(settings, resume=state)["discovered"] == 0
+
+
+def test_cli_refuses_to_resume_with_changed_options(settings, monkeypatch, tmp_path):
+    leave_journal(settings, monkeypatch)
+    config = str(tmp_path / "config.json")
+    repkg_core.save_config(settings, config)
+    assert repkg_cli.main(["--config", config, "extract", "--resume", "--include", "json"]) == repkg_cli.EXIT_ERROR
+    assert job_journal.replay(settings["output_dir"]) is not None
+    assert repkg_cli.main(["--config", config, "extract", "--resume"]) == repkg_cli.EXIT_OK
+    assert job_journal.replay(settings["output_dir"]) is None
+
+
+def test_cli_does_not_overwrite_an_unfinished_journal(settings, monkeypatch, tmp_path):
+    leave_journal(settings, monkeypatch)
+    config = str(tmp_path / "config.json")
+    repkg_core.save_config(settings, config)
+    assert repkg_cli.main(["--config", config, "extract"]) == repkg_cli.EXIT_USAGE
+    assert len(job_journal.replay(settings["output_dir"]).completed) == 6
+    assert repkg_cli.main(["--config", config, "extract", "--fresh"]) == repkg_cli.EXIT_OK
+    assert job_journal.replay(settings["output_dir"]) is None
+
+
+def test_info_runs_leave_an_unfinished_journal_alone(settings, monkeypatch, tmp_path):
+    leave_journal(settings, monkeypatch)
+    before = open(job_journal.journal_path(settings["output_dir"]), "rb").read()
+
+    assert run(dict(settings, mode="info"))["done"] == 6
+    config = str(tmp_path / "config.json")
+    repkg_core.save_config(settings, config)
+    assert repkg_cli.main(["--config", config, "info"]) == repkg_cli.EXIT_OK
+    assert open(job_journal.journal_path(settings["output_dir"]), "rb").read() == before
@@ -0,0 +1,63 @@
+"""分类库状态统计测试 / Tests for library_status counts"""
+import json
+import os
+
+import pytest
+
+import repkg_core
+
+
+def make_project(path, project_type=None, text=None, payload=b""):
+    os.makedirs(path)
+    if project_type is not None:
+        text = json.dumps({"title": os.path.basename(path), "type": project_type})
+    if text is not None:
+        with open(os.path.join(path, "project.json"), "w", encoding="utf-8") as f:
+            f.write(text)
+    with open(os.path.join(path, "scene.pkg"), "wb") as f:
+        f.write(payload)
+
+
+@pytest.fixture
+def classified(tmp_path):
+    root = str(tmp_path / "library")
+    make_project(os.path.join(root, "scene", "A"), "scene", payload=b"a" * 100)
+    make_project(os.path.join(root, "scene", "B"), "video")  # 类型与分类不符
+    make_project(os.path.join(root, "scene", "C"), text="{broken")  # 无法解析
+    make_project(os.path.join(root, "video", "V"), " video ", payload=b"v" * 10)
+    make_project(os.path.join(root, "Unknown", "U"))  # 没有 project.json
+    make_project(os.path.join(root, ".hidden", "H"), "scene")
+    os.symlink(os.path.join("scene", "A"), os.path.join(root, "A"))
+    os.symlink(os.path.join("video", "V"), os.path.join(root, "V"))
+    os.symlink(os.path.join("scene", "gone"), os.path.join(root, "X"))
+    os.symlink(str(tmp_path), os.path.join(root, "mine"))
+    return root
+
+
+def test_library_status_counts(classified):
+    status = repkg_core.library_status(classified)
+    assert list(status["categories"]) == ["scene", "video", "Unknown"]
+    assert status["categories"]["scene"] == {"projects": 3, "mapped": 1, "misplaced": 2, "invalid_project_json": 1,
+                                             "bytes": None}
+    assert status["categories"]["video"]["mapped"] == 1
+    assert status["categories"]["video"]["misplaced"] == 0  # 类型两端的空白被忽略
+    assert status["categories"]["Unknown"] == {"projects": 1, "mapped": 0, "misplaced": 0,
+                                               "invalid_project_json": 0, "bytes": None}
+    assert status["total_projects"] == 5
+    assert status["mapping_links"] == 2
+    assert status["dangling_links"] == ["X"]
+    assert status["unmapped_projects"] == ["B", "C"]
+    assert status["misplaced_projects"] == 2
+    assert status["invalid_project_json"] == 1
+    assert status["total_bytes"] is None
+    assert {link["name"]: link["dangling"] for link in status["links"]} == {"A": False, "V": False, "X": True,
+                                                                           "mine": False}
+    json.dumps(status)
+
+
+def test_library_status_bytes(classified):
+    status = repkg_core.library_status(classified, with_bytes=True, workers=2)
+    scene_json = sum(os.path.getsize(os.path.join(classified, "scene", name, "project.json")) for name in "ABC")
+    assert status["categories"]["scene"]["bytes"] == 100 + scene_json
+    assert status["categories"]["Unknown"]["bytes"] == 0
+    assert status["total_bytes"] == sum(item["bytes"] for item in status["categories"].values())
@@ -0,0 +1,79 @@
+"""映射链接测试 / Tests for reconciling the hidden mapping links of a classified library"""
+import os
+
+import pytest
+
+import repkg_core
+
+
+@pytest.fixture
+def classified(tmp_path):
+    """
+    分类根目录：scene/{A,B,F}、video/{C,D}、Unknown/U、.hidden/H、未分类的真实项目 D，以及已有的链接：
+    B 指向错误的分类，C 正确，E 的项目已不存在，F 与 mine、A2 为用户自己的链接
+    """
+    root = tmp_path / "library"
+    for path in ("scene/A", "scene/B", "scene/F", "video/C", "video/D", "Unknown/U", ".hidden/H", "D"):
+        (root / path).mkdir(parents=True)
+    os.symlink(os.path.join("video", "B"), root / "B")
+    os.symlink(os.path.join("video", "C"), root / "C")
+    os.symlink(os.path.join("scene", "E"), root / "E")
+    os.symlink(str(tmp_path / "elsewhere" / "F"), root / "F")
+    os.symlink(str(tmp_path / "elsewhere"), root / "mine")
+    os.symlink(os.path.join("scene", "other"), root / "A2")
+    return str(root)
+
+
+def links(root):
+    return {name: os.readlink(os.path.join(root, name)) for name in os.listdir(root)
+            if os.path.islink(os.path.join(root, name))}
+
+
+@pytest.mark.parametrize("workers", [None, 4])
+def test_reconcile_applies_only_the_difference(classified, workers):
+    before = links(classified)
+    unchanged_inode = os.lstat(os.path.join(classified, "C")).st_ino
+
+    result = repkg_core.reconcile_mappings(classified, workers=workers)
+    assert result["created"] == ["A"]
+    assert result["retargeted"] == ["B"]
+    assert result["removed"] == ["E"]
+    assert result["unchanged"] == 1 and result["failed"] == []
+    assert sorted(result["skipped"]) == ["D", "F"]
+
+    after = links(classified)
+    assert after["A"] == os.path.join("scene", "A")
+    assert after["B"] == os.path.join("scene", "B")
+    assert "E" not in after
+    # 正确的链接不被重建，用户自己的链接与真实目录保持不动
+    assert os.lstat(os.path.join(classified, "C")).st_ino == unchanged_inode
+    for name in ("F", "mine", "A2"):
+        assert after[name] == before[name]
+    assert os.path.isdir(os.path.join(classified, "D")) and not os.path.islink(os.path.join(classified, "D"))
+    assert not {"U", "H"} & set(after)
+
+    again = repkg_core.reconcile_mappings(classified, workers=workers)
+    assert again["created"] == again["retargeted"] == again["removed"] == []
+    assert again["unchanged"] == 3
+
+
+def test_remove_deletes_only_mapping_links(classified):
+    repkg_core.reconcile_mappings(classified)
+    assert repkg_core.remove_all_mappings(classified) == 3
+    assert sorted(links(classified)) == ["A2", "F", "mine"]
+    assert sorted(os.listdir(os.path.join(classified, "scene"))) == ["A", "B", "F"]
+
+
+def test_failed_operations_are_reported(classified, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(repkg_core.os, "symlink", broken)
+    messages = []
+    result = repkg_core.reconcile_mappings(classified, messages.append)
+    assert sorted(result["failed"]) == ["A", "B"]
+    assert result["removed"] == ["E"]
+    assert any("A" in message and "[Error]" in message for message in messages)
+    # 修正失败的链接保持原样
+    assert links(classified)["B"] == os.path.join("video", "B")
+    assert not [name for name in os.listdir(classified) if name.endswith(".repkg_old")]
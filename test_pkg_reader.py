@@ -0,0 +1,71 @@
+"""PKG 容器读取器测试 / Tests for pkg_reader header parsing and bounds checks"""
+import struct
+
+import pytest
+
+from pkg_reader import MAX_NAME_LENGTH, PkgFormatError, PkgReader, format_pkg_info, read_pkg_entries
+from workshop_gen import write_pkg
+
+ENTRIES = [("scene.json", b'{"camera": {}}'), ("materials/a.tex", b"TEXV0005" + bytes(24)),
+           ("sounds\\b.mp3", b"ID3" * 5)]
+
+
+@pytest.fixture
+def pkg_path(tmp_path):
+    path = str(tmp_path / "scene.pkg")
+    write_pkg(path, ENTRIES)
+    return path
+
+
+def write_bytes(tmp_path, data):
+    path = str(tmp_path / "broken.pkg")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_reads_entries_without_copying(pkg_path):
+    with PkgReader(pkg_path) as pkg:
+        assert pkg.magic == "PKGV0001"
+        assert [(e.name, e.size) for e in pkg] == [(name, len(data)) for name, data in ENTRIES]
+        for entry, (_, data) in zip(pkg.entries, ENTRIES):
+            view = pkg.read(entry)
+            assert bytes(view) == data
+            view.release()
+        assert pkg.find("SOUNDS/B.MP3").name == "sounds\\b.mp3"
+        assert pkg.find("missing.json") is None
+        assert pkg.total_size == sum(len(data) for _, data in ENTRIES)
+
+
+def test_format_pkg_info_lists_sorted_entries(pkg_path):
+    text = format_pkg_info(pkg_path)
+    assert "Entries: 3" in text
+    assert text.index("materials/a.tex") < text.index("scene.json") < text.index("sounds\\b.mp3")
+
+
+def test_every_truncation_is_rejected(pkg_path, tmp_path):
+    with open(pkg_path, "rb") as f:
+        data = f.read()
+    # 截断在文件头中时报告文件头不完整，截断在数据区中时最后一个条目超出范围
+    for length in range(len(data)):
+        with pytest.raises(PkgFormatError):
+            read_pkg_entries(write_bytes(tmp_path, data[:length]))
+
+
+@pytest.mark.parametrize("data", [
+    struct.pack("<I", 8) + b"NOTAPKG!" + struct.pack("<I", 0),
+    struct.pack("<I", 1000) + b"PKGV0001",
+    struct.pack("<I", 8) + b"PKGV0001" + struct.pack("<I", 1) + struct.pack("<I", MAX_NAME_LENGTH + 1) +
+    b"a" * (MAX_NAME_LENGTH + 1) + struct.pack("<II", 0, 0),
+    struct.pack("<I", 8) + b"PKGV0001" + struct.pack("<I", 1) + struct.pack("<I", 1) + b"a" +
+    struct.pack("<II", 0xFFFFFFFF, 1) + b"x",
+], ids=["bad-magic", "magic-too-long", "name-too-long", "offset-out-of-bounds"])
+def test_malformed_headers_are_rejected(tmp_path, data):
+    with pytest.raises(PkgFormatError):
+        PkgReader(write_bytes(tmp_path, data))
+
+
+def test_huge_entry_count_fails_fast(tmp_path):
+    data = struct.pack("<I", 8) + b"PKGV0001" + struct.pack("<I", 0xFFFFFFFF)
+    with pytest.raises(PkgFormatError):
+        PkgReader(write_bytes(tmp_path, data))
@@ -0,0 +1,53 @@
+"""预览图查找测试 / Tests for the preview image lookup order"""
+import os
+
+import pytest
+
+import repkg_core
+
+
+def make_files(directory, *names):
+    os.makedirs(directory, exist_ok=True)
+    for name in names:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(name.encode("utf-8"))
+
+
+@pytest.mark.parametrize("names, expected", [
+    # preview.* 优先于 <包名>.*，即使后者的扩展名排序更靠前
+    (["scene.png", "preview.webp"], "preview.webp"),
+    # 同类中按 PREVIEW_EXTENSIONS 的顺序
+    (["preview.gif", "preview.jpg", "preview.png"], "preview.png"),
+    (["scene.bmp", "scene.jpeg"], "scene.jpeg"),
+    # 不区分大小写，返回磁盘上的实际文件名
+    (["Preview.JPG", "SCENE.png"], "Preview.JPG"),
+    # 其他名称与不支持的扩展名被忽略
+    (["preview.txt", "cover.png", "preview_small.png"], None),
+])
+def test_preview_lookup_priority(tmp_path, names, expected):
+    project = str(tmp_path / "project")
+    make_files(project, "scene.pkg", *names)
+    found = repkg_core.find_preview_image(os.path.join(project, "scene.pkg"))
+    assert found == (os.path.join(project, expected) if expected else None)
+
+
+def test_directory_index_lists_each_directory_once(tmp_path):
+    project = str(tmp_path / "project")
+    make_files(project, "scene.pkg", "extra.pkg", "preview.png", "extra.jpg", "project.json")
+    index = repkg_core.DirectoryIndex()
+
+    assert repkg_core.find_preview_image(os.path.join(project, "scene.pkg"), index).endswith("preview.png")
+    assert repkg_core.find_preview_image(os.path.join(project, "extra.pkg"), index).endswith("preview.png")
+    output = str(tmp_path / "output")
+    assert repkg_core.copy_preview_image(os.path.join(project, "scene.pkg"), output, lambda message: None,
+                                         dir_index=index)
+    assert sorted(os.listdir(output)) == ["preview.png", "project.json"]
+    assert index.listings == 1
+
+
+def test_package_named_preview_is_copied_as_preview(tmp_path):
+    project = str(tmp_path / "project")
+    make_files(project, "scene.pkg", "scene.jpg")
+    output = str(tmp_path / "output")
+    assert repkg_core.copy_preview_image(os.path.join(project, "scene.pkg"), output, lambda message: None)
+    assert os.listdir(output) == ["preview.jpg"]
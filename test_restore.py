@@ -0,0 +1,86 @@
+"""备份还原测试 / Restore round trips for every backup mode"""
+import os
+import time
+
+import pytest
+
+import backup_store
+import repkg_core
+from conftest import snapshot_tree
+
+MODES = ["hardlink", "minimal", "dedup", "archive", "copy"]
+
+
+def run(settings):
+    return repkg_core.run_batch(settings, repkg_core.iter_pkg_files(settings["input_dir"]), lambda message: None)
+
+
+def restore(library, batch, projects=None):
+    return repkg_core.restore_selected_backup(library, batch, lambda message: None, projects, workers=2)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_restore_undoes_an_extraction(library, in_place_settings, mode):
+    # 项目中已有提取结果并被修改过：再次提取会覆盖这些文件并新增文件
+    run(in_place_settings(auto_backup=False))
+    for project in os.listdir(library):
+        scene = os.path.join(library, project, "scene.json")
+        if os.path.isfile(scene):
+            with open(scene, "w", encoding="utf-8") as f:
+                f.write('{"edited": true}')
+    original = snapshot_tree(library)
+
+    summary = run(in_place_settings(mode, incremental=False))
+    assert summary["done"] == 6 and summary["failed"] == 0
+    assert snapshot_tree(library) != original
+
+    batch = repkg_core.list_backups(library)[0]
+    assert len(repkg_core.list_backup_projects(library, batch)) == 6
+    assert restore(library, batch)
+    assert snapshot_tree(library) == original
+    assert batch not in repkg_core.list_backups(library)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_restore_selected_projects_only(library, in_place_settings, mode):
+    original = snapshot_tree(library)
+    run(in_place_settings(mode))
+    extracted = snapshot_tree(library)
+
+    batch = repkg_core.list_backups(library)[0]
+    projects = repkg_core.list_backup_projects(library, batch)
+    chosen, rest = projects[0], projects[1:]
+    assert restore(library, batch, [chosen])
+
+    restored = snapshot_tree(library)
+    for path, content in restored.items():
+        reference = original if path.startswith(chosen + "/") else extracted
+        assert reference.get(path) == content, path
+    assert {path for path in original if path.startswith(chosen + "/")} == \
+           {path for path in restored if path.startswith(chosen + "/")}
+    assert repkg_core.list_backup_projects(library, batch) == rest
+
+
+def test_restore_keeps_objects_of_a_batch_still_writing(library, in_place_settings, tmp_path):
+    run(in_place_settings("dedup"))
+    unified = os.path.join(library, repkg_core.UNIFIED_BACKUP_DIR)
+    store = backup_store.ObjectStore(unified)
+    assert store.active_writers() == []
+
+    # 另一个批次刚存入、还没有写入项目清单的对象
+    source = tmp_path / "new.bin"
+    source.write_bytes(b"not referenced by any manifest yet")
+    writer = backup_store.ObjectStore(unified)
+    writer.begin_write()
+    digest, _, stored = writer.put(str(source))
+    assert stored
+
+    assert restore(library, repkg_core.list_backups(library)[0])
+    assert os.path.isfile(store.object_path(digest))
+
+    # 写入登记超过 WRITER_STALE_SECONDS 未刷新：视为中断批次的遗留，不再阻止清理
+    stale = time.time() - backup_store.WRITER_STALE_SECONDS - 1
+    os.utime(writer.active_writers()[0], (stale, stale))
+    # 还原时跳过的清理在此一并完成：批次已还原，所有对象都不再被引用
+    store.collect_garbage()
+    assert not os.path.exists(store.root)
@@ -0,0 +1,57 @@
+"""批量提取调度测试 / Tests for the run_batch job queue"""
+import os
+import threading
+
+import pytest
+
+import repkg_core
+from conftest import snapshot_tree
+
+
+def run(settings):
+    return repkg_core.run_batch(settings, repkg_core.iter_pkg_files(settings["input_dir"]), lambda message: None)
+
+
+def test_failing_job_callback_does_not_leak_queue_slots(library, in_place_settings):
+    # 2 个工作线程、4 个队列名额、6 个包：名额泄漏时扫描会永远阻塞
+    def job_callback(event):
+        if event["status"] == "running":
+            raise RuntimeError("table closed")
+
+    settings = in_place_settings(auto_backup=False)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(repkg_core.run_batch(
+        settings, repkg_core.iter_pkg_files(library), lambda message: None, job_callback=job_callback)), daemon=True)
+    thread.start()
+    thread.join(30)
+    assert not thread.is_alive()
+    assert result["queued"] == result["done"] == result["failed"] == 6
+
+
+@pytest.mark.parametrize("mode", ["copy", "dedup"])
+def test_retry_reuses_the_batch_backup(library, in_place_settings, monkeypatch, mode):
+    run(in_place_settings(auto_backup=False))
+    for project in os.listdir(library):
+        scene = os.path.join(library, project, "scene.json")
+        if os.path.isfile(scene):
+            with open(scene, "w", encoding="utf-8") as f:
+                f.write('{"edited": true}')
+    original = snapshot_tree(library)
+
+    # 模拟提取写出所有文件后才失败：项目已被部分覆盖
+    monkeypatch.setenv("REPKG_FAKE_FAIL", "1000000002")
+    settings = in_place_settings(mode, incremental=False)
+    summary = run(settings)
+    assert summary["failed"] == 1 and len(summary["partial"]) == 1
+    batch = os.path.basename(summary["backup_path"])
+
+    monkeypatch.delenv("REPKG_FAKE_FAIL")
+    retry = repkg_core.run_batch(settings, summary["partial"], lambda message: None,
+                                 resume=repkg_core.retry_state(settings, summary))
+    assert retry["done"] == 1 and retry["failed"] == 0
+    assert retry["backup_path"] == summary["backup_path"]
+    assert repkg_core.list_backups(library) == [batch]
+
+    # 还原后得到的是第一次提取前的文件，而不是失败的提取留下的内容
+    assert repkg_core.restore_selected_backup(library, batch, lambda message: None)
+    assert snapshot_tree(library) == original
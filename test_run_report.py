@@ -0,0 +1,70 @@
+"""批次运行报告测试 / Tests for per-job output metrics and report files"""
+import datetime
+import json
+import os
+import types
+
+import pytest
+
+import repkg_core
+import run_report
+from pkg_reader import PkgReader
+
+
+def run_jobs(settings):
+    """运行一个批次，返回 {项目: 任务指标}"""
+    jobs = {}
+
+    def job_callback(event):
+        if event["status"] != "running":
+            jobs[event["project"]] = event
+
+    repkg_core.run_batch(settings, repkg_core.iter_pkg_files(settings["input_dir"]), lambda message: None,
+                         job_callback=job_callback)
+    return jobs
+
+
+def package_entries(library, project):
+    with PkgReader(os.path.join(library, project, "scene.pkg")) as pkg:
+        return [(entry.name, entry.size) for entry in pkg.entries]
+
+
+@pytest.mark.parametrize("rerun", [False, True], ids=["first", "re-extract"])
+def test_in_place_output_counts_only_the_extracted_files(library, in_place_settings, rerun):
+    # 项目目录中原有 project.json、preview.jpg 与 .pkg，重复提取时还有上次的输出，它们都不计入
+    settings = in_place_settings(auto_backup=False, incremental=False)
+    if rerun:
+        run_jobs(settings)
+    jobs = run_jobs(settings)
+    assert len(jobs) == 6
+    for project, job in jobs.items():
+        entries = package_entries(library, project)
+        assert job["status"] == "ok"
+        assert job["output_files"] == len(entries)
+        assert job["output_bytes"] == sum(size for _, size in entries)
+
+
+def test_filtered_output_counts_the_written_entries(library, in_place_settings):
+    jobs = run_jobs(in_place_settings(auto_backup=False, include_filters="*.json"))
+    for project, job in jobs.items():
+        written = [size for name, size in package_entries(library, project) if name.endswith(".json")]
+        assert job["output_files"] == len(written)
+        assert job["output_bytes"] == sum(written)
+
+
+def test_reports_finished_at_the_same_moment_do_not_overwrite_each_other(tmp_path, monkeypatch):
+    class Frozen(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 5, 1, 12, 0, 0, 123456)
+
+    monkeypatch.setattr(run_report, "datetime", types.SimpleNamespace(datetime=Frozen))
+    paths = [run_report.write_run_report(str(tmp_path), run_report.build_report([], "batch", 1.0, options=str(n)))
+             for n in range(3)]
+
+    assert len({path for pair in paths for path in pair}) == 6
+    assert os.path.basename(paths[0][0]) == "run_20240501_120000_123456.json"
+    for n, (json_path, csv_path) in enumerate(paths):
+        with open(json_path, encoding="utf-8") as f:
+            assert json.load(f)["options"] == str(n)
+        assert os.path.isfile(csv_path)
@@ -0,0 +1,143 @@
+"""内置 TEX 解码器测试 / Round-trip tests for tex_decoder with fixtures built in the test"""
+import io
+import struct
+
+import pytest
+
+import tex_decoder
+
+np = pytest.importorskip("numpy")
+
+TRANSPARENT = (0, 0, 0, 0)
+
+
+def nstring(text):
+    return text.encode("ascii") + b"\0"
+
+
+def int32s(*values):
+    return struct.pack(f"<{len(values)}i", *values)
+
+
+def lz4_literals(data):
+    """只含字面量的 LZ4 块（合法的最后一个序列），用于构造压缩的 mipmap"""
+    length = len(data)
+    token = bytes([min(length, 15) << 4])
+    extra = b""
+    if length >= 15:
+        rest = length - 15
+        extra = b"\xff" * (rest // 255) + bytes([rest % 255])
+    return token + extra + data
+
+
+def make_tex(tex_format, width, height, data, lz4=False, image_size=None):
+    """TEXV0005 / TEXI0001 / TEXB0003 容器，单个图像、单个 mipmap"""
+    image_width, image_height = image_size or (width, height)
+    payload = lz4_literals(data) if lz4 else data
+    return (nstring("TEXV0005") + nstring("TEXI0001") +
+            int32s(tex_format, 0, width, height, image_width, image_height, 0) +
+            nstring("TEXB0003") + int32s(1, tex_decoder.FREE_IMAGE_UNKNOWN, 1) +
+            int32s(width, height, int(lz4), len(data), len(payload)) + payload)
+
+
+def color_block(c0, c1, indices):
+    """8 字节颜色块：两个 RGB565 端点与 16 个 2 位索引（按行，低位在前）"""
+    bits = sum(index << (2 * i) for i, index in enumerate(indices))
+    return struct.pack("<HHI", c0, c1, bits)
+
+
+def alpha_block(a0, a1, indices):
+    """DXT5 的 8 字节 alpha 块：两个端点与 16 个 3 位索引"""
+    bits = sum(index << (3 * i) for i, index in enumerate(indices))
+    return bytes([a0, a1]) + bits.to_bytes(6, "little")
+
+
+def block_pixels(palette, indices):
+    """按索引展开为 4×4 的参考像素"""
+    return [[palette[indices[row * 4 + column]] for column in range(4)] for row in range(4)]
+
+
+def side_by_side(left, right):
+    return [left_row + right_row for left_row, right_row in zip(left, right)]
+
+
+def decode(data):
+    tex = tex_decoder.parse_tex(data)
+    return tex_decoder.decode_mipmap(tex, tex.images[0][0])
+
+
+CYCLE = [i % 4 for i in range(16)]
+
+
+def test_dxt1_four_and_three_color_blocks():
+    # 第一个块 c0 > c1：四色模式；第二个块 c0 <= c1：三色模式，第四色透明
+    data = (color_block(0xFFFF, 0x0000, CYCLE) +
+            color_block(0x0000, 0xF800, CYCLE))
+    four = [(255, 255, 255, 255), (0, 0, 0, 255), (170, 170, 170, 255), (85, 85, 85, 255)]
+    three = [(0, 0, 0, 255), (255, 0, 0, 255), (127, 0, 0, 255), TRANSPARENT]
+    expected = side_by_side(block_pixels(four, CYCLE), block_pixels(three, CYCLE))
+
+    pixels = decode(make_tex(tex_decoder.FORMAT_DXT1, 8, 4, data))
+    assert pixels.shape == (4, 8, 4)
+    assert pixels.tolist() == [[list(pixel) for pixel in row] for row in expected]
+
+
+def test_dxt1_expands_565_by_bit_replication():
+    # 红色分量 0b10000 -> 0b10000100 = 132，绿色 0b100000 -> 0b10000010 = 130
+    data = color_block(0x8400, 0x0000, [0] * 16)
+    pixels = decode(make_tex(tex_decoder.FORMAT_DXT1, 4, 4, data))
+    assert pixels[0, 0].tolist() == [132, 130, 0, 255]
+
+
+def test_dxt5_interpolated_alpha_and_cropping():
+    alpha_cycle = [i % 8 for i in range(16)]
+    data = (alpha_block(255, 0, alpha_cycle) + color_block(0x07E0, 0x001F, CYCLE) +
+            alpha_block(0, 200, alpha_cycle) + color_block(0x07E0, 0x001F, CYCLE))
+    # a0 > a1：八级插值；a0 <= a1：六级插值，外加 0 与 255
+    eight = [255, 0, 218, 182, 145, 109, 72, 36]
+    six = [0, 200, 40, 80, 120, 160, 0, 255]
+    # DXT5 的颜色块总是四色模式
+    colors = [(0, 255, 0), (0, 0, 255), (0, 170, 85), (0, 85, 170)]
+
+    def expected_block(alphas):
+        return [[colors[CYCLE[row * 4 + column]] + (alphas[alpha_cycle[row * 4 + column]],)
+                 for column in range(4)] for row in range(4)]
+
+    expected = side_by_side(expected_block(eight), expected_block(six))
+
+    # 6×3 的图像占用 2×1 个块，解码结果按 mipmap 尺寸裁剪
+    pixels = decode(make_tex(tex_decoder.FORMAT_DXT5, 6, 3, data))
+    assert pixels.shape == (3, 6, 4)
+    assert pixels.tolist() == [[list(pixel) for pixel in row[:6]] for row in expected[:3]]
+
+
+@pytest.mark.parametrize("lz4_module", [True, False], ids=["lz4", "pure-python"])
+def test_rgba8888_lz4_round_trip(monkeypatch, lz4_module):
+    if not lz4_module:
+        monkeypatch.setattr(tex_decoder, "_lz4_block", None)
+    elif tex_decoder._lz4_block is None:
+        pytest.skip("lz4 is not installed")
+
+    data = bytes(range(5 * 3 * 4))
+    pixels = decode(make_tex(tex_decoder.FORMAT_RGBA8888, 5, 3, data, lz4=True))
+    assert pixels.shape == (3, 5, 4)
+    assert pixels.tobytes() == data
+
+
+def test_convert_tex_bytes_crops_to_image_size():
+    Image = pytest.importorskip("PIL.Image")
+    data = bytes(range(4 * 4 * 4))
+    extension, png = tex_decoder.convert_tex_bytes(
+        make_tex(tex_decoder.FORMAT_RGBA8888, 4, 4, data, image_size=(3, 2)))
+    assert extension == ".png"
+
+    image = Image.open(io.BytesIO(png))
+    assert image.mode == "RGBA" and image.size == (3, 2)
+    reference = np.frombuffer(data, dtype=np.uint8).reshape(4, 4, 4)[:2, :3]
+    assert np.asarray(image).tolist() == reference.tolist()
+
+
+def test_truncated_file_is_rejected():
+    data = make_tex(tex_decoder.FORMAT_RGBA8888, 2, 2, bytes(16))
+    with pytest.raises(tex_decoder.TexFormatError):
+        tex_decoder.parse_tex(data[:-4])
@@ -0,0 +1,504 @@
+"""
+Wallpaper Engine TEX 纹理解码器（进程内，可选后端）
+In-process decoder for Wallpaper Engine TEX textures (optional backend)
+
+支持 / Supported:
+    - 容器 TEXV0005 / TEXI0001 / TEXB0001 ~ TEXB0004
+    - LZ4 压缩的 mipmap 数据（优先使用 lz4 模块，否则使用纯 Python 实现）
+    - 像素格式 RGBA8888 / DXT1 / DXT3 / DXT5 / RG88 / R8（块解压使用 NumPy 向量化）
+    - 内嵌的图像文件（PNG/JPEG/GIF/MP4 等）原样写出
+
+像素格式解码依赖 NumPy；未安装时 NUMPY_AVAILABLE 为 False，调用方应回退到 RePKG。
+Pixel formats require NumPy; callers should fall back to RePKG when NUMPY_AVAILABLE is False.
+
+命令行 / Command line:
+    python tex_decoder.py [--workers N] [--repkg RePKG.exe] <file.tex | dir> ...
+    解码所有 .tex 并输出耗时；指定 --repkg 时同时计时外部转换器以便对比。
+"""
+import argparse
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    import lz4.block as _lz4_block
+except ImportError:
+    _lz4_block = None
+
+# TexFormat
+FORMAT_RGBA8888 = 0
+FORMAT_DXT5 = 4
+FORMAT_DXT3 = 6
+FORMAT_DXT1 = 7
+FORMAT_RG88 = 8
+FORMAT_R8 = 9
+
+# TexFlags
+FLAG_IS_GIF = 4
+
+# FreeImageFormat -> 文件扩展名（mipmap 为完整图像文件时使用）
+FREE_IMAGE_UNKNOWN = -1
+FREE_IMAGE_EXTENSIONS = {
+    0: ".bmp",
+    2: ".jpg",
+    13: ".png",
+    17: ".tga",
+    18: ".tif",
+    25: ".gif",
+    35: ".webp",
+}
+
+_INT32 = struct.Struct("<i")
+
+
+class TexFormatError(ValueError):
+    """TEX 文件格式错误或暂不支持 / Invalid or unsupported TEX file"""
+
+
+class TexMipmap:
+    __slots__ = ("width", "height", "data")
+
+    def __init__(self, width, height, data):
+        self.width = width
+        self.height = height
+        self.data = data
+
+
+class TexFile:
+    """解析后的 TEX 文件（仅保留解码所需的字段）"""
+
+    def __init__(self):
+        self.format = FORMAT_RGBA8888
+        self.flags = 0
+        self.texture_width = 0
+        self.texture_height = 0
+        self.image_width = 0
+        self.image_height = 0
+        self.container = ""
+        self.image_format = FREE_IMAGE_UNKNOWN
+        self.is_mp4 = False
+        self.images = []  # list[list[TexMipmap]]
+
+    @property
+    def is_gif(self):
+        return bool(self.flags & FLAG_IS_GIF)
+
+
+class _Cursor:
+    """小端序二进制读取游标"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def int32(self):
+        if self.pos + 4 > len(self.data):
+            raise TexFormatError("文件被截断 / Truncated TEX file")
+        value = _INT32.unpack_from(self.data, self.pos)[0]
+        self.pos += 4
+        return value
+
+    def nstring(self, max_length=16):
+        end = bytes(self.data[self.pos:self.pos + max_length + 1]).find(b"\0")
+        if end < 0:
+            raise TexFormatError("无效的标识字符串 / Invalid magic string")
+        value = bytes(self.data[self.pos:self.pos + end]).decode("ascii", errors="replace")
+        self.pos += end + 1
+        return value
+
+    def bytes(self, count):
+        if count < 0 or self.pos + count > len(self.data):
+            raise TexFormatError("数据长度超出文件范围 / Payload out of bounds")
+        value = self.data[self.pos:self.pos + count]
+        self.pos += count
+        return value
+
+
+# ------------------------------------------------------------
+#  LZ4
+# ------------------------------------------------------------
+def lz4_block_decompress(src, uncompressed_size):
+    """解压 LZ4 块格式数据 / Decompress an LZ4 block"""
+    if _lz4_block is not None:
+        return _lz4_block.decompress(bytes(src), uncompressed_size=uncompressed_size)
+
+    src = bytes(src)
+    dst = bytearray()
+    pos = 0
+    end = len(src)
+    while pos < end:
+        token = src[pos]
+        pos += 1
+
+        literal_length = token >> 4
+        if literal_length == 15:
+            while True:
+                extra = src[pos]
+                pos += 1
+                literal_length += extra
+                if extra != 255:
+                    break
+        dst += src[pos:pos + literal_length]
+        pos += literal_length
+        if pos >= end:
+            break  # 最后一个序列只有字面量
+
+        offset = src[pos] | (src[pos + 1] << 8)
+        pos += 2
+        if offset == 0 or offset > len(dst):
+            raise TexFormatError("LZ4 数据损坏 / Corrupt LZ4 data")
+
+        match_length = token & 0x0F
+        if match_length == 15:
+            while True:
+                extra = src[pos]
+                pos += 1
+                match_length += extra
+                if extra != 255:
+                    break
+        match_length += 4
+
+        start = len(dst) - offset
+        if match_length <= offset:
+            dst += dst[start:start + match_length]
+        else:
+            # 重叠复制：按周期重复
+            pattern = dst[start:]
+            repeats, remainder = divmod(match_length, offset)
+            dst += pattern * repeats + pattern[:remainder]
+
+    if len(dst) != uncompressed_size:
+        raise TexFormatError(f"LZ4 解压长度不符 / Size mismatch: {len(dst)} != {uncompressed_size}")
+    return bytes(dst)
+
+
+# ------------------------------------------------------------
+#  TEX 容器解析
+# ------------------------------------------------------------
+def _read_mipmap(cursor, version):
+    if version == 4:
+        # TEXB0004 的 mipmap 前有固定参数与条件 JSON
+        if cursor.int32() != 1 or cursor.int32() != 2:
+            raise TexFormatError("不支持的 TEXB0004 mipmap 参数 / Unsupported TEXB0004 mipmap")
+        cursor.nstring(max_length=1 << 16)
+        if cursor.int32() != 1:
+            raise TexFormatError("不支持的 TEXB0004 mipmap 参数 / Unsupported TEXB0004 mipmap")
+
+    width = cursor.int32()
+    height = cursor.int32()
+    if version == 1:
+        return TexMipmap(width, height, cursor.bytes(cursor.int32()))
+
+    is_lz4 = cursor.int32() == 1
+    decompressed_size = cursor.int32()
+    data = cursor.bytes(cursor.int32())
+    if is_lz4:
+        data = lz4_block_decompress(data, decompressed_size)
+    return TexMipmap(width, height, data)
+
+
+def parse_tex(data):
+    """
+    解析 TEX 文件内容 / Parse the bytes of a TEX file
+    data 可以是 bytes 或 memoryview（例如 PkgReader.read 的返回值）
+    """
+    cursor = _Cursor(data)
+    tex = TexFile()
+
+    if not cursor.nstring().startswith("TEXV"):
+        raise TexFormatError("不是 TEX 文件 / Not a TEX file (missing TEXV)")
+    if not cursor.nstring().startswith("TEXI"):
+        raise TexFormatError("不是 TEX 文件 / Not a TEX file (missing TEXI)")
+
+    tex.format = cursor.int32()
+    tex.flags = cursor.int32()
+    tex.texture_width = cursor.int32()
+    tex.texture_height = cursor.int32()
+    tex.image_width = cursor.int32()
+    tex.image_height = cursor.int32()
+    cursor.int32()  # unknown
+
+    tex.container = cursor.nstring()
+    if not tex.container.startswith("TEXB") or tex.container[4:] not in ("0001", "0002", "0003", "0004"):
+        raise TexFormatError(f"不支持的图像容器 / Unsupported image container: {tex.container!r}")
+    version = int(tex.container[4:])
+
+    image_count = cursor.int32()
+    if version >= 3:
+        tex.image_format = cursor.int32()
+    if version == 4:
+        tex.is_mp4 = cursor.int32() == 1
+        if not tex.is_mp4:
+            version = 3  # 非视频的 TEXB0004 与 TEXB0003 相同
+
+    for _ in range(image_count):
+        mipmap_count = cursor.int32()
+        tex.images.append([_read_mipmap(cursor, version) for _ in range(mipmap_count)])
+
+    if not tex.images or not tex.images[0]:
+        raise TexFormatError("TEX 中没有图像数据 / TEX contains no image data")
+    return tex
+
+
+# ------------------------------------------------------------
+#  像素解码（NumPy 向量化）
+# ------------------------------------------------------------
+def _expand_565(colors):
+    """RGB565 -> (..., 3) uint16 的 8 位通道值"""
+    r = (colors >> 11) & 0x1F
+    g = (colors >> 5) & 0x3F
+    b = colors & 0x1F
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1)
+
+
+def _decode_color_blocks(blocks, dxt1):
+    """解码 8 字节颜色块 -> (n, 16, 4) uint8"""
+    c0 = blocks[:, 0].astype(np.uint16) | (blocks[:, 1].astype(np.uint16) << 8)
+    c1 = blocks[:, 2].astype(np.uint16) | (blocks[:, 3].astype(np.uint16) << 8)
+    rgb0 = _expand_565(c0)
+    rgb1 = _expand_565(c1)
+
+    palette = np.empty((len(blocks), 4, 4), dtype=np.uint16)
+    palette[:, 0, :3] = rgb0
+    palette[:, 1, :3] = rgb1
+    palette[:, :, 3] = 255
+    palette[:, 2, :3] = (2 * rgb0 + rgb1) // 3
+    palette[:, 3, :3] = (rgb0 + 2 * rgb1) // 3
+
+    if dxt1:
+        # c0 <= c1 时为三色模式：第三色取平均，第四色透明黑
+        three_color = c0 <= c1
+        palette[three_color, 2, :3] = (rgb0[three_color] + rgb1[three_color]) // 2
+        palette[three_color, 3] = 0
+
+    bits = (blocks[:, 4].astype(np.uint32) | (blocks[:, 5].astype(np.uint32) << 8) |
+            (blocks[:, 6].astype(np.uint32) << 16) | (blocks[:, 7].astype(np.uint32) << 24))
+    indices = (bits[:, None] >> (2 * np.arange(16, dtype=np.uint32))) & 0x3
+    return palette[np.arange(len(blocks))[:, None], indices].astype(np.uint8)
+
+
+def _decode_dxt3_alpha(blocks):
+    """DXT3 显式 4 位 alpha -> (n, 16) uint8"""
+    nibbles = np.empty((len(blocks), 16), dtype=np.uint8)
+    nibbles[:, 0::2] = blocks[:, :8] & 0x0F
+    nibbles[:, 1::2] = blocks[:, :8] >> 4
+    return nibbles * 17
+
+
+def _decode_dxt5_alpha(blocks):
+    """DXT5 插值 alpha -> (n, 16) uint8"""
+    a0 = blocks[:, 0].astype(np.uint16)
+    a1 = blocks[:, 1].astype(np.uint16)
+
+    palette = np.empty((len(blocks), 8), dtype=np.uint16)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    eight = a0 > a1
+    for i in range(1, 7):
+        palette[:, i + 1] = np.where(eight,
+                                     ((7 - i) * a0 + i * a1) // 7,
+                                     ((5 - i) * a0 + i * a1) // 5 if i < 5 else 0)
+    palette[~eight, 6] = 0
+    palette[~eight, 7] = 255
+
+    bits = np.zeros(len(blocks), dtype=np.uint64)
+    for i in range(6):
+        bits |= blocks[:, 2 + i].astype(np.uint64) << np.uint64(8 * i)
+    indices = (bits[:, None] >> (np.uint64(3) * np.arange(16, dtype=np.uint64))) & np.uint64(0x7)
+    return palette[np.arange(len(blocks))[:, None], indices.astype(np.intp)].astype(np.uint8)
+
+
+def decode_dxt(data, width, height, tex_format):
+    """将 DXT1/3/5 数据解压为 (height, width, 4) RGBA 数组"""
+    block_size = 8 if tex_format == FORMAT_DXT1 else 16
+    blocks_x = max(1, (width + 3) // 4)
+    blocks_y = max(1, (height + 3) // 4)
+    count = blocks_x * blocks_y
+    raw = np.frombuffer(data, dtype=np.uint8, count=count * block_size).reshape(count, block_size)
+
+    if tex_format == FORMAT_DXT1:
+        pixels = _decode_color_blocks(raw, dxt1=True)
+    else:
+        pixels = _decode_color_blocks(raw[:, 8:], dxt1=False)
+        if tex_format == FORMAT_DXT3:
+            pixels[:, :, 3] = _decode_dxt3_alpha(raw)
+        else:
+            pixels[:, :, 3] = _decode_dxt5_alpha(raw)
+
+    # (by, bx, 4 行, 4 列, 4 通道) -> (by*4, bx*4, 4)
+    image = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    image = image.reshape(blocks_y * 4, blocks_x * 4, 4)
+    return image[:height, :width]
+
+
+def decode_mipmap(tex, mipmap):
+    """将 mipmap 解码为像素数组（RGBA / 灰度 / 灰度+alpha）"""
+    if not NUMPY_AVAILABLE:
+        raise TexFormatError("像素格式解码需要 NumPy / NumPy is required to decode pixel formats")
+
+    width, height = mipmap.width, mipmap.height
+    if tex.format in (FORMAT_DXT1, FORMAT_DXT3, FORMAT_DXT5):
+        return decode_dxt(mipmap.data, width, height, tex.format)
+
+    channels = {FORMAT_RGBA8888: 4, FORMAT_RG88: 2, FORMAT_R8: 1}.get(tex.format)
+    if channels is None:
+        raise TexFormatError(f"不支持的像素格式 / Unsupported pixel format: {tex.format}")
+    pixels = np.frombuffer(mipmap.data, dtype=np.uint8, count=width * height * channels)
+    return pixels.reshape(height, width, channels)
+
+
+# ------------------------------------------------------------
+#  PNG 写出
+# ------------------------------------------------------------
+def _png_chunk(chunk_type, payload):
+    return (struct.pack(">I", len(payload)) + chunk_type + payload +
+            struct.pack(">I", zlib.crc32(chunk_type + payload) & 0xFFFFFFFF))
+
+
+def encode_png(pixels, compress_level=6):
+    """将 (h, w, c) uint8 数组编码为 PNG（c = 1/2/3/4）"""
+    height, width, channels = pixels.shape
+    color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+
+    # 每行前加过滤字节 0（None）
+    rows = np.zeros((height, width * channels + 1), dtype=np.uint8)
+    rows[:, 1:] = np.ascontiguousarray(pixels).reshape(height, width * channels)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" +
+            _png_chunk(b"IHDR", header) +
+            _png_chunk(b"IDAT", zlib.compress(rows.tobytes(), compress_level)) +
+            _png_chunk(b"IEND", b""))
+
+
+# ------------------------------------------------------------
+#  高层接口
+# ------------------------------------------------------------
+def convert_tex_bytes(data):
+    """
+    将 TEX 内容转换为图像文件 / Convert TEX bytes into an image file
+    返回 (扩展名, 文件内容)
+    """
+    tex = parse_tex(data)
+    if tex.is_gif:
+        raise TexFormatError("暂不支持 GIF 精灵图纹理 / GIF sprite-sheet textures are not supported")
+
+    mipmap = tex.images[0][0]
+    if tex.is_mp4:
+        return ".mp4", bytes(mipmap.data)
+    if tex.image_format != FREE_IMAGE_UNKNOWN:
+        extension = FREE_IMAGE_EXTENSIONS.get(tex.image_format)
+        if extension is None:
+            raise TexFormatError(f"未知的内嵌图像格式 / Unknown embedded image format: {tex.image_format}")
+        return extension, bytes(mipmap.data)
+
+    pixels = decode_mipmap(tex, mipmap)
+    # 纹理尺寸通常补齐到 2 的幂，按实际图像尺寸裁剪
+    if 0 < tex.image_width < pixels.shape[1] or 0 < tex.image_height < pixels.shape[0]:
+        pixels = pixels[:tex.image_height or pixels.shape[0], :tex.image_width or pixels.shape[1]]
+    return ".png", encode_png(pixels)
+
+
+def convert_tex_file(tex_path):
+    """
+    转换单个 .tex 文件，输出写在同目录下（与 RePKG 相同的命名：name.tex -> name.png）
+    返回 (tex_path, 输出路径或 None, 错误信息或 None)，可直接用于进程池
+    """
+    try:
+        with open(tex_path, "rb") as f:
+            data = f.read()
+        extension, payload = convert_tex_bytes(data)
+        out_path = os.path.splitext(tex_path)[0] + extension
+        with open(out_path, "wb") as f:
+            f.write(payload)
+        return tex_path, out_path, None
+    except Exception as e:
+        return tex_path, None, str(e)
+
+
+def find_tex_files(root_dir):
+    """递归查找目录下的所有 .tex 文件"""
+    tex_files = []
+    for dirpath, _, filenames in os.walk(root_dir):
+        for f in filenames:
+            if f.lower().endswith(".tex"):
+                tex_files.append(os.path.join(dirpath, f))
+    return tex_files
+
+
+def convert_textures(tex_files, pool=None):
+    """
+    批量转换纹理；提供 ProcessPoolExecutor 时并行执行
+    返回 [(tex_path, out_path, error), ...]
+    """
+    if pool is None:
+        return [convert_tex_file(path) for path in tex_files]
+    return list(pool.map(convert_tex_file, tex_files, chunksize=4))
+
+
+# ------------------------------------------------------------
+#  命令行 / 基准测试
+# ------------------------------------------------------------
+def _benchmark_repkg(repkg_path, tex_dirs):
+    """计时外部 RePKG 转换器（-t 模式，每个目录启动一次进程）"""
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as out_dir:
+        for tex_dir in tex_dirs:
+            subprocess.run([repkg_path, "extract", "-t", "-o", out_dir, tex_dir],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode Wallpaper Engine .tex files and time the decoder.")
+    parser.add_argument("paths", nargs="+", help=".tex files or directories containing them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="process pool size")
+    parser.add_argument("--repkg", help="also time RePKG.exe -t on the same directories")
+    args = parser.parse_args(argv)
+
+    tex_files = []
+    tex_dirs = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            tex_files += find_tex_files(path)
+            tex_dirs.append(path)
+        else:
+            tex_files.append(path)
+            tex_dirs.append(os.path.dirname(path) or ".")
+
+    started = time.perf_counter()
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = convert_textures(tex_files, pool)
+    else:
+        results = convert_textures(tex_files)
+    elapsed = time.perf_counter() - started
+
+    failed = [(path, error) for path, out_path, error in results if error]
+    for path, error in failed:
+        print(f"[Error] {path}: {error}")
+    print(f"builtin: {len(results) - len(failed)}/{len(results)} textures in {elapsed:.3f}s "
+          f"({args.workers} workers, numpy={'yes' if NUMPY_AVAILABLE else 'no'}, "
+          f"lz4={'module' if _lz4_block else 'python'})")
+
+    if args.repkg:
+        repkg_elapsed = _benchmark_repkg(args.repkg, sorted(set(tex_dirs)))
+        print(f"RePKG:   {repkg_elapsed:.3f}s ({repkg_elapsed / elapsed if elapsed else 0:.1f}x builtin)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+预览缩略图缓存 / Thumbnail loading with a memory-bounded LRU and an on-disk cache
+
+图库只为可见的格子请求缩略图；缩略图按以下顺序获得：
+    1. 内存 LRU（LRUCache，按解码后的像素字节数限制总大小，由界面持有）
+    2. 磁盘缓存 <cache_dir>/ab/cdef....png，键为 “图片路径 + mtime + 大小 + 缩略图尺寸”，
+       原图被修改后自动失效
+    3. 解码原图并缩放（Pillow 可用时），结果写入磁盘缓存
+
+未安装 Pillow 时 PIL_AVAILABLE 为 False：PNG / GIF 原样交给 Tk 解码并由界面按整数倍缩小，
+其他格式（JPEG 等）无法显示缩略图。
+"""
+import hashlib
+import io
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+THUMBNAIL_CACHE_DIR = os.path.join("assets", "thumbnail_cache")
+THUMBNAIL_SIZE = (160, 120)
+# 没有 Pillow 时 Tk 自身能解码的格式
+TK_NATIVE_EXTENSIONS = (".png", ".gif")
+
+
+class LRUCache:
+    """
+    按开销（字节数）限制总大小的 LRU 缓存，可在多线程中共享。
+    put() 超出上限时从最久未使用的一端逐个淘汰；单个开销超过上限的值不会被缓存。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()  # key → (value, cost)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, cost):
+        """放入缓存，返回被淘汰的键列表"""
+        evicted = []
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if cost > self.max_bytes:
+                return evicted
+            self._items[key] = (value, cost)
+            self.total_bytes += cost
+            while self.total_bytes > self.max_bytes:
+                old_key, (_, old_cost) = self._items.popitem(last=False)
+                self.total_bytes -= old_cost
+                evicted.append(old_key)
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+
+class Thumbnail:
+    """
+    load() 的结果：data 为 Tk PhotoImage 可直接读取的 PNG / GIF 字节。
+    scaled 为 False 时是未缩放的原图（没有 Pillow），界面缩小后可写入 cache_path。
+    """
+
+    __slots__ = ("data", "scaled", "cache_path")
+
+    def __init__(self, data, scaled, cache_path):
+        self.data = data
+        self.scaled = scaled
+        self.cache_path = cache_path
+
+
+class ThumbnailCache:
+    """
+    缩略图磁盘缓存，load() 可在工作线程中并行调用。
+
+    用法 / Usage:
+        thumbs = ThumbnailCache()
+        thumb = thumbs.load(image_path)    # Thumbnail 或 None（无法解码）
+    """
+
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def cache_path(self, image_path, st):
+        key = f"{os.path.normcase(os.path.abspath(image_path))}|{st.st_mtime_ns}|{st.st_size}|{self.size[0]}x{self.size[1]}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest[2:] + ".png")
+
+    def load(self, image_path):
+        """返回 Thumbnail；文件不存在或无法解码时返回 None"""
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        cache_path = self.cache_path(image_path, st)
+        try:
+            with open(cache_path, "rb") as f:
+                data = f.read()
+            with self._lock:
+                self.hits += 1
+            return Thumbnail(data, True, cache_path)
+        except OSError:
+            pass
+
+        with self._lock:
+            self.misses += 1
+        if not PIL_AVAILABLE:
+            if not image_path.lower().endswith(TK_NATIVE_EXTENSIONS):
+                return None
+            try:
+                with open(image_path, "rb") as f:
+                    return Thumbnail(f.read(), False, cache_path)
+            except OSError:
+                return None
+
+        try:
+            data = self._scale(image_path)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        self.store(cache_path, data)
+        return Thumbnail(data, True, cache_path)
+
+    def _scale(self, image_path):
+        """用 Pillow 解码并缩放为 PNG 字节（动图只取第一帧）"""
+        with Image.open(image_path) as image:
+            # JPEG 可在解码阶段直接按比例缩小，大图解码速度快得多
+            image.draft("RGB", self.size)
+            image.seek(0)
+            frame = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        frame.thumbnail(self.size)
+        buffer = io.BytesIO()
+        frame.save(buffer, "PNG", compress_level=1)
+        return buffer.getvalue()
+
+    def store(self, cache_path, data):
+        """写入磁盘缓存（先写临时文件再替换）；写入失败只影响缓存，不影响显示"""
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)